@@ -3,15 +3,30 @@
 Daily Resource Share Aggregation Script
 
 Runs at midnight to aggregate the previous day's resource_share_increments
-into the daily_resource_share summary table.
+into the daily_resource_share summary table. Reads the day's hourly rollup
+rows (hourly_resource_share) rather than the raw increments.
 """
 
-import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from db_pool import connect, day_bounds
+
 DB_PATH = Path(__file__).parent / "data" / "resource_tracking.db"
 
+# Per-Claude token totals by mode for one day (24 rollup rows per Claude and
+# mode at most), in one pass over idx_hourly_mode_hour
+DAILY_TOTALS_SQL = """
+    SELECT claude_name,
+           COALESCE(SUM(CASE WHEN mode = 'autonomy' THEN cache_read_increment END), 0),
+           COALESCE(SUM(CASE WHEN mode = 'collaboration' THEN cache_read_increment END), 0)
+    FROM hourly_resource_share
+    WHERE mode IN ('autonomy', 'collaboration')
+      AND hour >= ? AND hour < ?
+    GROUP BY claude_name
+    ORDER BY claude_name
+"""
+
 def aggregate_previous_day():
     """Aggregate yesterday's increments into daily summary"""
 
@@ -21,46 +36,21 @@ def aggregate_previous_day():
 
     print(f"Aggregating resource usage for {yesterday_str}")
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cursor = conn.cursor()
 
     try:
-        # Get list of Claude identities that had activity yesterday
-        cursor.execute("""
-            SELECT DISTINCT claude_name
-            FROM resource_share_increments
-            WHERE DATE(timestamp) = ?
-        """, (yesterday_str,))
-
-        active_claudes = [row[0] for row in cursor.fetchall()]
+        # Autonomous/collaborative totals for every Claude active yesterday
+        cursor.execute(DAILY_TOTALS_SQL, day_bounds(yesterday))
+        daily_totals = cursor.fetchall()
 
-        if not active_claudes:
+        if not daily_totals:
             print(f"No activity found for {yesterday_str}")
             return
 
-        print(f"Found activity for: {', '.join(active_claudes)}")
-
-        for claude_name in active_claudes:
-            # Sum autonomous tokens
-            cursor.execute("""
-                SELECT COALESCE(SUM(cache_read_increment), 0)
-                FROM resource_share_increments
-                WHERE claude_name = ?
-                  AND DATE(timestamp) = ?
-                  AND mode = 'autonomy'
-            """, (claude_name, yesterday_str))
-            autonomous_tokens = cursor.fetchone()[0]
-
-            # Sum collaborative tokens
-            cursor.execute("""
-                SELECT COALESCE(SUM(cache_read_increment), 0)
-                FROM resource_share_increments
-                WHERE claude_name = ?
-                  AND DATE(timestamp) = ?
-                  AND mode = 'collaboration'
-            """, (claude_name, yesterday_str))
-            collaborative_tokens = cursor.fetchone()[0]
+        print(f"Found activity for: {', '.join(name for name, _, _ in daily_totals)}")
 
+        for claude_name, autonomous_tokens, collaborative_tokens in daily_totals:
             # Insert or update daily summary
             cursor.execute("""
                 INSERT INTO daily_resource_share
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Precomputed fleet allocation for the webhook server's ingest path
+
+A background task holds one allocation_strategies.StrategyAllocation (the
+configured strategy's context and fleet-wide multipliers, from one
+consistent snapshot) and recomputes it when:
+- check-quota.py stores a new quota_info row, or identities change
+  ("quota" / "identities" change feed events)
+- a Claude's autonomy usage since the snapshot would move a fairness
+  multiplier by more than `usage_threshold` (fairness is usage divided
+  by the lowest non-zero 24h usage, so that is usage_threshold times the
+  lowest), or a Claude with no usage in the snapshot starts using
+- `max_age` seconds pass, as the quota windows' time-elapsed fractions
+  and the 24h usage window keep moving
+at most once per `min_age` seconds.
+
+Ingest never waits for a reload: a recommendation is
+allocation_strategies.recommend() on the current allocation (a dict lookup
+and a few multiplications) plus the allocation's age.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Iterable, Optional, Tuple
+
+from allocation_strategies import StrategyAllocation, recommend
+from change_feed import ChangeFeed, stop_task
+
+REFRESH_EVENTS = ("quota", "identities")
+
+class AllocationCache:
+    """The latest fleet allocation, recomputed in the background and read by every ingest thread"""
+
+    def __init__(self, feed: ChangeFeed, load: Callable[[], Awaitable[StrategyAllocation]],
+                 min_age: float, max_age: float, usage_threshold: float):
+        self.feed = feed
+        self.load = load  # Reads a snapshot and allocates the fleet (off the event loop)
+        self.min_age = min_age
+        self.max_age = max_age
+        self.usage_threshold = usage_threshold
+        self.fleet: Optional[StrategyAllocation] = None
+        self.version = None    # feed.version the allocation was computed at
+        self.loaded_at = 0.0   # time.monotonic()
+        self._attempted_at = 0.0
+        self._usage_lock = threading.Lock()  # record() runs on DB threads
+        self._usage = {}       # claude_name -> autonomy weighted usage since the snapshot
+        self._usage_crossed = False
+        self._task = None
+        self._refreshed = None
+        self.lookups = 0
+        self.loads = 0
+        self.errors = 0
+        self.triggers = {'start': 0, 'quota': 0, 'identities': 0, 'usage': 0, 'timer': 0}
+
+    async def start(self):
+        """Compute the first allocation and start refreshing (from the event loop, e.g. in the app lifespan)"""
+        self._refreshed = asyncio.Condition()
+        try:
+            await self.refresh('start')
+        except Exception:
+            self.errors += 1  # Retried after max_age; until then lookup() has nothing
+        self._task = asyncio.create_task(self._run(), name="allocation-refresh")
+
+    async def stop(self):
+        if self._task is not None:
+            await stop_task(self._task)
+            self._task = None
+
+    async def _run(self):
+        events = self.feed.subscribe()
+        try:
+            while True:
+                timeout = max(0.0, self.max_age - (time.monotonic() - self._attempted_at))
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    trigger = 'timer'
+                else:
+                    if event["kind"] in REFRESH_EVENTS:
+                        trigger = event["kind"]
+                    elif event["kind"] == "increments" and self._usage_crossed:
+                        trigger = 'usage'
+                    else:
+                        continue
+                # Coalesce everything that arrives within min_age of the last refresh
+                await asyncio.sleep(max(0.0, self.min_age - (time.monotonic() - self._attempted_at)))
+                try:
+                    await self.refresh(trigger)
+                except Exception:
+                    self.errors += 1  # load() logs its own failures; ingest keeps the last allocation
+        finally:
+            self.feed.unsubscribe(events)
+
+    async def refresh(self, trigger: str):
+        version = self.feed.version
+        self._attempted_at = time.monotonic()
+        with self._usage_lock:
+            # Usage recorded from here on may not be in the snapshot; count it towards the next one
+            self._usage = {}
+            self._usage_crossed = False
+        fleet = await self.load()
+        self.fleet, self.version, self.loaded_at = fleet, version, time.monotonic()
+        self.loads += 1
+        self.triggers[trigger] += 1
+        async with self._refreshed:
+            self._refreshed.notify_all()
+
+    async def wait_for_refresh(self, loads: int) -> int:
+        """
+        Wait until an allocation newer than the `loads`-th has been published
+        (pass the previous return value, starting from self.loads); returns
+        the new load count. Requires start().
+        """
+        async with self._refreshed:
+            await self._refreshed.wait_for(lambda: self.loads > loads)
+        return self.loads
+
+    def record(self, samples: Iterable):
+        """
+        Note committed increments (rolling_usage.UsageSample); flags a
+        refresh once a fairness multiplier would move past the threshold
+        """
+        fleet = self.fleet
+        if fleet is None:
+            return
+        usage = fleet.context.recent_usage
+        lowest = fleet.context.lowest_usage
+        with self._usage_lock:
+            for sample in samples:
+                if sample.mode != "autonomy" or not sample.weighted_cost:
+                    continue
+                name = sample.claude_name
+                added = self._usage[name] = self._usage.get(name, 0.0) + sample.weighted_cost
+                if not lowest or not usage.get(name) or added > lowest * self.usage_threshold:
+                    self._usage_crossed = True
+
+    def lookup(self, claude_name: str, current_interval: int) -> Tuple[Optional[dict], Optional[float]]:
+        """(recommend() result, allocation age in seconds), or (None, None) before the first allocation"""
+        fleet, loaded_at = self.fleet, self.loaded_at
+        if fleet is None:
+            return None, None
+        self.lookups += 1
+        return recommend(fleet, claude_name, current_interval), time.monotonic() - loaded_at
+
+    def invalidate(self):
+        self.fleet = None
+        self.version = None
+
+    def stats(self) -> dict:
+        fleet = self.fleet
+        return {
+            'lookups': self.lookups,
+            'loads': self.loads,
+            'errors': self.errors,
+            'triggers': dict(self.triggers),
+            'version': self.version,
+            'strategy': fleet.strategy.name if fleet else None,
+            'claudes': len(fleet.context.claudes) if fleet else None,
+            'age_seconds': round(time.monotonic() - self.loaded_at, 3) if fleet else None,
+        }
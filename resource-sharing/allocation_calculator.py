@@ -7,12 +7,26 @@ Algorithm:
 2. 5-Hour Window Multiplier - manages session quota with collaborative margin
 3. Weekly Window Multiplier - manages weekly quota with collaborative margin
 4. Apply all multipliers to current interval, clamp to bounds
+
+load_snapshot() reads everything the algorithm needs (latest quota,
+identities, 24h usage) in one read transaction; allocate_fleet() turns a
+snapshot into the fleet-wide part of every recommendation (quota window
+multipliers, each Claude's fairness multiplier) in one pass, and
+recommend() finishes one Claude's recommendation from that without touching
+the database. allocation_strategies.py builds on these: its 'v1' strategy
+is this algorithm as registered multiplier components.
+
+The allocation path runs on one clock, naive UTC (db_pool.utc_now()), the
+clock of the increment timestamps. quota_info rows are local time;
+load_snapshot() converts them with quota_in_utc(), so snapshot quotas and
+any `now` passed in are UTC.
 """
 
-import sqlite3
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from db_pool import connect, hour_ceiling, local_to_utc, sql_timestamp, utc_now, utc_to_local
 
 DB_PATH = Path(__file__).parent / "data" / "resource_tracking.db"
 
@@ -22,22 +36,27 @@ MAX_INTERVAL = 7200  # 2 hours
 DEFAULT_INTERVAL = 999999  # lots of hours
 AUTONOMY_PERCENTAGE = 50 # Autonomous operation will take 50% of our token pool
 
-def get_latest_quota() -> Optional[Dict]:
-    """Get the most recent quota information including reset times."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+LATEST_QUOTA_SQL = """
+    SELECT session_5hour, week_all, week_sonnet,
+           session_5hour_reset, week_reset, timestamp
+    FROM quota_info
+    ORDER BY timestamp DESC
+    LIMIT 1
+"""
 
-    cursor.execute("""
-        SELECT session_5hour, week_all, week_sonnet,
-               session_5hour_reset, week_reset, timestamp
-        FROM quota_info
-        ORDER BY timestamp DESC
-        LIMIT 1
-    """)
+CLAUDE_INFO_SQL = """
+    SELECT name, model, cost_multiplier, collaborative_pref
+    FROM claude_identities
+"""
 
-    result = cursor.fetchone()
+def get_latest_quota() -> Optional[Dict]:
+    """Get the most recent quota information including reset times."""
+    conn = connect(DB_PATH)
+    result = conn.execute(LATEST_QUOTA_SQL).fetchone()
     conn.close()
+    return quota_from_row(result)
 
+def quota_from_row(result) -> Optional[Dict]:
     if not result:
         return None
 
@@ -50,23 +69,47 @@ def get_latest_quota() -> Optional[Dict]:
         'timestamp': result[5]
     }
 
-def get_claude_info(claude_name: str) -> Optional[Dict]:
-    """Get Claude's cost multiplier and collaborative preference."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT name, model, cost_multiplier, collaborative_pref
-        FROM claude_identities
-        WHERE name = ?
-    """, (claude_name,))
+QUOTA_TIME_KEYS = ('session_5hour_reset', 'week_reset', 'timestamp')
 
-    result = cursor.fetchone()
+def quota_in_utc(quota: Optional[Dict], to_utc: Callable[[datetime], datetime] = local_to_utc) -> Optional[Dict]:
+    """
+    A quota dict with its reset times and timestamp (local time, as
+    check-quota.py stores them) converted by `to_utc` to naive UTC ISO
+    strings. Values that don't parse are left for the callers to reject.
+    """
+    if not quota:
+        return quota
+    converted = dict(quota)
+    for key in QUOTA_TIME_KEYS:
+        try:
+            converted[key] = to_utc(datetime.fromisoformat(quota[key])).isoformat()
+        except (KeyError, TypeError, ValueError):
+            pass
+    return converted
+
+def get_claude_info(claude_name: str, identities: Optional[Dict[str, Dict]] = None) -> Optional[Dict]:
+    """
+    Get Claude's cost multiplier and collaborative preference.
+    Pass `identities` (e.g. the server's identity cache) to skip the query.
+    """
+    if identities is not None:
+        result = identities.get(claude_name)
+        if not result:
+            return None
+        return claude_info_from_row(
+            (result['name'], result['model'], result['cost_multiplier'], result['collaborative_pref'])
+        )
+
+    conn = connect(DB_PATH)
+    result = conn.execute(CLAUDE_INFO_SQL + " WHERE name = ?", (claude_name,)).fetchone()
     conn.close()
 
     if not result:
         return None
+    return claude_info_from_row(result)
 
+def claude_info_from_row(result) -> Dict:
+    """(name, model, cost_multiplier, collaborative_pref) -> get_claude_info() dict"""
     return {
         'name': result[0],
         'model': result[1],
@@ -74,31 +117,48 @@ def get_claude_info(claude_name: str) -> Optional[Dict]:
         'collaborative_pref': result[3] or 30  # Default 30% if not set
     }
 
-def get_recent_weighted_usage(hours: int = 24) -> Dict[str, float]:
+# Autonomy-mode weighted cost per Claude since :since - whole hours from the
+# hourly rollup (idx_hourly_mode_hour), the partial first hour up to
+# :since_hour from raw increments (idx_increments_mode_time)
+RECENT_USAGE_SQL = """
+    SELECT claude_name, SUM(weighted) as total_weighted
+    FROM (
+        SELECT claude_name, weighted_cost as weighted
+        FROM hourly_resource_share
+        WHERE mode = 'autonomy' AND hour >= :since_hour
+        UNION ALL
+        SELECT claude_name, weighted_cost
+        FROM resource_share_increments
+        WHERE mode = 'autonomy' AND timestamp >= :since AND timestamp < :since_hour
+    )
+    GROUP BY claude_name
+"""
+
+def get_recent_weighted_usage(hours: int = 24, known_claudes=None, now: Optional[datetime] = None) -> Dict[str, float]:
     """
-    Get weighted_cost usage for all Claudes in the last N hours.
+    Get weighted_cost usage for all Claudes in the last N hours (before `now`, UTC).
     Uses existing resource_share_increments table (autonomy mode only).
+    Pass `known_claudes` to skip re-reading claude_identities.
     Returns dict of {claude_name: total_weighted_cost}
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cursor = conn.cursor()
 
-    cutoff = datetime.now() - timedelta(hours=hours)
+    cutoff = (now or utc_now()) - timedelta(hours=hours)
 
-    cursor.execute("""
-        SELECT claude_name, SUM(weighted_cost) as total_weighted
-        FROM resource_share_increments
-        WHERE timestamp >= ? AND mode = 'autonomy'
-        GROUP BY claude_name
-    """, (cutoff.isoformat(),))
+    since = sql_timestamp(cutoff)
+    cursor.execute(RECENT_USAGE_SQL, {'since': since, 'since_hour': hour_ceiling(since)})
 
     results = cursor.fetchall()
 
     usage_dict = {name: weighted for name, weighted in results}
 
     # Ensure all known Claudes are in the dict (with 0 if no usage)
-    cursor.execute("SELECT name FROM claude_identities")
-    all_claudes = [row[0] for row in cursor.fetchall()]
+    if known_claudes is None:
+        cursor.execute("SELECT name FROM claude_identities")
+        all_claudes = [row[0] for row in cursor.fetchall()]
+    else:
+        all_claudes = list(known_claudes)
     conn.close()
 
     for claude in all_claudes:
@@ -107,6 +167,89 @@ def get_recent_weighted_usage(hours: int = 24) -> Dict[str, float]:
 
     return usage_dict
 
+# Cost by mode since :since, from the rollup and raw increments as in RECENT_USAGE_SQL
+RECENT_COST_SQL = """
+    SELECT mode, SUM(cost) as total_cost
+    FROM (
+        SELECT mode, cost_delta as cost
+        FROM hourly_resource_share
+        WHERE hour >= :since_hour
+        UNION ALL
+        SELECT mode, cost_delta
+        FROM resource_share_increments
+        WHERE timestamp >= :since AND timestamp < :since_hour
+    )
+    GROUP BY mode
+"""
+
+QUOTA_HISTORY_SQL = """
+    SELECT session_5hour, week_all, week_sonnet,
+           session_5hour_reset, week_reset, timestamp
+    FROM quota_info
+    WHERE timestamp >= ?
+    ORDER BY timestamp
+"""
+
+class AllocationSnapshot(NamedTuple):
+    """Everything the calculator reads, as of one point in time"""
+    quota: Optional[Dict]           # get_latest_quota(), times in UTC (quota_in_utc())
+    claudes: Dict[str, Dict]        # name -> get_claude_info()
+    recent_usage: Dict[str, float]  # get_recent_weighted_usage(), every known Claude included
+    # Only with load_snapshot(history_hours=...), for quota_forecast:
+    quota_history: Tuple[Dict, ...] = ()  # quota_info rows over the history, oldest first, times in UTC
+    history_cost: Dict[str, float] = {}   # mode -> cost over the history
+    last_hour_cost: Dict[str, float] = {} # mode -> cost over the last hour
+
+def load_snapshot(conn, hours: int = 24, identities: Optional[Dict[str, Dict]] = None,
+                  now: Optional[datetime] = None, history_hours: int = 0) -> AllocationSnapshot:
+    """
+    Latest quota, Claude identities and recent weighted usage in one read
+    transaction, so all three describe the same moment (a WAL reader sees
+    one snapshot until it ends). Pass `identities` to use them instead of
+    reading claude_identities. The usage window ends at `now` (UTC, default
+    utc_now()). With `history_hours`, the quota_info rows and cost by mode
+    over that many hours (and cost over the last hour) come too. Quota rows
+    are converted to UTC (quota_in_utc()).
+    """
+    now = now or utc_now()
+    since = sql_timestamp(now - timedelta(hours=hours))
+    quota_history, history_cost, last_hour_cost = (), {}, {}
+    started = not conn.in_transaction
+    if started:
+        conn.execute("BEGIN")
+    try:
+        quota = quota_in_utc(quota_from_row(conn.execute(LATEST_QUOTA_SQL).fetchone()))
+        if identities is None:
+            rows = conn.execute(CLAUDE_INFO_SQL).fetchall()
+        else:
+            rows = [(i['name'], i['model'], i['cost_multiplier'], i['collaborative_pref'])
+                    for i in identities.values()]
+        usage = conn.execute(RECENT_USAGE_SQL, {'since': since, 'since_hour': hour_ceiling(since)}).fetchall()
+        if history_hours:
+            # quota_info.timestamp is local time, so the cutoff is too
+            quota_history = tuple(quota_in_utc(quota_from_row(row)) for row in conn.execute(
+                QUOTA_HISTORY_SQL, (utc_to_local(now - timedelta(hours=history_hours)).isoformat(),)))
+            history_cost = recent_cost(conn, now - timedelta(hours=history_hours))
+            last_hour_cost = recent_cost(conn, now - timedelta(hours=1))
+    finally:
+        if started:
+            conn.rollback()
+
+    claudes = {row[0]: claude_info_from_row(row) for row in rows}
+    recent_usage = {name: weighted for name, weighted in usage}
+    for claude in claudes:
+        recent_usage.setdefault(claude, 0.0)
+    return AllocationSnapshot(quota, claudes, recent_usage, quota_history, history_cost, last_hour_cost)
+
+def recent_cost(conn, cutoff: datetime) -> Dict[str, float]:
+    since = sql_timestamp(cutoff)
+    rows = conn.execute(RECENT_COST_SQL, {'since': since, 'since_hour': hour_ceiling(since)})
+    return {mode: cost or 0.0 for mode, cost in rows}
+
+def lowest_nonzero_usage(recent_usage: Dict[str, float]) -> Optional[float]:
+    non_zero_usage = [u for u in recent_usage.values() if u > 0]
+    return min(non_zero_usage) if non_zero_usage else None
+
 def calculate_fairness_multiplier(claude_name: str, recent_usage: Dict[str, float]) -> float:
     """
     Calculate fairness multiplier based on recent weighted usage.
@@ -118,19 +261,14 @@ def calculate_fairness_multiplier(claude_name: str, recent_usage: Dict[str, floa
     This balances "expression opportunity" - verbose Claudes naturally use more
     tokens per turn, so this ensures everyone gets equal chance to express themselves.
     """
-    my_usage = recent_usage.get(claude_name, 0.0)
+    return fairness_multiplier(recent_usage.get(claude_name, 0.0), lowest_nonzero_usage(recent_usage))
 
+def fairness_multiplier(my_usage: float, lowest_usage: Optional[float]) -> float:
+    """calculate_fairness_multiplier() given the fleet's lowest non-zero usage"""
     # If nobody has any usage, no adjustment needed
-    if all(usage == 0 for usage in recent_usage.values()):
-        return 1.0
-
-    # Find lowest non-zero usage
-    non_zero_usage = [u for u in recent_usage.values() if u > 0]
-    if not non_zero_usage:
+    if lowest_usage is None:
         return 1.0
 
-    lowest_usage = min(non_zero_usage)
-
     # If I have zero usage, encourage me to participate
     if my_usage == 0:
         return 0.5  # Speed up significantly
@@ -146,7 +284,8 @@ def calculate_fairness_multiplier(claude_name: str, recent_usage: Dict[str, floa
 def calculate_window_multiplier(
     percent_used: int,
     reset_time_iso: Optional[str],
-    window_name: str = "window"
+    window_name: str = "window",
+    now: Optional[datetime] = None
 ) -> tuple[float, str]:
     """
     Calculate multiplier for a quota window (5hr or weekly).
@@ -155,6 +294,7 @@ def calculate_window_multiplier(
     - If using quota faster than time passing: slow down
     - If using quota slower than time passing: speed up
 
+    reset_time_iso and `now` are UTC (quota_in_utc()); `now` defaults to utc_now().
     Returns: (multiplier, reason_string)
     """
     if not reset_time_iso:
@@ -166,7 +306,7 @@ def calculate_window_multiplier(
     except (ValueError, TypeError):
         return (1.0, f"{window_name}: Invalid reset time")
 
-    now = datetime.now()
+    now = now or utc_now()
 
     # If reset time is in the past, something's wrong
     if reset_time <= now:
@@ -191,51 +331,78 @@ def calculate_window_multiplier(
 
     usage_fraction = percent_used / 100.0
     multiplier = (usage_fraction / time_fraction)
-    reason = ("because I said so")
 
-    # pace_ratio > 1.0: using too fast, slow down (multiplier > 1.0)
-    # pace_ratio < 1.0: using too slow, speed up (multiplier < 1.0)
-    # pace_ratio = 1.0: perfect pace
+    # multiplier > 1.0: using quota faster than time passing, slow down
+    # multiplier < 1.0: using quota slower than time passing, speed up
+    # multiplier = 1.0: perfect pace
+    if multiplier > 1.0:
+        pace = "ahead of pace, slowing down"
+    elif multiplier < 1.0:
+        pace = "behind pace, speeding up"
+    else:
+        pace = "on pace"
+    reason = f"{window_name}: {percent_used}% used, {int(time_fraction*100)}% elapsed - {pace}"
 
     return (multiplier, reason)
 
-    if pace_ratio > 1.5:
-        multiplier = 1.5
-        reason = f"{window_name}: {percent_used}% used, {int(time_fraction*100)}% elapsed - slowing significantly"
-    elif pace_ratio > 1.1:
-        multiplier = 1.2
-        reason = f"{window_name}: {percent_used}% used, {int(time_fraction*100)}% elapsed - slight slowdown"
-    elif pace_ratio < 0.7:
-        multiplier = 0.7
-        reason = f"{window_name}: {percent_used}% used, {int(time_fraction*100)}% elapsed - can speed up"
-    elif pace_ratio < 0.9:
-        multiplier = 0.9
-        reason = f"{window_name}: {percent_used}% used, {int(time_fraction*100)}% elapsed - slight speedup"
-    else:
-        multiplier = 1.0
-        reason = f"{window_name}: {percent_used}% used, {int(time_fraction*100)}% elapsed - on track"
+class FleetAllocation(NamedTuple):
+    """The fleet-wide part of every recommendation, computed once per snapshot"""
+    snapshot: AllocationSnapshot
+    fairness: Dict[str, float]     # name -> fairness multiplier
+    session: Tuple[float, str]     # 5hr window (multiplier, reason)
+    weekly: Tuple[float, str]      # Weekly window (multiplier, reason)
+    quota_status: str
+
+def quota_status_for(week_all: int) -> str:
+    """Determine overall quota status"""
+    if week_all > 80:
+        return 'critical'
+    elif week_all > 60:
+        return 'high'
+    elif week_all > 40:
+        return 'medium'
+    return 'good'
+
+def allocate_fleet(snapshot: AllocationSnapshot, now: Optional[datetime] = None) -> FleetAllocation:
+    """Quota window multipliers (as of `now`, UTC) and every Claude's fairness multiplier, in one pass"""
+    quota = snapshot.quota
+    if not quota:
+        return FleetAllocation(snapshot, {}, (1.0, ''), (1.0, ''), 'unknown')
 
+    # 1. Fairness Multiplier (24hr weighted usage)
+    lowest_usage = lowest_nonzero_usage(snapshot.recent_usage)
+    fairness = {name: fairness_multiplier(usage, lowest_usage)
+                for name, usage in snapshot.recent_usage.items()}
 
+    # 2. 5-Hour Window Multiplier
+    session_mult, session_reason = calculate_window_multiplier(
+        percent_used=quota['session_5hour'],
+        reset_time_iso=quota['session_5hour_reset'],
+        window_name="5hr session",
+        now=now
+    )
+    session_mult = min(session_mult,1.0)  #5 hour mult should not speed claudes up
 
-def calculate_recommended_interval(
-    claude_name: str,
-    current_interval: Optional[int] = None
-) -> Dict:
-    """
-    Calculate recommended interval for a Claude using V1 algorithm.
+    # 3. Weekly Window Multiplier
+    week_mult, week_reason = calculate_window_multiplier(
+        percent_used=quota['week_all'],
+        reset_time_iso=quota['week_reset'],
+        window_name="weekly",
+        now=now
+    )
 
-    Returns dict with:
-    - recommended_interval: int (seconds)
-    - reasons: list of strings (one per multiplier)
-    - multipliers: dict of individual multipliers
-    - quota_status: str
+    return FleetAllocation(snapshot, fairness, (session_mult, session_reason), (week_mult, week_reason),
+                           quota_status_for(quota['week_all']))
+
+def recommend(fleet: FleetAllocation, claude_name: str, current_interval: Optional[int] = None) -> Dict:
+    """
+    One Claude's recommendation from a fleet allocation (no database access).
+    Same result as calculate_recommended_interval() for the same snapshot.
     """
     if current_interval is None:
         current_interval = DEFAULT_INTERVAL
 
-    # Get quota data
-    quota = get_latest_quota()
-    if not quota:
+    if not fleet.snapshot.quota:
         return {
             'recommended_interval': current_interval,
             'reasons': ['No quota data available'],
@@ -243,8 +410,7 @@ def calculate_recommended_interval(
             'multipliers': {}
         }
 
-    # Get Claude info
-    claude_info = get_claude_info(claude_name)
+    claude_info = fleet.snapshot.claudes.get(claude_name)
     if not claude_info:
         return {
             'recommended_interval': current_interval,
@@ -253,26 +419,11 @@ def calculate_recommended_interval(
             'multipliers': {}
         }
 
-    collaborative_pref = claude_info['collaborative_pref']
-
-    # 1. Fairness Multiplier (24hr weighted usage)
-    recent_usage = get_recent_weighted_usage(hours=24)
-    fairness_mult = calculate_fairness_multiplier(claude_name, recent_usage)
-
-    # 2. 5-Hour Window Multiplier
-    session_mult, session_reason = calculate_window_multiplier(
-        percent_used=quota['session_5hour'],
-        reset_time_iso=quota['session_5hour_reset'],
-        window_name="5hr session"
-    )
-    session_mult = min(session_mult,1.0)  #5 hour mult should not speed claudes up
-
-    # 3. Weekly Window Multiplier
-    week_mult, week_reason = calculate_window_multiplier(
-        percent_used=quota['week_all'],
-        reset_time_iso=quota['week_reset'],
-        window_name="weekly"
-    )
+    fairness_mult = fleet.fairness.get(claude_name)
+    if fairness_mult is None:
+        fairness_mult = calculate_fairness_multiplier(claude_name, fleet.snapshot.recent_usage)
+    session_mult, session_reason = fleet.session
+    week_mult, week_reason = fleet.weekly
 
     # Apply all multipliers
     new_interval = current_interval * fairness_mult * session_mult * week_mult
@@ -288,31 +439,47 @@ def calculate_recommended_interval(
         f"Combined: {current_interval}s → {recommended}s"
     ]
 
-    # Determine overall quota status
-    if quota['week_all'] > 80:
-        quota_status = 'critical'
-    elif quota['week_all'] > 60:
-        quota_status = 'high'
-    elif quota['week_all'] > 40:
-        quota_status = 'medium'
-    else:
-        quota_status = 'good'
-
     return {
         'recommended_interval': recommended,
         'reasons': reasons,
-        'quota_status': quota_status,
+        'quota_status': fleet.quota_status,
         'multipliers': {
             'fairness': fairness_mult,
             'session_5hour': session_mult,
             'weekly': week_mult,
             'combined': fairness_mult * session_mult * week_mult
         },
-        'collaborative_pref': collaborative_pref,
+        'collaborative_pref': claude_info['collaborative_pref'],
         'current_interval': current_interval,
-        'recent_usage': recent_usage
+        'recent_usage': fleet.snapshot.recent_usage
     }
 
+def calculate_recommended_interval(
+    claude_name: str,
+    current_interval: Optional[int] = None,
+    identities: Optional[Dict[str, Dict]] = None,
+    now: Optional[datetime] = None
+) -> Dict:
+    """
+    Calculate recommended interval for a Claude using V1 algorithm.
+    `identities` (name -> identity dict) skips the claude_identities queries.
+    `now` (UTC) replaces the current time (replays, tests).
+    Reads one snapshot over one connection; to answer for many Claudes,
+    allocate_fleet() once and recommend() each.
+
+    Returns dict with:
+    - recommended_interval: int (seconds)
+    - reasons: list of strings (one per multiplier)
+    - multipliers: dict of individual multipliers
+    - quota_status: str
+    """
+    conn = connect(DB_PATH)
+    try:
+        snapshot = load_snapshot(conn, hours=24, identities=identities, now=now)
+    finally:
+        conn.close()
+    return recommend(allocate_fleet(snapshot, now), claude_name, current_interval)
+
 if __name__ == '__main__':
     # Test the calculator
     import sys
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Allocation strategies: recommended intervals from registered multipliers
+
+A strategy is a list of multiplier components applied in order to a
+Claude's current interval (then clamped to MIN_INTERVAL..MAX_INTERVAL), or
+a constant interval for everyone. Components are registered with
+@multiplier and receive one prebuilt AllocationContext - quota snapshot,
+identities, windowed usage and the clock - plus the Claude's identity
+record, so a new multiplier reads what the snapshot already holds and adds
+no database work. Fleet-wide components (per_claude=False, e.g. the quota
+windows) are evaluated once per allocation rather than per Claude.
+
+allocate() builds the context and fleet-wide values from an
+allocation_calculator.AllocationSnapshot; recommend() finishes one
+Claude's recommendation from that. The 'v1' strategy gives exactly what
+allocation_calculator.calculate_recommended_interval() does; 'constant' is
+the 2026-01-15 emergency interval; 'forecast' replaces V1's quota window
+multipliers with quota_forecast's projection of each window at its reset.
+The server picks one with RESOURCE_SHARE_ALLOCATION_STRATEGY.
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import quota_forecast
+from allocation_calculator import (
+    DEFAULT_INTERVAL, MAX_INTERVAL, MIN_INTERVAL, AllocationSnapshot,
+    calculate_window_multiplier, fairness_multiplier, lowest_nonzero_usage, quota_status_for,
+)
+from db_pool import utc_now
+
+EMERGENCY_INTERVAL = 1800  # 30 minutes - the constant used since 2026-01-15
+
+class AllocationContext(NamedTuple):
+    """Everything a multiplier may read, built once per snapshot"""
+    quota: Optional[Dict]           # Latest quota_info row
+    claudes: Dict[str, Dict]        # name -> identity record (get_claude_info())
+    recent_usage: Dict[str, float]  # name -> autonomy weighted usage over the last usage_hours
+    lowest_usage: Optional[float]   # Lowest non-zero recent_usage (None if nobody has usage)
+    usage_hours: int
+    now: datetime                   # Naive UTC, like the snapshot's quota times
+    quota_history: Tuple[Dict, ...] = ()  # Strategies with history_hours: quota_info rows, oldest first
+    history_cost: Dict[str, float] = {}   # ...mode -> cost over the history
+    last_hour_cost: Dict[str, float] = {} # ...mode -> cost over the last hour
+    history_hours: int = 0
+
+# component(context, claude) -> (multiplier, reason); claude is the identity
+# record, or None for fleet-wide components
+Multiplier = Callable[[AllocationContext, Optional[Dict]], Tuple[float, str]]
+
+class Component(NamedTuple):
+    name: str
+    func: Multiplier
+    per_claude: bool
+
+COMPONENTS: Dict[str, Component] = {}
+
+def multiplier(name: str, per_claude: bool = True):
+    """Decorator registering a multiplier component under `name`"""
+    def register(func: Multiplier) -> Multiplier:
+        COMPONENTS[name] = Component(name, func, per_claude)
+        return func
+    return register
+
+class Strategy(NamedTuple):
+    name: str
+    multipliers: Tuple[str, ...] = ()       # Registered component names, applied in order
+    constant_interval: Optional[int] = None  # Set: everyone gets this, nothing is read
+    history_hours: int = 0                   # Quota and cost history to load into the snapshot
+
+    @property
+    def reads_snapshot(self) -> bool:
+        return self.constant_interval is None
+
+STRATEGIES: Dict[str, Strategy] = {}
+
+def register_strategy(strategy: Strategy) -> Strategy:
+    unknown = [name for name in strategy.multipliers if name not in COMPONENTS]
+    if unknown:
+        raise ValueError(f"Strategy {strategy.name!r} uses unregistered multipliers: {', '.join(unknown)}")
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+def get_strategy(name: str) -> Strategy:
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown allocation strategy {name!r}; expected one of {', '.join(STRATEGIES)}") from None
+
+class StrategyAllocation(NamedTuple):
+    """A strategy's fleet-wide part of every recommendation, computed once per snapshot"""
+    strategy: Strategy
+    context: Optional[AllocationContext]   # None for constant strategies
+    fleet_values: Dict[str, Tuple[float, str]]  # Fleet-wide component -> (multiplier, reason)
+    quota_status: str
+
+def build_context(snapshot: AllocationSnapshot, now: Optional[datetime] = None,
+                  usage_hours: int = 24, history_hours: int = 0) -> AllocationContext:
+    return AllocationContext(
+        quota=snapshot.quota,
+        claudes=snapshot.claudes,
+        recent_usage=snapshot.recent_usage,
+        lowest_usage=lowest_nonzero_usage(snapshot.recent_usage),
+        usage_hours=usage_hours,
+        now=now or utc_now(),
+        quota_history=snapshot.quota_history,
+        history_cost=snapshot.history_cost,
+        last_hour_cost=snapshot.last_hour_cost,
+        history_hours=history_hours,
+    )
+
+def allocate(strategy: Strategy, snapshot: Optional[AllocationSnapshot] = None,
+             now: Optional[datetime] = None) -> StrategyAllocation:
+    """Context and fleet-wide multipliers for `strategy` (constant strategies need no snapshot)"""
+    if not strategy.reads_snapshot:
+        return StrategyAllocation(strategy, None, {}, 'emergency_constant_interval')
+
+    context = build_context(snapshot, now, history_hours=strategy.history_hours)
+    if not context.quota:
+        return StrategyAllocation(strategy, context, {}, 'unknown')
+    fleet_values = {name: COMPONENTS[name].func(context, None)
+                    for name in strategy.multipliers if not COMPONENTS[name].per_claude}
+    return StrategyAllocation(strategy, context, fleet_values, quota_status_for(context.quota['week_all']))
+
+def recommend(allocation: StrategyAllocation, claude_name: str, current_interval: Optional[int] = None) -> Dict:
+    """One Claude's recommendation (same keys as allocation_calculator.recommend()); no database access"""
+    strategy = allocation.strategy
+    if not strategy.reads_snapshot:
+        return {
+            'recommended_interval': strategy.constant_interval,
+            'reasons': [f"Constant {strategy.constant_interval}s interval ({strategy.name} strategy)"],
+            'quota_status': allocation.quota_status,
+            'multipliers': {'emergency_mode': 1.0},
+            'current_interval': current_interval,
+        }
+
+    if current_interval is None:
+        current_interval = DEFAULT_INTERVAL
+    context = allocation.context
+    if not context.quota:
+        return {
+            'recommended_interval': current_interval,
+            'reasons': ['No quota data available'],
+            'quota_status': 'unknown',
+            'multipliers': {}
+        }
+
+    claude = context.claudes.get(claude_name)
+    if not claude:
+        return {
+            'recommended_interval': current_interval,
+            'reasons': [f'Claude {claude_name} not found in database'],
+            'quota_status': 'unknown',
+            'multipliers': {}
+        }
+
+    multipliers = {}
+    reasons = []
+    new_interval = current_interval
+    combined = 1.0
+    for name in strategy.multipliers:
+        component = COMPONENTS[name]
+        if component.per_claude:
+            value, reason = component.func(context, claude)
+        else:
+            value, reason = allocation.fleet_values[name]
+        multipliers[name] = value
+        reasons.append(reason)
+        new_interval *= value
+        combined *= value
+
+    recommended = int(max(MIN_INTERVAL, min(MAX_INTERVAL, new_interval)))
+    reasons.append(f"Combined: {current_interval}s → {recommended}s")
+    multipliers['combined'] = combined
+
+    return {
+        'recommended_interval': recommended,
+        'reasons': reasons,
+        'quota_status': allocation.quota_status,
+        'multipliers': multipliers,
+        'collaborative_pref': claude['collaborative_pref'],
+        'current_interval': current_interval,
+        'recent_usage': context.recent_usage
+    }
+
+# V1 components (allocation_calculator)
+
+@multiplier("fairness")
+def fairness(context: AllocationContext, claude: Dict) -> Tuple[float, str]:
+    """my usage / lowest non-zero usage over the window (0.5 with no usage of my own)"""
+    value = fairness_multiplier(context.recent_usage.get(claude['name'], 0.0), context.lowest_usage)
+    return value, f"Fairness: {value:.2f}x ({context.usage_hours}hr weighted usage)"
+
+@multiplier("session_5hour", per_claude=False)
+def session_window(context: AllocationContext, claude=None) -> Tuple[float, str]:
+    """5hr quota used vs time elapsed, capped at 1.0x as in allocate_fleet()"""
+    value, reason = calculate_window_multiplier(
+        context.quota['session_5hour'], context.quota['session_5hour_reset'], "5hr session", context.now)
+    value = min(value, 1.0)
+    return value, f"{reason} ({value:.2f}x)"
+
+@multiplier("weekly", per_claude=False)
+def weekly_window(context: AllocationContext, claude=None) -> Tuple[float, str]:
+    """Weekly quota used vs time elapsed"""
+    value, reason = calculate_window_multiplier(
+        context.quota['week_all'], context.quota['week_reset'], "weekly", context.now)
+    return value, f"{reason} ({value:.2f}x)"
+
+# Forecast component (quota_forecast)
+
+@multiplier("forecast", per_claude=False)
+def forecast(context: AllocationContext, claude=None) -> Tuple[float, str]:
+    """
+    The 5hr and weekly windows' forecast multipliers; the window needing
+    the slowest pace binds, so either window running out early slows the
+    fleet (see quota_forecast.FORECAST_SESSION_MAX_MULTIPLIER for V1's cap).
+    """
+    forecasts = quota_forecast.forecast_windows(
+        context.quota, context.quota_history, context.history_cost, context.last_hour_cost,
+        context.history_hours, context.now)
+    if not forecasts:
+        return 1.0, "Forecast: no reset times available"
+    binding = max(forecasts.values(), key=lambda f: f.multiplier)
+    others = "; ".join(f.reason for f in forecasts.values() if f is not binding)
+    return binding.multiplier, (f"Forecast: {binding.reason} ({binding.multiplier:.2f}x)"
+                                + (f"; {others}" if others else ""))
+
+register_strategy(Strategy('v1', ('fairness', 'session_5hour', 'weekly')))
+register_strategy(Strategy('constant', constant_interval=EMERGENCY_INTERVAL))
+register_strategy(Strategy('forecast', ('fairness', 'forecast'),
+                           history_hours=quota_forecast.FORECAST_HISTORY_HOURS))
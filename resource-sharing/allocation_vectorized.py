@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Vectorized allocation engine (NumPy) - the V1 algorithm over the whole fleet
+
+allocation_calculator.recommend() works one Claude at a time in Python.
+This module holds the fleet as arrays (weighted usage, cost_multiplier,
+collaborative_pref, current_interval; one element per Claude) and computes
+fairness ratios, quota window multipliers, the clamped recommended interval
+and quota status for every Claude in a handful of array operations.
+
+Results match the scalar calculator (bench_allocation_vectorized.py checks
+this on randomized fleets); only the per-Claude reason strings are left
+out. Window multipliers are also vectorized over quota rows, so a replay
+can evaluate many (percent_used, time elapsed) points at once.
+
+Needs numpy (pip install numpy); the server does not import this module.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from allocation_calculator import (
+    DEFAULT_INTERVAL, MAX_INTERVAL, MIN_INTERVAL, AllocationSnapshot,
+)
+from db_pool import utc_now
+
+SESSION_WINDOW = timedelta(hours=5)
+WEEK_WINDOW = timedelta(days=7)
+
+# quota_status by week_all, checked in order (allocation_calculator.quota_status_for)
+QUOTA_STATUS_THRESHOLDS = ((80, 'critical'), (60, 'high'), (40, 'medium'))
+
+class FleetArrays(NamedTuple):
+    """One element per known Claude, in `names` order"""
+    names: List[str]
+    usage: np.ndarray               # 24h weighted usage
+    cost_multiplier: np.ndarray
+    collaborative_pref: np.ndarray
+    current_interval: np.ndarray
+    lowest_usage: float             # Lowest non-zero usage in the snapshot (0.0 if none)
+
+class VectorAllocation(NamedTuple):
+    names: List[str]
+    fairness: np.ndarray
+    session: np.ndarray
+    weekly: np.ndarray
+    combined: np.ndarray
+    recommended: np.ndarray         # int64 seconds
+    quota_status: np.ndarray        # str
+
+    def recommended_intervals(self) -> Dict[str, int]:
+        return dict(zip(self.names, self.recommended.tolist()))
+
+def fleet_arrays(snapshot: AllocationSnapshot,
+                 current_intervals: Union[int, Dict[str, int], None] = None) -> FleetArrays:
+    """
+    Arrays for every Claude in the snapshot. `current_intervals` is one
+    interval for all, or per Claude (missing / None -> DEFAULT_INTERVAL).
+    """
+    names = sorted(snapshot.claudes)
+    claudes = [snapshot.claudes[name] for name in names]
+    if not isinstance(current_intervals, dict):
+        current_intervals = dict.fromkeys(names, current_intervals)
+    intervals = [DEFAULT_INTERVAL if current_intervals.get(name) is None else current_intervals[name]
+                 for name in names]
+
+    # The fairness baseline comes from every Claude with recent usage, known or not
+    all_usage = np.fromiter(snapshot.recent_usage.values(), dtype=np.float64, count=len(snapshot.recent_usage))
+    positive = all_usage[all_usage > 0]
+    return FleetArrays(
+        names=names,
+        usage=np.array([snapshot.recent_usage.get(name, 0.0) for name in names], dtype=np.float64),
+        cost_multiplier=np.array([c['cost_multiplier'] for c in claudes], dtype=np.float64),
+        collaborative_pref=np.array([c['collaborative_pref'] for c in claudes], dtype=np.float64),
+        current_interval=np.array(intervals, dtype=np.float64),
+        lowest_usage=float(positive.min()) if positive.size else 0.0,
+    )
+
+def fairness_multipliers(usage: np.ndarray, lowest_usage: float) -> np.ndarray:
+    """calculate_fairness_multiplier() for every Claude"""
+    if lowest_usage <= 0:
+        return np.ones_like(usage)  # Nobody has any usage
+    return np.where(usage == 0, 0.5, usage / lowest_usage)
+
+def window_multipliers(percent_used, elapsed_seconds, window_seconds: float) -> np.ndarray:
+    """
+    calculate_window_multiplier() over arrays: quota % used vs fraction of
+    the window elapsed. elapsed_seconds is NaN where the reset time is
+    missing or invalid; like a reset that has passed or a window that has
+    not started, that gives 1.0.
+    """
+    percent_used = np.asarray(percent_used, dtype=np.float64)
+    elapsed_seconds = np.asarray(elapsed_seconds, dtype=np.float64)
+    time_fraction = np.clip(elapsed_seconds / window_seconds, 0.0, 1.0)
+    valid = (elapsed_seconds < window_seconds) & (time_fraction > 0)  # False for NaN
+    return np.where(valid, (percent_used / 100.0) / np.where(valid, time_fraction, 1.0), 1.0)
+
+def window_elapsed(reset_time_iso: Optional[str], now: datetime, window: timedelta) -> float:
+    """
+    Seconds since a quota window started (its reset time minus its length),
+    computed as the scalar calculator does; NaN if missing or invalid
+    """
+    if not reset_time_iso:
+        return float("nan")
+    try:
+        return (now - (datetime.fromisoformat(reset_time_iso) - window)).total_seconds()
+    except (ValueError, TypeError):
+        return float("nan")
+
+def quota_statuses(week_all) -> np.ndarray:
+    week_all = np.asarray(week_all)
+    return np.select([week_all > limit for limit, _ in QUOTA_STATUS_THRESHOLDS],
+                     [status for _, status in QUOTA_STATUS_THRESHOLDS], default='good')
+
+def allocate(fleet: FleetArrays, quota: Optional[Dict], now: Optional[datetime] = None) -> VectorAllocation:
+    """
+    Every Claude's multipliers and recommended interval in one pass (quota
+    times and `now` in UTC, as in a load_snapshot() snapshot). Without
+    quota data each Claude keeps its current interval (status 'unknown'),
+    like the scalar calculator.
+    """
+    n = len(fleet.names)
+    if not quota:
+        ones = np.ones(n)
+        return VectorAllocation(fleet.names, ones, ones, ones, ones,
+                                fleet.current_interval.astype(np.int64), np.full(n, 'unknown'))
+
+    now = now or utc_now()
+    fairness = fairness_multipliers(fleet.usage, fleet.lowest_usage)
+    # 5hr mult should not speed claudes up
+    session = np.minimum(window_multipliers(
+        quota['session_5hour'], window_elapsed(quota['session_5hour_reset'], now, SESSION_WINDOW),
+        SESSION_WINDOW.total_seconds()), 1.0)
+    weekly = window_multipliers(
+        quota['week_all'], window_elapsed(quota['week_reset'], now, WEEK_WINDOW), WEEK_WINDOW.total_seconds())
+
+    # Same multiplication order as the scalar calculator, so results agree to the bit
+    new_interval = fleet.current_interval * fairness * session * weekly
+    recommended = np.clip(new_interval, MIN_INTERVAL, MAX_INTERVAL).astype(np.int64)
+    return VectorAllocation(
+        names=fleet.names,
+        fairness=fairness,
+        session=np.broadcast_to(session, (n,)),
+        weekly=np.broadcast_to(weekly, (n,)),
+        combined=fairness * session * weekly,
+        recommended=recommended,
+        quota_status=np.broadcast_to(quota_statuses(quota['week_all']), (n,)),
+    )
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Allocation calculator benchmark: cost of each step on synthetic fleets
+
+For each fleet size, builds a database with that many Claudes, --days of
+history at --increments-per-day per Claude and a current quota row, points
+allocation_calculator at it and times:
+- get_recent_weighted_usage: the 24h fairness window query
+- calculate_fairness_multiplier: one Claude against the fleet's usage (pure)
+- calculate_window_multiplier: one quota window (pure)
+- calculate_recommended_interval: the full per-request path (snapshot read
+  over a new connection, fleet allocation, recommendation)
+
+cold: the database file is dropped from the OS page cache before each call
+(posix_fadvise DONTNEED; where that is unavailable cold only means a new
+connection, as every call opens one). warm: the same call repeated.
+
+Results are saved as JSON per git revision; --compare an earlier results
+file to print p50 ratios against it.
+
+Usage: python3 bench_allocation.py [--claudes 10,100,1000] [--days 30] [--increments-per-day 288]
+                                   [--compare data/benchmarks/allocation-<rev>.json]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import allocation_calculator
+import bench_common
+from db_pool import connect
+
+def evict_page_cache(db_path: Path) -> bool:
+    """Drop the database (and its WAL) from the OS page cache; False if the platform can't"""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in (db_path, Path(f"{db_path}-wal")):
+        if path.exists():
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+def time_calls(func, repeat: int, before=None) -> dict:
+    samples = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return bench_common.percentiles(samples)
+
+def bench_fleet(db_path: Path, repeat: int, cold_repeat: int) -> dict:
+    allocation_calculator.DB_PATH = db_path
+    evict = lambda: evict_page_cache(db_path)
+    name = bench_common.claude_names(1)[0]
+    usage = allocation_calculator.get_recent_weighted_usage(hours=24)
+    quota = allocation_calculator.quota_in_utc(allocation_calculator.get_latest_quota())
+
+    calls = {
+        'get_recent_weighted_usage': lambda: allocation_calculator.get_recent_weighted_usage(hours=24),
+        'calculate_fairness_multiplier': lambda: allocation_calculator.calculate_fairness_multiplier(name, usage),
+        'calculate_window_multiplier': lambda: allocation_calculator.calculate_window_multiplier(
+            quota['week_all'], quota['week_reset'], "weekly"),
+        'calculate_recommended_interval': lambda: allocation_calculator.calculate_recommended_interval(name, 1800),
+    }
+    results = {'rows': rows_in(db_path), 'cold_evicts_page_cache': evict()}
+    for label, call in calls.items():
+        results[label] = {
+            'cold': time_calls(call, cold_repeat, before=evict),
+            'warm': time_calls(call, repeat),
+        }
+    return results
+
+def rows_in(db_path: Path) -> int:
+    conn = connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM resource_share_increments").fetchone()[0]
+    finally:
+        conn.close()
+
+def compare(results: dict, baseline_path: Path):
+    """Print this run's p50 against an earlier results file"""
+    baseline = json.loads(Path(baseline_path).read_text())
+    print(f"\n=== p50 vs {baseline.get('revision')} ({baseline_path}) ===")
+    for size, fleet in results['fleets'].items():
+        before = baseline.get('fleets', {}).get(size)
+        if before is None:
+            print(f"  {size:>5} Claudes  not in baseline")
+            continue
+        for label, timings in fleet.items():
+            if not isinstance(timings, dict):
+                continue
+            ratios = []
+            for kind in ('cold', 'warm'):
+                old = before.get(label, {}).get(kind, {}).get('p50_ms')
+                new = timings[kind]['p50_ms']
+                ratios.append(f"{kind} {new:9.3f}ms" + (f" ({new / old:5.2f}x)" if old else ""))
+            print(f"  {size:>5} Claudes  {label:32s} {'  '.join(ratios)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--claudes", default="10,100,1000", help="comma-separated fleet sizes")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--increments-per-day", type=int, default=288, help="per Claude (288 = every 5 minutes)")
+    parser.add_argument("--repeat", type=int, default=50, help="warm calls per function")
+    parser.add_argument("--cold-repeat", type=int, default=5, help="cold calls per function")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.claudes.split(",") if size.strip()]
+    fleets = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            started = time.perf_counter()
+            db_path = bench_common.create_database(
+                Path(tmp) / f"allocation-{size}.db", size, args.days, args.increments_per_day / 24
+            )
+            print(f"Built {size} Claudes x {args.days} days in {time.perf_counter() - started:.1f}s")
+            fleets[str(size)] = bench_fleet(db_path, args.repeat, args.cold_repeat)
+
+    print(f"\n=== Allocation calculator, {args.days} days at {args.increments_per_day} increments/day/Claude ===")
+    for size, fleet in fleets.items():
+        print(f"  {size:>5} Claudes ({fleet['rows']} increments)")
+        for label, timings in fleet.items():
+            if isinstance(timings, dict):
+                print(f"    {label:32s} cold p50 {timings['cold']['p50_ms']:9.3f}ms  "
+                      f"warm p50 {timings['warm']['p50_ms']:9.3f}ms  p99 {timings['warm']['p99_ms']:9.3f}ms")
+
+    params = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k != "output"}
+    results = {"params": params, "fleets": fleets}
+    if args.compare:
+        compare(results, args.compare)
+    path = bench_common.save_results("allocation", results, args.output)
+    print(f"\nResults saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Vectorized vs scalar allocation: randomized equivalence check and scaling
+
+1. Equivalence: --cases random fleets and quota rows (zero and tied usage,
+   Claudes with usage but no identity, missing/invalid/past reset times,
+   windows not yet started, per-Claude or missing current intervals) run
+   through allocation_calculator (allocate_fleet + recommend per Claude)
+   and allocation_vectorized.allocate at the same `now`. Every multiplier
+   and recommended interval must match; the first mismatch is printed with
+   the seed that reproduces it.
+2. Scaling: time both engines at each --claudes fleet size.
+
+No database needed: fleets are built as AllocationSnapshots in memory.
+
+Usage: python3 bench_allocation_vectorized.py [--cases 2000] [--claudes 10,100,1000,10000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+import bench_common
+from allocation_calculator import AllocationSnapshot, allocate_fleet, recommend
+from allocation_vectorized import allocate, fleet_arrays
+
+def random_reset(rng: random.Random, now: datetime, window: timedelta) -> Optional[str]:
+    roll = rng.random()
+    if roll < 0.05:
+        return None
+    if roll < 0.08:
+        return "not a time"
+    if roll < 0.12:
+        return (now - timedelta(minutes=rng.uniform(0, 90))).isoformat()  # Already passed
+    if roll < 0.15:
+        return (now + window + timedelta(minutes=rng.uniform(0, 90))).isoformat()  # Not started
+    return (now + window * rng.random()).isoformat()
+
+def random_case(rng: random.Random, claudes: int):
+    """(snapshot, current_intervals, now) for one random fleet"""
+    now = datetime(2026, 1, 1) + timedelta(seconds=rng.uniform(0, 365 * 86400))
+    names = [f"Claude-{i:05d}" for i in range(claudes)]
+    infos = {name: {'name': name, 'model': 'opus', 'cost_multiplier': rng.choice([1, 3, 5]),
+                    'collaborative_pref': rng.randint(0, 100)} for name in names}
+
+    style = rng.random()
+    usage = {}
+    for name in names + [f"Retired-{i}" for i in range(rng.randint(0, 3))]:
+        if style < 0.1:
+            usage[name] = 0.0                                    # Nobody has used anything
+        elif style < 0.2:
+            usage[name] = float(rng.choice([0, 1000, 1000, 5000]))  # Ties
+        else:
+            usage[name] = 0.0 if rng.random() < 0.2 else rng.lognormvariate(8, 2)
+
+    quota = None
+    if rng.random() > 0.05:
+        quota = {
+            'session_5hour': rng.randint(0, 100), 'week_all': rng.randint(0, 100), 'week_sonnet': 0,
+            'session_5hour_reset': random_reset(rng, now, timedelta(hours=5)),
+            'week_reset': random_reset(rng, now, timedelta(days=7)),
+            'timestamp': now.isoformat(),
+        }
+
+    if rng.random() < 0.5:
+        intervals = {name: rng.choice([None, 900, 1800, 3600, rng.randint(60, 20000)]) for name in names}
+    else:
+        intervals = rng.choice([None, 1800])
+    return AllocationSnapshot(quota, infos, usage), intervals, now
+
+def check_case(seed: int, claudes: int) -> Optional[str]:
+    """None if both engines agree, else a description of the first difference"""
+    snapshot, intervals, now = random_case(random.Random(seed), claudes)
+    vector = allocate(fleet_arrays(snapshot, intervals), snapshot.quota, now)
+    fleet = allocate_fleet(snapshot, now)
+    for i, name in enumerate(vector.names):
+        current = intervals.get(name) if isinstance(intervals, dict) else intervals
+        scalar = recommend(fleet, name, current)
+        multipliers = scalar['multipliers'] or {'fairness': 1.0, 'session_5hour': 1.0, 'weekly': 1.0, 'combined': 1.0}
+        got = {
+            'recommended_interval': int(vector.recommended[i]),
+            'quota_status': str(vector.quota_status[i]),
+            'fairness': float(vector.fairness[i]),
+            'session_5hour': float(vector.session[i]),
+            'weekly': float(vector.weekly[i]),
+            'combined': float(vector.combined[i]),
+        }
+        expected = {'recommended_interval': scalar['recommended_interval'],
+                    'quota_status': scalar['quota_status'], **multipliers}
+        if got != expected:
+            return f"seed {seed}, {name}: vectorized {got} != scalar {expected}"
+    return None
+
+def time_engines(claudes: int, repeats: int, seed: int) -> dict:
+    snapshot, intervals, now = random_case(random.Random(seed), claudes)
+    while not snapshot.quota:
+        seed += 1
+        snapshot, intervals, now = random_case(random.Random(seed), claudes)
+
+    def scalar():
+        fleet = allocate_fleet(snapshot, now)
+        return [recommend(fleet, name, intervals.get(name) if isinstance(intervals, dict) else intervals)
+                for name in snapshot.claudes]
+
+    arrays = fleet_arrays(snapshot, intervals)
+    timings = {
+        'scalar': lambda: scalar(),
+        'vectorized': lambda: allocate(fleet_arrays(snapshot, intervals), snapshot.quota, now),
+        'vectorized_allocate_only': lambda: allocate(arrays, snapshot.quota, now),
+    }
+    results = {'claudes': claudes}
+    for name, run in timings.items():
+        samples = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - started)
+        results[name] = bench_common.percentiles(samples)
+    results['speedup_p50'] = round(results['scalar']['p50_ms'] / max(results['vectorized']['p50_ms'], 1e-6), 1)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=int, default=2000, help="random fleets to compare")
+    parser.add_argument("--case-claudes", type=int, default=20, help="max Claudes per random fleet")
+    parser.add_argument("--claudes", default="10,100,1000,10000",
+                        help="comma-separated fleet sizes to time")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    print(f"=== Equivalence: {args.cases} random fleets ===")
+    rng = random.Random(args.seed)
+    failures = []
+    for case in range(args.cases):
+        failure = check_case(args.seed + case, rng.randint(1, args.case_claudes))
+        if failure:
+            failures.append(failure)
+    print(f"{'✓' if not failures else '✗'} {args.cases - len(failures)}/{args.cases} fleets identical")
+    for failure in failures[:5]:
+        print(f"  {failure}")
+
+    print("\n=== Scaling ===")
+    steps = []
+    for size in [int(size) for size in args.claudes.split(",") if size.strip()]:
+        step = time_engines(size, args.repeats, args.seed)
+        steps.append(step)
+        print(f"  {size:6d} Claudes  scalar p50 {step['scalar']['p50_ms']:9.3f}ms  "
+              f"vectorized p50 {step['vectorized']['p50_ms']:8.3f}ms "
+              f"(allocate only {step['vectorized_allocate_only']['p50_ms']:.3f}ms)  "
+              f"{step['speedup_p50']}x")
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    results = {"params": params, "numpy": np.__version__, "equivalence_failures": failures[:20], "steps": steps}
+    path = bench_common.save_results("allocation-vectorized", results, args.output)
+    print(f"\nResults saved to {path}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the resource-share benchmark scripts.
+
+- Builds throwaway SQLite databases with the production schema and
+  synthetic history
+- Drives the FastAPI app in-process over raw ASGI (no network, no extra
+  client dependencies)
+- Percentile summaries and JSON result files for comparing revisions
+"""
+
+import asyncio
+import json
+import random
+import sqlite3
+import subprocess
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from db_pool import ConnectionPool, utc_now, utc_to_local
+from migrate_add_hourly_rollup import backfill, create_rollup
+from migrate_add_increment_indexes import create_indexes
+
+RESULTS_DIR = Path(__file__).parent / "data" / "benchmarks"
+
+# Production schema (tables were created by hand on the server, migrations
+# added the cost columns, indexes and hourly rollup) - enough to build
+# throwaway benchmark databases
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claude_identities (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    model TEXT,
+    active INTEGER DEFAULT 1,
+    collaborative_pref INTEGER DEFAULT 30,
+    cost_multiplier INTEGER DEFAULT 3
+);
+
+CREATE TABLE IF NOT EXISTS resource_share_increments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    claude_name TEXT NOT NULL,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+    mode TEXT NOT NULL,
+    cache_read_increment INTEGER,
+    context_percentage REAL,
+    weighted_cost INTEGER,
+    recommended_interval INTEGER,
+    cost_delta REAL,
+    normalized_usage REAL
+);
+
+CREATE TABLE IF NOT EXISTS daily_resource_share (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    claude_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    autonomous_tokens INTEGER DEFAULT 0,
+    collaborative_tokens INTEGER DEFAULT 0,
+    total_tokens INTEGER GENERATED ALWAYS AS (autonomous_tokens + collaborative_tokens),
+    last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(claude_name, date)
+);
+
+CREATE TABLE IF NOT EXISTS quota_info (
+    timestamp TEXT PRIMARY KEY,
+    session_5hour INTEGER,
+    week_all INTEGER,
+    week_sonnet INTEGER,
+    session_5hour_reset TEXT,
+    week_reset TEXT
+);
+"""
+
+MODELS = [("opus", 5), ("sonnet", 3), ("haiku", 1)]
+
+def claude_names(count: int):
+    """Synthetic Claude names: Claude-000, Claude-001, ..."""
+    return [f"Claude-{i:03d}" for i in range(count)]
+
+def create_database(db_path: Path, claudes: int = 10, days: int = 7,
+                    samples_per_hour: int = 12, seed: int = 42) -> Path:
+    """
+    Create a database with `claudes` active identities and `days` of
+    increment history ending now, plus a current quota_info row.
+    """
+    rng = random.Random(seed)
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    create_indexes(conn)
+    create_rollup(conn)
+
+    names = claude_names(claudes)
+    conn.executemany("""
+        INSERT INTO claude_identities (name, model, cost_multiplier, collaborative_pref)
+        VALUES (?, ?, ?, ?)
+    """, [(name, *rng.choice(MODELS), rng.choice([20, 30, 40])) for name in names])
+
+    now = utc_now().replace(microsecond=0)  # Increments are UTC, quota_info local time
+    start = now - timedelta(days=days)
+    step = timedelta(seconds=3600 / samples_per_hour) if samples_per_hour else None
+
+    rows = []
+    if step:
+        for name in names:
+            ts = start + timedelta(seconds=rng.uniform(0, step.total_seconds()))
+            while ts < now:
+                mode = "collaboration" if rng.random() < 0.3 else "autonomy"
+                cost_delta = round(rng.uniform(0.0, 0.5), 4)
+                normalized = cost_delta / 3
+                rows.append((
+                    name, ts.strftime("%Y-%m-%d %H:%M:%S"), mode,
+                    int(normalized * 1000), rng.uniform(0, 100),
+                    int(normalized * 3000), rng.choice([900, 1800, 3600]),
+                    cost_delta, normalized
+                ))
+                ts += step
+            if len(rows) > 50000:
+                _insert_increments(conn, rows)
+                rows = []
+    _insert_increments(conn, rows)
+    conn.commit()
+    backfill(conn)
+    conn.execute("ANALYZE")
+
+    conn.execute("""
+        INSERT INTO quota_info
+        (timestamp, session_5hour, week_all, week_sonnet, session_5hour_reset, week_reset)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (utc_to_local(now).isoformat(), 35, 50, 20,
+          utc_to_local(now + timedelta(hours=2)).isoformat(), utc_to_local(now + timedelta(days=3)).isoformat()))
+
+    conn.commit()
+    conn.close()
+    return db_path
+
+def _insert_increments(conn, rows):
+    conn.executemany("""
+        INSERT INTO resource_share_increments
+        (claude_name, timestamp, mode, cache_read_increment, context_percentage,
+         weighted_cost, recommended_interval, cost_delta, normalized_usage)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+def point_server_at(server, db_path: Path):
+    """Redirect resource_share_server's database and log file into a scratch dir"""
+    db_path = Path(db_path)
+    server.DB_PATH = db_path
+    server.LOG_PATH = db_path.with_suffix(".log")
+    server.db_pool.close()
+    server.db_pool = ConnectionPool(db_path, readers=server.DB_WORKERS)
+    server.identity_cache.invalidate()
+    server.rolling_usage.reset()
+    server.dashboard_cache.invalidate()
+    server.dashboard_data_cache.invalidate()
+    server.allocation_cache.invalidate()
+
+def server_lifespan(server):
+    """
+    The app's startup/shutdown as an async context manager (identity cache,
+    logging pipeline, write-behind queue, quota watcher), like uvicorn runs it
+    """
+    return server.app.router.lifespan_context(server.app)
+
+class AsgiClient:
+    """Minimal in-process HTTP client for an ASGI app"""
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _scope(method: str, path: str, body: bytes, headers: dict) -> dict:
+        path, _, query = path.partition("?")
+        raw_headers = [(b"host", b"localhost")]
+        if body:
+            raw_headers.append((b"content-length", str(len(body)).encode()))
+        for key, value in (headers or {}).items():
+            raw_headers.append((key.lower().encode(), value.encode()))
+
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("127.0.0.1", 8765),
+        }
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: dict = None) -> tuple:
+        """Send one request; returns (status, headers, body)"""
+        scope = self._scope(method, path, body, headers)
+        sent = False
+        disconnect = asyncio.Event()
+        response = {"status": None, "headers": {}, "body": []}
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = {
+                    k.decode().lower(): v.decode() for k, v in message.get("headers", [])
+                }
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                if not message.get("more_body"):
+                    disconnect.set()
+
+        await self.app(scope, receive, send)
+        return response["status"], response["headers"], b"".join(response["body"])
+
+    async def stream(self, path: str, on_chunk, stop: asyncio.Event, headers: dict = None) -> int:
+        """
+        GET a streaming response, calling on_chunk(bytes) for each body
+        chunk until the response ends or `stop` is set (the client then
+        disconnects). Returns the status.
+        """
+        scope = self._scope("GET", path, b"", headers)
+        sent = False
+        status = None
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await stop.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if stop.is_set():
+                raise OSError("client disconnected")
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                on_chunk(message.get("body", b""))
+                if not message.get("more_body"):
+                    stop.set()
+
+        try:
+            await self.app(scope, receive, send)
+        except OSError:
+            pass
+        return status
+
+    async def get(self, path: str, headers: dict = None):
+        return await self.request("GET", path, headers=headers)
+
+    async def post_json(self, path: str, payload, headers: dict = None):
+        all_headers = {"content-type": "application/json", **(headers or {})}
+        return await self.request("POST", path, json.dumps(payload).encode(), all_headers)
+
+def percentiles(samples) -> dict:
+    """p50/p95/p99/max (milliseconds) for a list of latencies in seconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+def git_revision() -> str:
+    """Short commit hash of the working tree (or 'unknown')"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def save_results(name: str, results: dict, output: Path = None) -> Path:
+    """Write results as JSON (default: data/benchmarks/<name>-<rev>.json)"""
+    revision = git_revision()
+    payload = {
+        "benchmark": name,
+        "revision": revision,
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        **results,
+    }
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"{name}-{revision}.json"
+    output = Path(output)
+    output.write_text(json.dumps(payload, indent=2) + "\n")
+    return output
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Event-loop concurrency benchmark for the resource-share server
+
+Runs increment POSTs concurrently with dashboard renders and reports
+increment latency percentiles twice:
+- inline:   DB work executed directly on the event loop (the old behaviour)
+- executor: DB work dispatched to the server's DB thread pool
+
+Usage: python3 bench_concurrency.py [--claudes 20] [--days 7] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import bench_common
+import resource_share_server as server
+
+async def run_inline(func, *args):
+    """Stand-in for server.run_db that blocks the event loop like the old handlers"""
+    return func(*args)
+
+async def run_scenario(client, claudes, duration, writers, write_interval, readers):
+    """Concurrent writers + dashboard readers; returns latency samples"""
+    increment_latencies = []
+    dashboard_latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def writer(index):
+        # Open-loop schedule: latency is measured from when the request was
+        # due, so time spent waiting for a blocked event loop is counted
+        nonlocal errors
+        name = claudes[index % len(claudes)]
+        due = time.perf_counter()
+        while due < deadline:
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            status, _, _ = await client.post_json("/resource-share/increment", {
+                "claude_name": name, "mode": "autonomy", "cost_delta": 0.01
+            })
+            increment_latencies.append(time.perf_counter() - due)
+            errors += status != 200
+            due += write_interval
+
+    async def reader():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _, _ = await client.get("/dashboard/html")
+            dashboard_latencies.append(time.perf_counter() - start)
+            errors += status != 200
+
+    await asyncio.gather(
+        *(writer(i) for i in range(writers)),
+        *(reader() for _ in range(readers)),
+    )
+
+    return {
+        "increment": bench_common.percentiles(increment_latencies),
+        "dashboard": bench_common.percentiles(dashboard_latencies),
+        "errors": errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--claudes", type=int, default=20)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--samples-per-hour", type=int, default=60)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--write-interval", type=float, default=0.05)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = bench_common.create_database(
+            Path(tmp) / "bench.db", args.claudes, args.days, args.samples_per_hour
+        )
+        bench_common.point_server_at(server, db_path)
+        client = bench_common.AsgiClient(server.app)
+        claudes = bench_common.claude_names(args.claudes)
+
+        executor_run_db = server.run_db
+        results = {}
+        for label, runner in (("inline", run_inline), ("executor", executor_run_db)):
+            server.run_db = runner
+            results[label] = asyncio.run(run_scenario(
+                client, claudes, args.duration, args.writers,
+                args.write_interval, args.readers
+            ))
+        server.run_db = executor_run_db
+
+    inline_p99 = results["inline"]["increment"].get("p99_ms")
+    executor_p99 = results["executor"]["increment"].get("p99_ms")
+
+    print(f"\n=== Increment latency with {args.readers} concurrent dashboard readers ===")
+    for label, result in results.items():
+        inc = result["increment"]
+        print(f"  {label:9s} p50 {inc['p50_ms']:8.2f}ms  p99 {inc['p99_ms']:8.2f}ms  "
+              f"({inc['count']} requests, {result['errors']} errors)")
+    if inline_p99 and executor_p99:
+        print(f"  p99 improvement: {inline_p99 / executor_p99:.1f}x")
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    path = bench_common.save_results("concurrency", {"params": params, "results": results}, args.output)
+    print(f"\nResults saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Dashboard scaling benchmark: fleet status query cost vs number of Claudes
+
+For each fleet size, builds a database with that many active identities and
+compares:
+- per_claude: the previous get_all_claudes_status (two grouped queries per
+  Claude, `date(timestamp) = ?` for today), kept as the reference implementation
+- grouped:    two grouped queries for the whole fleet (fleet_usage_rows,
+  what get_all_claudes_status falls back to before startup)
+- rolling:    the server's current get_all_claudes_status, reading the
+  in-memory rolling counters after a rebuild from the database
+
+All three must return identical output. The reference is timed once (it is
+slow at large fleets: two scans per Claude); the other two and the
+/dashboard/data endpoint end to end are timed --repeat times. Also reports
+what one dashboard refresh transfers: the server-rendered page vs the JSON
+data, uncompressed and gzipped, and a revalidation of unchanged data.
+
+Usage: python3 bench_dashboard.py [--claudes 10,100,1000] [--days 30] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import math
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import bench_common
+import resource_share_server as server
+from db_pool import sql_timestamp
+
+def per_claude_status():
+    """Reference: the N+1 implementation (two queries per active Claude)"""
+    if server.identity_cache.loaded_at is None:
+        server.load_identities()
+    results = []
+    with server.db_pool.reader() as conn:
+        cursor = conn.cursor()
+        for claude in server.identity_cache.active():
+            name = claude['name']
+            today = server.date.today().isoformat()
+            cursor.execute("""
+                SELECT mode,
+                       SUM(normalized_usage) as total_usage,
+                       MAX(timestamp) as last_activity,
+                       MAX(recommended_interval) as current_interval
+                FROM resource_share_increments
+                WHERE claude_name = ? AND date(timestamp) = ?
+                GROUP BY mode
+            """, (name, today))
+            today_rows = cursor.fetchall()
+
+            week_start = sql_timestamp(server.datetime.now() - timedelta(days=7))
+            cursor.execute("""
+                SELECT mode,
+                       SUM(normalized_usage) as total_usage
+                FROM resource_share_increments
+                WHERE claude_name = ? AND timestamp >= ?
+                GROUP BY mode
+            """, (name, week_start))
+            weekly_rows = cursor.fetchall()
+
+            results.append(server.claude_status(claude, today_rows, weekly_rows))
+    return results
+
+@contextmanager
+def frozen_clock():
+    """
+    Pin the server's notion of "now" so both implementations see the same
+    7-day window, and report next_prompt_due as the absolute due time.
+    "Now" is on a 5-minute boundary, where the rolling counters' bucketed
+    window start is exact
+    """
+    now = datetime.now()
+    frozen = now.replace(minute=now.minute - now.minute % 5, second=0, microsecond=0)
+
+    class FrozenDate(date):
+        @classmethod
+        def today(cls):
+            return frozen.date()
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return frozen
+
+    saved = server.date, server.datetime, server.format_time_until
+    server.date, server.datetime = FrozenDate, FrozenDatetime
+    server.format_time_until = lambda due: due.isoformat()
+    try:
+        yield
+    finally:
+        server.date, server.datetime, server.format_time_until = saved
+
+def same_status(expected, actual) -> bool:
+    """Exact match, except usage sums may differ in the last float bits (summation order)"""
+    if len(expected) != len(actual):
+        return False
+    for want, got in zip(expected, actual):
+        if want.keys() != got.keys():
+            return False
+        for key, value in want.items():
+            if isinstance(value, float) or isinstance(got[key], float):
+                if not math.isclose(value, got[key], rel_tol=1e-9, abs_tol=1e-12):
+                    return False
+            elif value != got[key]:
+                return False
+    return True
+
+def time_call(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return bench_common.percentiles(samples)
+
+async def time_dashboard(repeat: int) -> dict:
+    client = bench_common.AsgiClient(server.app)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        status, _, _ = await client.get("/dashboard/data")
+        samples.append(time.perf_counter() - started)
+        assert status == 200, status
+    return bench_common.percentiles(samples)
+
+async def refresh_bytes() -> dict:
+    """Response body bytes for one dashboard refresh, per variant"""
+    client = bench_common.AsgiClient(server.app)
+    gzip = {"accept-encoding": "gzip"}
+    sizes = {}
+    for label, path, headers in [
+        ("html", "/dashboard/html", None),
+        ("html_gzip", "/dashboard/html", gzip),
+        ("data", "/dashboard/data", None),
+        ("data_gzip", "/dashboard/data", gzip),
+    ]:
+        status, response_headers, body = await client.get(path, headers)
+        assert status == 200, status
+        sizes[label] = len(body)
+    status, _, body = await client.get("/dashboard/data", {"if-none-match": response_headers["etag"]})
+    assert status == 304, status
+    sizes["data_unchanged"] = len(body)
+    return sizes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--claudes", default="10,100,1000", help="comma-separated fleet sizes")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--samples-per-hour", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.claudes.split(",") if size.strip()]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            db_path = bench_common.create_database(
+                Path(tmp) / f"dashboard-{size}.db", size, args.days, args.samples_per_hour
+            )
+            bench_common.point_server_at(server, db_path)
+
+            with frozen_clock():
+                started = time.perf_counter()
+                reference = per_claude_status()
+                reference_seconds = time.perf_counter() - started
+                grouped = server.get_all_claudes_status()  # Counters not loaded yet: SQL path
+                grouped_timing = time_call(server.get_all_claudes_status, args.repeat)
+
+                started = time.perf_counter()
+                server.rebuild_rolling_usage()
+                rebuild_seconds = time.perf_counter() - started
+                rolling = server.get_all_claudes_status()
+            if not same_status(reference, grouped):
+                raise SystemExit(f"grouped fleet status differs from the reference at {size} Claudes")
+            if not same_status(reference, rolling):
+                raise SystemExit(f"rolling-counter fleet status differs from the reference at {size} Claudes")
+
+            results[size] = {
+                "equivalent": True,
+                "per_claude": bench_common.percentiles([reference_seconds]),
+                "grouped": grouped_timing,
+                "rolling_rebuild": bench_common.percentiles([rebuild_seconds]),
+                "rolling": time_call(server.get_all_claudes_status, args.repeat),
+                "dashboard": asyncio.run(time_dashboard(args.repeat)),
+                "refresh_bytes": asyncio.run(refresh_bytes()),
+            }
+        server.db_pool.close()
+
+    print(f"\n=== Fleet status, {args.days} days of history at {args.samples_per_hour} samples/hour ===")
+    for size, result in results.items():
+        before = result["per_claude"]["p50_ms"]
+        grouped = result["grouped"]["p50_ms"]
+        rolling = result["rolling"]["p50_ms"]
+        print(f"  {size:5d} Claudes  per-claude {before:9.2f}ms  grouped {grouped:9.2f}ms  "
+              f"rolling {rolling:7.2f}ms ({before / rolling:7.1f}x, rebuild "
+              f"{result['rolling_rebuild']['p50_ms']:.0f}ms)  /dashboard/data p50 {result['dashboard']['p50_ms']:9.2f}ms")
+
+    print("\n=== Bytes per dashboard refresh (html page vs JSON data; gzipped; unchanged data) ===")
+    for size, result in results.items():
+        sizes = result["refresh_bytes"]
+        print(f"  {size:5d} Claudes  html {sizes['html']:9d} ({sizes['html_gzip']:7d} gz)  "
+              f"data {sizes['data']:9d} ({sizes['data_gzip']:7d} gz)  unchanged {sizes['data_unchanged']}")
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    path = bench_common.save_results("dashboard", {"params": params, "results": results}, args.output)
+    print(f"\nResults saved to {path}")
+
+if __name__ == "__main__":
+    main()
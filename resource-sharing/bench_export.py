@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Export benchmark for /resource/increments
+
+Builds a temporary database with --claudes x --days of synthetic history and
+starts resource_share_server.app in-process, then:
+- streams the whole table as NDJSON (format=ndjson), reporting rows/s and
+  the Python heap peak (tracemalloc) while streaming
+- compares with a single-response baseline: one fetchall() of the same rows
+  serialized as one JSON body (what the export cost before keyset streaming)
+- measures increment latency with --writers timers posting while the export
+  runs vs. while idle, to show a long export does not hold up ingest
+
+Usage: python3 bench_export.py [--claudes 50] [--days 14] [--samples-per-hour 12]
+                               [--writers 10] [--write-interval 0.05]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import bench_common
+import increment_history
+import resource_share_server as server
+
+EXPORT_PATH = "/resource/increments?format=ndjson"
+
+async def stream_export() -> dict:
+    """Stream the full export once; returns rows, bytes and seconds"""
+    client = bench_common.AsgiClient(server.app)
+    received = {"bytes": 0, "rows": 0}
+
+    def on_chunk(chunk: bytes):
+        received["bytes"] += len(chunk)
+        received["rows"] += chunk.count(b"\n")
+
+    started = time.perf_counter()
+    status = await client.stream(EXPORT_PATH, on_chunk, asyncio.Event(), {"accept-encoding": "identity"})
+    elapsed = time.perf_counter() - started
+    return {"status": status, "seconds": elapsed, **received}
+
+def fetchall_export(db_path: Path) -> dict:
+    """Baseline: every row in one query, serialized as one JSON document"""
+    conn = sqlite3.connect(db_path)
+    started = time.perf_counter()
+    sql, params = increment_history.page_query(limit=-1)
+    rows = conn.execute(sql, params).fetchall()
+    body = json.dumps([dict(zip(increment_history.COLUMNS, row)) for row in rows]).encode()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return {"seconds": elapsed, "bytes": len(body), "rows": len(rows)}
+
+def traced(run):
+    """(result, peak traced bytes) for run()"""
+    tracemalloc.start()
+    try:
+        result = run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+async def ingest_latency(claudes, args, during_export: bool, seed: int) -> dict:
+    """Increment latency from --writers timers, optionally while an export streams"""
+    rng = random.Random(seed)
+    client = bench_common.AsgiClient(server.app)
+    latencies = []
+    export = {}
+
+    async def writer(done):
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.post_json("/resource-share/increment", {
+                "claude_name": rng.choice(claudes),
+                "mode": "autonomy",
+                "cost_delta": round(rng.uniform(0.0, 0.05), 6),
+                "context_percentage": 50.0,
+                "current_interval": 1800,
+            })
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(args.write_interval)
+
+    async def driver(done):
+        if during_export:
+            export.update(await stream_export())
+        else:
+            await asyncio.sleep(args.idle_seconds)
+        done.set()
+
+    async with bench_common.server_lifespan(server):
+        done = asyncio.Event()
+        await asyncio.gather(driver(done), *(writer(done) for _ in range(args.writers)))
+    return {"increment": bench_common.percentiles(latencies), "export": export}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--claudes", type=int, default=50)
+    parser.add_argument("--days", type=int, default=14, help="days of synthetic history")
+    parser.add_argument("--samples-per-hour", type=int, default=12)
+    parser.add_argument("--writers", type=int, default=10, help="concurrent increment posters")
+    parser.add_argument("--write-interval", type=float, default=0.05,
+                        help="think time between increments per writer")
+    parser.add_argument("--idle-seconds", type=float, default=5.0,
+                        help="length of the idle (no export) latency run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = bench_common.create_database(
+            Path(tmp) / "export.db", args.claudes, args.days, args.samples_per_hour, args.seed
+        )
+        bench_common.point_server_at(server, db_path)
+        claudes = bench_common.claude_names(args.claudes)
+
+        # Throughput untraced, heap peak in a second traced run
+        stream = asyncio.run(stream_export())
+        _, stream_peak = traced(lambda: asyncio.run(stream_export()))
+        baseline = fetchall_export(db_path)
+        _, baseline_peak = traced(lambda: fetchall_export(db_path))
+
+        idle = asyncio.run(ingest_latency(claudes, args, False, args.seed))
+        busy = asyncio.run(ingest_latency(claudes, args, True, args.seed))
+        server.db_pool.close()
+
+    results = {
+        "rows": stream["rows"],
+        "stream": {
+            "status": stream["status"],
+            "bytes": stream["bytes"],
+            "seconds": round(stream["seconds"], 3),
+            "rows_per_s": round(stream["rows"] / stream["seconds"]),
+            "peak_heap_bytes": stream_peak,
+        },
+        "fetchall": {
+            "bytes": baseline["bytes"],
+            "seconds": round(baseline["seconds"], 3),
+            "rows_per_s": round(baseline["rows"] / baseline["seconds"]),
+            "peak_heap_bytes": baseline_peak,
+        },
+        "ingest_idle": idle["increment"],
+        "ingest_during_export": busy["increment"],
+    }
+
+    print(f"\n=== Export of {results['rows']} increments ===")
+    for name in ("stream", "fetchall"):
+        run = results[name]
+        print(f"  {name:8s}  {run['seconds']:7.3f}s  {run['rows_per_s']:9d} rows/s  "
+              f"{run['bytes'] / 1e6:7.1f}MB body  peak heap {run['peak_heap_bytes'] / 1e6:7.1f}MB")
+    print(f"\n=== Increment latency ({args.writers} writers) ===")
+    for name in ("ingest_idle", "ingest_during_export"):
+        inc = results[name]
+        print(f"  {name:22s}  n={inc.get('count', 0):6d}  p50 {inc.get('p50_ms', 0):7.2f}ms  "
+              f"p99 {inc.get('p99_ms', 0):7.2f}ms")
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    path = bench_common.save_results("export", {"params": params, **results}, args.output)
+    print(f"\nResults saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Load-generation benchmark for the resource-share server
+
+Starts resource_share_server.app in-process (including its startup and
+shutdown hooks) against a temporary database, then for each fleet size:
+- simulates one autonomous timer per Claude, each posting an increment every
+  --sample-interval seconds (open loop, random phase)
+- runs concurrent dashboard readers (/dashboard/data, what the dashboard
+  page polls) and summary readers
+  (/resource/summary, /resource/today/<name>)
+- optionally keeps --stream-clients live dashboards connected to
+  /dashboard/stream (Server-Sent Events)
+
+and reports achieved vs offered throughput, p50/p95/p99 latency per request
+type, lock waits on the server's SQLite connection pool, and how many times
+the dashboard data was computed for all its readers and streams. A step counts
+as sustained when throughput keeps up with the offered rate and increment
+p99 stays under --slo-ms.
+
+Usage: python3 bench_load.py [--claudes 10,50,200] [--sample-interval 1.0]
+                             [--duration 20] [--write-behind] [--stream-clients 50]
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import bench_common
+
+server = None  # resource_share_server, imported in main() once the environment is set
+
+def pool_delta(before: dict, after: dict) -> dict:
+    """Lock-wait counters accumulated during one step"""
+    return {
+        "writer_checkouts": after["writer_checkouts"] - before["writer_checkouts"],
+        "writer_waits": after["writer_waits"] - before["writer_waits"],
+        "writer_wait_ms": round((after["writer_wait_seconds"] - before["writer_wait_seconds"]) * 1000, 3),
+        "reader_checkouts": after["reader_checkouts"] - before["reader_checkouts"],
+        "reader_waits": after["reader_waits"] - before["reader_waits"],
+        "reader_wait_ms": round((after["reader_wait_seconds"] - before["reader_wait_seconds"]) * 1000, 3),
+    }
+
+async def run_step(claudes, args, seed: int) -> dict:
+    """One fleet size: timers + readers for args.duration seconds"""
+    rng = random.Random(seed)
+    client = bench_common.AsgiClient(server.app)
+    latencies = {"increment": [], "dashboard": [], "summary": []}
+    errors = Counter()
+    last_increment = 0.0
+
+    async def timer(name):
+        nonlocal last_increment
+        # Latency is measured from when the sample was due, so queueing
+        # behind a saturated server shows up in the numbers
+        due = start + rng.uniform(0, args.sample_interval)
+        while due < deadline:
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            status, _, _ = await client.post_json("/resource-share/increment", {
+                "claude_name": name,
+                "mode": "collaboration" if rng.random() < 0.3 else "autonomy",
+                "cost_delta": round(rng.uniform(0.0, 0.05), 6),
+                "context_percentage": round(rng.uniform(0, 100), 1),
+                "current_interval": 1800,
+            })
+            last_increment = time.perf_counter()
+            latencies["increment"].append(last_increment - due)
+            errors["increment"] += status != 200
+            due += args.sample_interval
+
+    async def reader(kind, paths):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status, _, _ = await client.get(rng.choice(paths))
+            latencies[kind].append(time.perf_counter() - started)
+            errors[kind] += status != 200
+            await asyncio.sleep(args.reader_interval)
+
+    stream_events = Counter()
+
+    def count_events(chunk: bytes):
+        stream_events["snapshot"] += chunk.count(b"event: snapshot")
+        stream_events["delta"] += chunk.count(b"event: delta")
+
+    async def watcher(stop):
+        status = await client.stream("/dashboard/stream", count_events, stop)
+        errors["stream"] += status != 200
+
+    async def hang_up(stop):
+        await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+        stop.set()
+
+    summary_paths = ["/resource/summary"] + [f"/resource/today/{name}" for name in claudes]
+
+    async with bench_common.server_lifespan(server):
+        pool_before = server.db_pool.stats()
+        renders_before = server.dashboard_data_cache.renders
+        start = time.perf_counter()
+        deadline = start + args.duration
+        stop_streams = asyncio.Event()
+        await asyncio.gather(
+            *(timer(name) for name in claudes),
+            *(reader("dashboard", ["/dashboard/data"]) for _ in range(args.dashboard_readers)),
+            *(reader("summary", summary_paths) for _ in range(args.summary_readers)),
+            *(watcher(stop_streams) for _ in range(args.stream_clients)),
+            hang_up(stop_streams),
+        )
+        elapsed = time.perf_counter() - start
+        pool_after = server.db_pool.stats()
+        dashboard_renders = server.dashboard_data_cache.renders - renders_before
+
+    offered = len(claudes) / args.sample_interval
+    # Throughput over the timer window (readers may still be finishing a request)
+    achieved = len(latencies["increment"]) / (max(deadline, last_increment) - start)
+    increment = bench_common.percentiles(latencies["increment"])
+    return {
+        "claudes": len(claudes),
+        "elapsed_s": round(elapsed, 3),
+        "offered_rps": round(offered, 2),
+        "achieved_rps": round(achieved, 2),
+        "sustained": (achieved >= 0.95 * offered and not errors["increment"]
+                      and increment.get("p99_ms", 0) <= args.slo_ms),
+        "latency": {kind: bench_common.percentiles(samples) for kind, samples in latencies.items()},
+        "errors": dict(errors),
+        "lock_waits": pool_delta(pool_before, pool_after),
+        "dashboard_renders": dashboard_renders,
+        "stream": {"clients": args.stream_clients, **stream_events},
+    }
+
+def main():
+    global server
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--claudes", default="10,50,200",
+                        help="comma-separated fleet sizes, one step each")
+    parser.add_argument("--sample-interval", type=float, default=1.0,
+                        help="seconds between increments per timer (production: 30)")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per step")
+    parser.add_argument("--dashboard-readers", type=int, default=1)
+    parser.add_argument("--summary-readers", type=int, default=1)
+    parser.add_argument("--stream-clients", type=int, default=0,
+                        help="dashboards connected to /dashboard/stream")
+    parser.add_argument("--reader-interval", type=float, default=0.5,
+                        help="think time between reads per reader")
+    parser.add_argument("--days", type=int, default=2, help="days of synthetic history")
+    parser.add_argument("--samples-per-hour", type=int, default=12)
+    parser.add_argument("--slo-ms", type=float, default=250.0, help="increment p99 target")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="run with RESOURCE_SHARE_WRITE_BEHIND=1")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    # The server reads its configuration at import time
+    os.environ["RESOURCE_SHARE_WRITE_BEHIND"] = "1" if args.write_behind else "0"
+    server = importlib.import_module("resource_share_server")
+
+    sizes = [int(size) for size in args.claudes.split(",") if size.strip()]
+    steps = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            db_path = bench_common.create_database(
+                Path(tmp) / f"load-{size}.db", size, args.days, args.samples_per_hour, args.seed
+            )
+            bench_common.point_server_at(server, db_path)
+            steps.append(asyncio.run(run_step(bench_common.claude_names(size), args, args.seed)))
+        server.db_pool.close()
+
+    mode = "write-behind" if args.write_behind else "synchronous"
+    print(f"\n=== Load steps ({mode} ingest, {args.sample_interval}s per timer, "
+          f"{args.dashboard_readers} dashboard + {args.summary_readers} summary readers, "
+          f"{args.stream_clients} streams) ===")
+    for step in steps:
+        inc = step["latency"]["increment"]
+        dash = step["latency"]["dashboard"]
+        waits = step["lock_waits"]
+        print(f"  {step['claudes']:5d} Claudes  {step['achieved_rps']:8.1f}/{step['offered_rps']:.1f} rps  "
+              f"inc p50 {inc.get('p50_ms', 0):7.2f}ms p95 {inc.get('p95_ms', 0):7.2f}ms "
+              f"p99 {inc.get('p99_ms', 0):8.2f}ms  dash p99 {dash.get('p99_ms', 0):8.2f}ms  "
+              f"writer waits {waits['writer_waits']} ({waits['writer_wait_ms']:.0f}ms)  "
+              f"dashboard renders {step['dashboard_renders']} "
+              f"(stream deltas {step['stream'].get('delta', 0)})  "
+              f"{'ok' if step['sustained'] else 'NOT SUSTAINED'}")
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    path = bench_common.save_results("load", {"params": params, "steps": steps}, args.output)
+    print(f"\nResults saved to {path}")
+
+if __name__ == "__main__":
+    main()
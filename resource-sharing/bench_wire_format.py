@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Wire format benchmark: JSON/pydantic vs compact binary increments
+
+Compares bytes on the wire and per-request parse/encode cost for a single
+increment and for batches, using the same code paths as the server:
+- json:   json.loads + ResourceIncrement(...) / json.dumps of the response dict
+- binary: wire_format.decode_increments + ResourceIncrement(...) / encode_results
+
+Usage: python3 bench_wire_format.py [--iterations 20000] [--batch 100]
+"""
+
+import argparse
+import json
+import random
+import timeit
+from pathlib import Path
+
+import bench_common
+import wire_format
+from resource_share_server import ResourceIncrement, ResourceIncrementBatch
+
+def sample_increments(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    names = ["Sparkle-Orange", "Sparkle-Apple", "Quill-Sonnet", "Delta-Haiku"]
+    return [{
+        "claude_name": rng.choice(names),
+        "mode": rng.choice(wire_format.MODES),
+        "cost_delta": round(rng.uniform(0, 0.5), 6),
+        # Quarter percents are exact in the binary format's f32 field
+        "context_percentage": round(rng.uniform(0, 100) * 4) / 4,
+        "current_interval": rng.choice([900, 1800, 3600]),
+    } for _ in range(count)]
+
+def sample_response(item):
+    return {
+        "status": "success",
+        "claude_name": item["claude_name"],
+        "cost_recorded": item["cost_delta"],
+        "tokens_recorded": 123,
+        "recommended_interval": 1800,
+        "current_interval": item["current_interval"],
+        "multipliers": {"emergency_mode": 1.0},
+        "quota_status": "emergency_constant_interval",
+    }
+
+def time_per_call(func, iterations: int) -> float:
+    """Best-of-3 microseconds per call"""
+    return min(timeit.repeat(func, number=iterations, repeat=3)) / iterations * 1e6
+
+def measure(increments, iterations: int) -> dict:
+    batch = len(increments) > 1
+    json_body = json.dumps({"increments": increments} if batch else increments[0]).encode()
+    binary_body = wire_format.encode_increments(increments)
+    responses = [sample_response(item) for item in increments]
+    json_response = {"status": "success", "results": responses} if batch else responses[0]
+
+    if batch:
+        def parse_json():
+            return ResourceIncrementBatch(**json.loads(json_body))
+
+        def parse_binary():
+            return ResourceIncrementBatch(increments=wire_format.decode_increments(binary_body))
+    else:
+        def parse_json():
+            return ResourceIncrement(**json.loads(json_body))
+
+        def parse_binary():
+            return ResourceIncrement(**wire_format.decode_increments(binary_body)[0])
+
+    # The models must come out identical either way
+    assert parse_json() == parse_binary()
+
+    return {
+        "increments": len(increments),
+        "request_bytes": {"json": len(json_body), "binary": len(binary_body)},
+        "response_bytes": {
+            "json": len(json.dumps(json_response).encode()),
+            "binary": len(wire_format.encode_results(responses)),
+        },
+        "parse_us": {
+            "json": round(time_per_call(parse_json, iterations), 3),
+            "binary": round(time_per_call(parse_binary, iterations), 3),
+            "binary_decode_only": round(time_per_call(
+                lambda: wire_format.decode_increments(binary_body), iterations), 3),
+        },
+        "encode_response_us": {
+            "json": round(time_per_call(lambda: json.dumps(json_response).encode(), iterations), 3),
+            "binary": round(time_per_call(lambda: wire_format.encode_results(responses), iterations), 3),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    results = {
+        "single": measure(sample_increments(1), args.iterations),
+        "batch": measure(sample_increments(args.batch), max(1, args.iterations // args.batch)),
+    }
+
+    for label, result in results.items():
+        print(f"\n=== {label} ({result['increments']} increments) ===")
+        for key in ("request_bytes", "response_bytes", "parse_us", "encode_response_us"):
+            values = result[key]
+            ratio = values["json"] / values["binary"] if values["binary"] else float("inf")
+            print(f"  {key:20s} json {values['json']:>10}  binary {values['binary']:>10}  ({ratio:.1f}x)")
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    path = bench_common.save_results("wire_format", {"params": params, "results": results}, args.output)
+    print(f"\nResults saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+In-process change feed for the webhook server
+
+A tiny asyncio pub/sub: writers publish events ("quota", ...) and every
+subscriber (streaming clients, caches) gets its own bounded queue. Each
+event bumps a monotonically increasing version number that consumers can
+use as a cheap "has anything changed?" check.
+
+Must be used from the event loop thread; DB threads hand results back to
+the loop before publishing.
+
+stop_task() cancels a consumer's background task. On Python 3.11
+asyncio.wait_for() swallows a cancellation that lands just as its queue
+get completes, so a single cancel() can leave a `wait_for(events.get())`
+loop running (and shutdown hanging) whenever an event arrives at the same
+moment; it keeps cancelling until the task has actually finished.
+"""
+
+import asyncio
+
+DEFAULT_QUEUE_SIZE = 100
+CANCEL_RETRY_SECONDS = 0.1
+
+class ChangeFeed:
+    """Fan-out of change events to any number of asyncio subscribers"""
+
+    def __init__(self):
+        self.version = 0
+        self._subscribers = set()
+
+    def publish(self, kind: str, **data) -> dict:
+        """Bump the version and deliver an event to every subscriber"""
+        self.version += 1
+        event = {"kind": kind, "version": self.version, **data}
+        for subscriber in list(self._subscribers):
+            if subscriber.full():
+                # Slow consumer: drop its oldest event rather than block publishers
+                subscriber.get_nowait()
+            subscriber.put_nowait(event)
+        return event
+
+    def subscribe(self, maxsize: int = DEFAULT_QUEUE_SIZE) -> asyncio.Queue:
+        subscriber = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: asyncio.Queue):
+        self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+async def stop_task(task: asyncio.Task):
+    """Cancel `task` and wait for it to finish"""
+    while not task.done():
+        task.cancel()
+        await asyncio.wait({task}, timeout=CANCEL_RETRY_SECONDS)
+    if not task.cancelled() and task.exception() is not None:
+        raise task.exception()
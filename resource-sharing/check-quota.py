@@ -7,10 +7,11 @@ Admin-only tool - requires tmux orchestration of Claude CLI.
 import subprocess
 import time
 import re
-import sqlite3
 from datetime import datetime
 from pathlib import Path
 
+from db_pool import connect
+
 # Paths
 SCRIPT_DIR = Path(__file__).parent
 DB_PATH = SCRIPT_DIR / "data" / "resource_tracking.db"
@@ -19,7 +20,7 @@ CAPTURES_DIR = SCRIPT_DIR / "data" / "captures"
 
 def setup_database():
     """Create quota_info table if it doesn't exist."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -202,7 +203,7 @@ def get_usage_via_tmux():
 
 def store_quota(data: dict):
     """Store quota data in database."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cursor = conn.cursor()
 
     timestamp = datetime.now().isoformat()
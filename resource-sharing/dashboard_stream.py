@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events fan-out for the dashboard (/dashboard/stream)
+
+One background task watches the change feed and, when increments, quota
+rows or identity edits arrive, recomputes the dashboard data once -
+at most every `min_interval` seconds, and at least every `max_interval`
+while anyone is connected so relative times ("in 12min") stay current. It
+diffs the result against the previous snapshot and pushes only what
+changed to every connected client. However many dashboards are open, a
+change costs one computation.
+
+Events (each `data:` is JSON):
+- snapshot: the full get_dashboard_data() payload, sent on connect and
+  to any client that fell behind
+- delta:    changed keys only - `claudes` (full status of each Claude
+  that changed), `removed` (names), `order` (names, when the
+  set of Claudes changed), `quota`, `quota_windows`, `generated_at`
+
+Comment lines (": keepalive") are sent every `keepalive` seconds so idle
+connections stay open through proxies and dead ones are noticed.
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from change_feed import ChangeFeed, stop_task
+
+CLIENT_QUEUE_SIZE = 16  # Events buffered per client before it is resynced with a snapshot
+KEEPALIVE_SECONDS = 15
+RETRY_MS = 5000  # EventSource reconnect delay
+
+def dashboard_delta(old: dict, new: dict) -> dict:
+    """What changed between two get_dashboard_data() payloads ({} if nothing)"""
+    delta = {}
+    for key in ("quota", "quota_windows"):
+        if old.get(key) != new.get(key):
+            delta[key] = new.get(key)
+
+    old_claudes = {claude['name']: claude for claude in old['claudes']}
+    new_names = [claude['name'] for claude in new['claudes']]
+    changed = [claude for claude in new['claudes'] if old_claudes.get(claude['name']) != claude]
+    if changed:
+        delta['claudes'] = changed
+    removed = sorted(set(old_claudes) - set(new_names))
+    if removed:
+        delta['removed'] = removed
+    if new_names != [claude['name'] for claude in old['claudes']]:
+        delta['order'] = new_names
+
+    if delta:
+        delta['generated_at'] = new['generated_at']
+    return delta
+
+def sse_event(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+class DashboardStream:
+    """Shared dashboard computation fanned out to SSE clients"""
+
+    def __init__(self, feed: ChangeFeed, compute: Callable[[], Awaitable[dict]],
+                 min_interval: float, max_interval: float, keepalive: float = KEEPALIVE_SECONDS):
+        self.feed = feed
+        self.compute = compute  # Returns the current get_dashboard_data() payload
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.keepalive = keepalive
+        self.snapshot: Optional[dict] = None
+        self.snapshot_version = None  # feed.version the snapshot was computed at
+        self.snapshot_at = 0.0        # time.monotonic() of that computation
+        self._clients = set()
+        self._task = None
+        self._lock = None
+        self.computes = 0
+        self.deltas = 0
+        self.resyncs = 0
+        self.errors = 0
+
+    def start(self):
+        """Start the publisher (from the event loop, e.g. in the app lifespan)"""
+        self._lock = asyncio.Lock()
+        self.snapshot = self.snapshot_version = None
+        self._task = asyncio.create_task(self._run(), name="dashboard-stream")
+
+    async def stop(self):
+        if self._task is not None:
+            await stop_task(self._task)
+            self._task = None
+
+    async def _run(self):
+        events = self.feed.subscribe()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(events.get(), timeout=self.max_interval)
+                except asyncio.TimeoutError:
+                    pass  # Periodic refresh for relative times
+                if not self._clients:
+                    continue  # Nobody watching; a new client computes a fresh snapshot
+                try:
+                    await self.refresh()
+                except Exception:
+                    self.errors += 1  # compute() logs its own failures; clients keep the last data
+                # Coalesce everything that arrives in the next min_interval into one refresh
+                await asyncio.sleep(self.min_interval)
+        finally:
+            self.feed.unsubscribe(events)
+
+    async def refresh(self):
+        """Recompute once and push the delta to every client"""
+        async with self._lock:
+            version = self.feed.version
+            data = await self.compute()
+            self.computes += 1
+            previous, self.snapshot, self.snapshot_version = self.snapshot, data, version
+            self.snapshot_at = time.monotonic()
+        if previous is None:
+            return
+        delta = dashboard_delta(previous, data)
+        if delta:
+            self.deltas += 1
+            self._broadcast(sse_event("delta", delta))
+
+    def _broadcast(self, message: bytes):
+        for client in list(self._clients):
+            if client.full():
+                # Slow client: it has missed deltas, so replace its backlog with a snapshot
+                while not client.empty():
+                    client.get_nowait()
+                client.put_nowait(sse_event("snapshot", self.snapshot))
+                self.resyncs += 1
+            else:
+                client.put_nowait(message)
+
+    def _current(self) -> bool:
+        """Whether the snapshot can be sent as-is to a new client"""
+        return (self.snapshot is not None and self.snapshot_version == self.feed.version
+                and time.monotonic() - self.snapshot_at < self.max_interval)
+
+    async def events(self) -> AsyncIterator[bytes]:
+        """One client's event stream (a StreamingResponse body)"""
+        client = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self._clients.add(client)
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            if not self._current():
+                await self.refresh()
+            yield sse_event("snapshot", self.snapshot)
+            while True:
+                try:
+                    yield await asyncio.wait_for(client.get(), timeout=self.keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self._clients.discard(client)
+
+    def stats(self) -> dict:
+        return {
+            'clients': len(self._clients),
+            'computes': self.computes,
+            'deltas': self.deltas,
+            'resyncs': self.resyncs,
+            'errors': self.errors,
+            'version': self.snapshot_version,
+        }
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+SQLite connection management for the resource-share tools
+
+- connect(): one tuned connection (WAL, synchronous=NORMAL, busy_timeout,
+  mmap/cache sizes, larger prepared-statement cache) for scripts like
+  check-quota.py and aggregate_daily.py
+- ConnectionPool: long-lived connections for the webhook server - a small
+  pool of query-only readers plus a single writer guarded by a lock, so
+  requests never re-open the database file or re-parse the schema
+- sql_timestamp()/day_bounds(): bounds for `timestamp >= ? AND timestamp < ?`
+  range filters, which (unlike `date(timestamp) = ?`) can use the indexes
+  from migrate_add_increment_indexes.py
+- hour_start()/hour_ceiling(): hourly_resource_share keys, and where a
+  window switches from raw increments to the hourly rollup
+- utc_now()/local_to_utc()/utc_to_local(): increments are stamped in UTC
+  (CURRENT_TIMESTAMP) while quota_info holds local time (check-quota.py
+  uses datetime.now()); these convert between the two
+
+WAL mode lets the webhook, sqlite_web, the quota checker and the daily
+aggregation read while one of them writes, instead of "Database locked".
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+BUSY_TIMEOUT_MS = 5000          # Wait this long for a competing writer
+CACHE_SIZE_KIB = 16384          # Page cache per connection (16 MiB)
+MMAP_SIZE = 128 * 1024 * 1024   # Memory-map up to 128 MiB of the database
+STATEMENT_CACHE = 256           # Prepared statements kept per connection
+DEFAULT_READERS = 4
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # How CURRENT_TIMESTAMP stores resource_share_increments.timestamp
+
+def sql_timestamp(value: datetime) -> str:
+    """Format a datetime like the timestamp column so string comparisons line up"""
+    return value.strftime(TIMESTAMP_FORMAT)
+
+def utc_now() -> datetime:
+    """Naive UTC now - the clock CURRENT_TIMESTAMP uses"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def local_to_utc(value: datetime) -> datetime:
+    """Naive local time (or an aware datetime) as naive UTC"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def utc_to_local(value: datetime) -> datetime:
+    """Naive UTC as naive local time"""
+    return value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+def current_timestamp() -> str:
+    """Python equivalent of SQLite's CURRENT_TIMESTAMP"""
+    return sql_timestamp(utc_now())
+
+def day_bounds(day) -> tuple:
+    """
+    [start, end) strings covering one calendar day (date or 'YYYY-MM-DD'):
+    `timestamp >= start AND timestamp < end` matches `date(timestamp) = day`
+    """
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day.isoformat(), (day + timedelta(days=1)).isoformat()
+
+def hour_start(timestamp: str) -> str:
+    """The hourly_resource_share.hour a timestamp falls in"""
+    return timestamp[:13] + ":00:00"
+
+def hour_ceiling(timestamp: str) -> str:
+    """
+    First hour boundary at or after `timestamp`. A window starting at
+    `timestamp` reads raw increments up to here and the hourly rollup after.
+    """
+    start = hour_start(timestamp)
+    if start == timestamp[:19]:
+        return start
+    return sql_timestamp(datetime.fromisoformat(start) + timedelta(hours=1))
+
+def configure_connection(conn: sqlite3.Connection, readonly: bool = False):
+    """Apply the shared pragmas to an open connection"""
+    if not readonly:
+        # journal_mode is persistent in the database file; this is a no-op
+        # once any connection has switched it to WAL
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    if readonly:
+        conn.execute("PRAGMA query_only=1")
+
+def connect(db_path, readonly: bool = False, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Open a tuned connection to the resource tracking database"""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=STATEMENT_CACHE,
+        check_same_thread=check_same_thread,
+    )
+    configure_connection(conn, readonly=readonly)
+    return conn
+
+class ConnectionPool:
+    """
+    Reader pool + single writer for one database file.
+
+    Connections are created lazily and reused across threads (each one is
+    only ever used by one thread at a time). Use as context managers:
+
+        with pool.reader() as conn: ...   # SELECTs
+        with pool.writer() as conn: ...   # commits on success, rolls back on error
+
+    stats() counts checkouts that had to wait (writer lock held by another
+    thread, or every reader busy) and the total time spent waiting.
+    """
+
+    def __init__(self, db_path, readers: int = DEFAULT_READERS):
+        self.db_path = Path(db_path)
+        self.max_readers = readers
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._all = []
+        self.reset_stats()
+
+    def reset_stats(self):
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'writer_checkouts': 0,
+            'writer_waits': 0,
+            'writer_wait_seconds': 0.0,
+            'reader_checkouts': 0,
+            'reader_waits': 0,
+            'reader_wait_seconds': 0.0,
+        }
+
+    def _record(self, kind: str, waited: float = None):
+        with self._stats_lock:
+            self._stats[f'{kind}_checkouts'] += 1
+            if waited is not None:
+                self._stats[f'{kind}_waits'] += 1
+                self._stats[f'{kind}_wait_seconds'] += waited
+
+    def stats(self) -> dict:
+        """Checkout and lock-wait counters since creation (or reset_stats())"""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _open(self, readonly: bool) -> sqlite3.Connection:
+        conn = connect(self.db_path, readonly=readonly, check_same_thread=False)
+        self._all.append(conn)
+        return conn
+
+    def _checkout_reader(self) -> sqlite3.Connection:
+        try:
+            conn = self._readers.get_nowait()
+            self._record('reader')
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._reader_lock:
+            create = self._reader_count < self.max_readers
+            if create:
+                self._reader_count += 1
+
+        if not create:
+            started = time.perf_counter()
+            conn = self._readers.get()
+            self._record('reader', time.perf_counter() - started)
+            return conn
+
+        # Query-only readers can't switch the file to WAL, so let the writer do it first
+        if self._writer is None:
+            with self.writer():
+                pass
+        self._record('reader')
+        return self._open(readonly=True)
+
+    @contextmanager
+    def reader(self):
+        """Borrow a query-only connection"""
+        conn = self._checkout_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def _acquire_writer(self):
+        if self._writer_lock.acquire(blocking=False):
+            self._record('writer')
+            return
+        started = time.perf_counter()
+        self._writer_lock.acquire()
+        self._record('writer', time.perf_counter() - started)
+
+    @contextmanager
+    def writer(self):
+        """Hold the single writer connection for one unit of work"""
+        self._acquire_writer()
+        try:
+            if self._writer is None:
+                self._writer = self._open(readonly=False)
+            conn = self._writer
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+        finally:
+            self._writer_lock.release()
+
+    def close(self):
+        """Close every connection the pool has opened"""
+        for conn in self._all:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._all = []
+        self._writer = None
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+SQL shared between the webhook server and the maintenance scripts
+
+Plain strings with no dependencies beyond the standard library, so
+migrations (migrate_add_increment_indexes.py checks their query plans)
+can import them without loading FastAPI or the server's state.
+"""
+
+# Fleet status, grouped by (Claude, mode) across all Claudes at once, from
+# the hourly rollup. CROSS JOIN keeps claude_identities as the outer loop so
+# each Claude's rows are a range seek on the rollup's primary key. Days are
+# whole hours; the 7-day window adds raw increments for its first partial
+# hour (:week_start up to :week_hour, via idx_increments_claude_time).
+FLEET_TODAY_SQL = """
+    SELECT h.claude_name, h.mode,
+           SUM(h.normalized_usage) as total_usage,
+           MAX(h.last_timestamp) as last_activity,
+           MAX(h.max_recommended_interval) as current_interval
+    FROM claude_identities ci
+    CROSS JOIN hourly_resource_share h ON h.claude_name = ci.name
+    WHERE h.hour >= :day_start AND h.hour < :day_end
+    GROUP BY h.claude_name, h.mode
+    ORDER BY h.claude_name, h.mode
+"""
+
+FLEET_WEEK_SQL = """
+    SELECT claude_name, mode, SUM(usage) as total_usage
+    FROM (
+        SELECT h.claude_name, h.mode, h.normalized_usage as usage
+        FROM claude_identities ci
+        CROSS JOIN hourly_resource_share h ON h.claude_name = ci.name
+        WHERE h.hour >= :week_hour
+        UNION ALL
+        SELECT r.claude_name, r.mode, r.normalized_usage
+        FROM claude_identities ci
+        CROSS JOIN resource_share_increments r ON r.claude_name = ci.name
+        WHERE r.timestamp >= :week_start AND r.timestamp < :week_hour
+    )
+    GROUP BY claude_name, mode
+    ORDER BY claude_name, mode
+"""
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Process-wide cache of claude_identities
+
+Holds name, model, cost_multiplier, collaborative_pref and active for every
+Claude so the ingest path and dashboard don't re-query the table per request.
+
+Change detection uses SQLite's PRAGMA data_version, which only changes when
+*another* connection commits. Checking it on the server's writer connection
+therefore catches edits made via sqlite_web, migrations or scripts, while
+the server's own increment inserts don't trigger reloads. The read paths
+check it on pooled readers too; there the server's own commits also move
+it, so a reload that finds the same identities reports no change.
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+DEFAULT_COST_MULTIPLIER = 3
+DEFAULT_COLLABORATIVE_PREF = 30
+
+class IdentityCache:
+    """Thread-safe snapshot of claude_identities"""
+
+    def __init__(self):
+        self._identities: Dict[str, Dict] = {}
+        self._data_versions: Dict[int, int] = {}  # id(connection) -> data_version at its last check
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[datetime] = None
+        self.loads = 0
+        self.version = 0  # Bumped by each load that changed the identities
+
+    def load(self, conn) -> bool:
+        """(Re)load every identity using the given connection; returns True if they changed"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT name, model, cost_multiplier, collaborative_pref, active
+            FROM claude_identities
+        """)
+        identities = {
+            name: {
+                'name': name,
+                'model': model,
+                'cost_multiplier': cost_multiplier,
+                'collaborative_pref': collaborative_pref,
+                'active': bool(active),
+            }
+            for name, model, cost_multiplier, collaborative_pref, active in cursor.fetchall()
+        }
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+
+        with self._lock:
+            changed = identities != self._identities
+            if changed:
+                self.version += 1
+            self._identities = identities
+            self._data_versions[id(conn)] = data_version
+            self.loaded_at = datetime.now()
+            self.loads += 1
+        return changed
+
+    def refresh_if_changed(self, conn) -> bool:
+        """
+        Reload if another connection has committed since `conn` was last
+        checked (data_version is per-connection, so each connection's is
+        tracked separately). Returns True if the identities changed.
+        """
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_versions.get(id(conn)) and self.loaded_at is not None:
+            return False
+        return self.load(conn)
+
+    def invalidate(self):
+        """Force a reload on next use"""
+        with self._lock:
+            self._data_versions = {}
+            self.loaded_at = None
+
+    def get(self, name: str) -> Optional[Dict]:
+        return self._identities.get(name)
+
+    def cost_multiplier(self, name: str):
+        identity = self._identities.get(name)
+        if not identity:
+            return DEFAULT_COST_MULTIPLIER
+        return identity['cost_multiplier'] or DEFAULT_COST_MULTIPLIER
+
+    def all(self) -> Dict[str, Dict]:
+        return dict(self._identities)
+
+    def active(self) -> List[Dict]:
+        """Active identities, ordered by name"""
+        return sorted(
+            (identity for identity in self._identities.values() if identity['active']),
+            key=lambda identity: identity['name']
+        )
+
+    def __len__(self):
+        return len(self._identities)
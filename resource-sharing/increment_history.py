@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Raw increment history queries for /resource/increments
+
+Rows come back in (timestamp, id) order, filtered by claude_name, mode and
+a [since, until) time range. Pages are keyset-paginated: the cursor is the
+(timestamp, id) of the last row returned, so fetching page N costs the same
+as page 1 (no OFFSET) and rows inserted meanwhile don't shift later pages.
+
+Every filter combination is an index range scan in that order:
+idx_increments_claude_time when claude_name is given, idx_increments_mode_time
+for mode alone, idx_increments_time otherwise (migrate_add_increment_indexes.py).
+
+Times are in the timestamp column's clock (UTC, like CURRENT_TIMESTAMP);
+ones with an explicit offset are converted.
+"""
+
+import base64
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from db_pool import sql_timestamp
+
+MODES = ("autonomy", "collaboration")
+
+COLUMNS = (
+    "id", "claude_name", "timestamp", "mode", "cost_delta", "normalized_usage",
+    "cache_read_increment", "weighted_cost", "context_percentage", "recommended_interval",
+)
+
+class HistoryQueryError(ValueError):
+    """Invalid filter or cursor (the server answers 422)"""
+
+def parse_time(value: Optional[str]) -> Optional[str]:
+    """'YYYY-MM-DD', 'YYYY-MM-DD HH:MM[:SS]' or ISO 8601 -> timestamp column format"""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise HistoryQueryError(f"Invalid time {value!r}; use YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return sql_timestamp(parsed)
+
+def parse_filters(claude_name: str = None, mode: str = None,
+                  since: str = None, until: str = None) -> dict:
+    """Validated page_query() filters from request parameters"""
+    if mode is not None and mode not in MODES:
+        raise HistoryQueryError(f"Invalid mode {mode!r}; expected one of {', '.join(MODES)}")
+    return {'claude_name': claude_name, 'mode': mode, 'since': parse_time(since), 'until': parse_time(until)}
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp}|{row_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit("|", 1)
+        return timestamp, int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HistoryQueryError(f"Invalid cursor {cursor!r}")
+
+def page_query(claude_name: str = None, mode: str = None, since: str = None, until: str = None,
+               after: Tuple[str, int] = None, limit: int = 100) -> Tuple[str, dict]:
+    """(sql, params) for up to `limit` rows after the `after` keyset position"""
+    conditions = []
+    params = {'limit': limit}
+    if claude_name is not None:
+        conditions.append("claude_name = :claude_name")
+        params['claude_name'] = claude_name
+    if mode is not None:
+        conditions.append("mode = :mode")
+        params['mode'] = mode
+    if since is not None:
+        conditions.append("timestamp >= :since")
+        params['since'] = since
+    if until is not None:
+        conditions.append("timestamp < :until")
+        params['until'] = until
+    if after is not None:
+        # (timestamp, id) > (:after_ts, :after_id), written so that
+        # `timestamp >= :after_ts` stays an index range bound
+        conditions.append("timestamp >= :after_ts AND (timestamp > :after_ts OR id > :after_id)")
+        params['after_ts'], params['after_id'] = after
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT {', '.join(COLUMNS)}
+        FROM resource_share_increments
+        {where}
+        ORDER BY timestamp, id
+        LIMIT :limit
+    """
+    return sql, params
+
+def fetch_page(conn, limit: int, **filters) -> Tuple[List[dict], Optional[Tuple[str, int]]]:
+    """
+    Up to `limit` rows as dicts, plus the keyset position after the last
+    one (None once the range is exhausted)
+    """
+    sql, params = page_query(limit=limit + 1, **filters)
+    rows = conn.execute(sql, params).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_after = (rows[-1][2], rows[-1][0]) if more else None
+    return [dict(zip(COLUMNS, row)) for row in rows], next_after
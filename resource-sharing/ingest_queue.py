@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Write-behind queue with group commit for increment ingestion
+
+Increments are acknowledged as soon as they are enqueued in memory; a single
+writer task drains the queue and hands groups of rows to a flush coroutine,
+either every `max_rows` rows or every `max_delay_ms` milliseconds, whichever
+comes first. One commit (one fsync) then covers the whole group.
+
+A failed flush is retried (with backoff) until it succeeds; the batch
+stays at the head of the queue meanwhile. While it is failing the queue is
+unhealthy and enqueue() refuses new items, so callers stop acknowledging
+and write synchronously instead (surfacing the database error) rather
+than piling more acknowledged rows onto a queue that can't commit.
+
+stop() drains everything still queued, so a graceful shutdown
+(`systemctl restart`) doesn't lose acknowledged increments. Anything it
+can't commit within `stop_timeout` seconds is handed to `spill` (e.g.
+written to a file for replay) and counted in stats['spilled'].
+"""
+
+import asyncio
+import time
+
+DEFAULT_MAX_ROWS = 200
+DEFAULT_MAX_DELAY_MS = 200
+DEFAULT_MAX_DEPTH = 10000
+DEFAULT_STOP_TIMEOUT = 30
+FLUSH_RETRY_DELAY = 0.1      # Seconds before the first retry of a failed flush...
+FLUSH_RETRY_MAX_DELAY = 5.0  # ...doubling up to this
+
+class WriteBehindQueue:
+    """
+    In-process write-behind buffer.
+
+    flush: async callable taking a list of queued items; it must write them
+    all in one transaction and raise if the transaction failed.
+    spill: callable taking the items stop() could not commit.
+    """
+
+    def __init__(self, flush, max_rows: int = DEFAULT_MAX_ROWS,
+                 max_delay_ms: int = DEFAULT_MAX_DELAY_MS,
+                 max_depth: int = DEFAULT_MAX_DEPTH, on_error=None, spill=None,
+                 stop_timeout: float = DEFAULT_STOP_TIMEOUT):
+        self.flush = flush
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.max_depth = max_depth
+        self.on_error = on_error or (lambda message: None)
+        self.spill = spill
+        self.stop_timeout = stop_timeout
+        self._queue = None
+        self._task = None
+        self._batch = []  # Items taken off the queue for the flush in progress
+        self._failing_since = None  # time.monotonic() of the first failure of the current batch
+        self._flush_seconds_total = 0.0
+        self.stats = {
+            'enqueued': 0,
+            'flushed': 0,
+            'spilled': 0,
+            'flushes': 0,
+            'flush_failures': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_flush_ms': None,
+            'max_flush_ms': None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def healthy(self) -> bool:
+        """Running, and the last flush attempt succeeded"""
+        return self.running and self._failing_since is None
+
+    async def start(self):
+        """Start the writer task (call from the running event loop)"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._task = asyncio.create_task(self._writer(), name="write-behind-flusher")
+
+    def enqueue(self, item) -> bool:
+        """Queue one item; returns False if the queue is full, failing to flush or not running"""
+        if not self.healthy:
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    async def stop(self):
+        """
+        Drain everything still queued (for up to stop_timeout seconds), then
+        stop the writer task and spill whatever is left uncommitted
+        """
+        if self._task is None:
+            return
+        if self.running:
+            try:
+                await asyncio.wait_for(self._queue.join(), self.stop_timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        unwritten = self._batch
+        self._batch = []
+        while not self._queue.empty():
+            unwritten.append(self._queue.get_nowait())
+        if unwritten:
+            self.stats['spilled'] += len(unwritten)
+            self.on_error(f"Write-behind stopped with {len(unwritten)} uncommitted rows; spilling them")
+            if self.spill is not None:
+                self.spill(unwritten)
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+
+            while len(batch) < self.max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._batch = batch
+            await self._flush(batch)
+            self._batch = []
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _flush(self, batch):
+        """Write one batch, retrying until it commits (the queue is unhealthy meanwhile)"""
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            try:
+                await self.flush(batch)
+            except Exception as e:
+                self.stats['flush_failures'] += 1
+                if self._failing_since is None:
+                    self._failing_since = time.monotonic()
+                self.on_error(f"Write-behind flush of {len(batch)} rows failed (attempt {attempt}), "
+                              f"retrying; new increments are written synchronously meanwhile: {e}")
+                await asyncio.sleep(min(FLUSH_RETRY_DELAY * 2 ** (attempt - 1), FLUSH_RETRY_MAX_DELAY))
+                continue
+
+            self._failing_since = None
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._flush_seconds_total += elapsed_ms / 1000
+            self.stats['flushes'] += 1
+            self.stats['flushed'] += len(batch)
+            self.stats['last_batch_size'] = len(batch)
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+            self.stats['last_flush_ms'] = round(elapsed_ms, 3)
+            self.stats['max_flush_ms'] = round(max(self.stats['max_flush_ms'] or 0, elapsed_ms), 3)
+            return
+
+    def metrics(self) -> dict:
+        """Queue depth and flush latency, for sizing max_rows/max_delay_ms"""
+        flushes = self.stats['flushes']
+        return {
+            'enabled': True,
+            'running': self.running,
+            'healthy': self.healthy,
+            'failing_seconds': (round(time.monotonic() - self._failing_since, 1)
+                                if self._failing_since is not None else None),
+            'depth': self._queue.qsize() if self._queue else 0,
+            # Acknowledged but not yet committed (queued + in the flush being built)
+            'pending': self.stats['enqueued'] - self.stats['flushed'] - self.stats['spilled'],
+            'max_depth': self.max_depth,
+            'max_rows': self.max_rows,
+            'max_delay_ms': int(self.max_delay * 1000),
+            'avg_flush_ms': round(self._flush_seconds_total / flushes * 1000, 3) if flushes else None,
+            'avg_batch_size': round(self.stats['flushed'] / flushes, 1) if flushes else None,
+            **self.stats,
+        }
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Migration: Add hourly_resource_share rollup table
+- One row per (claude_name, hour, mode): sums of cost_delta, normalized_usage,
+  weighted_cost and cache_read_increment, the sample count, the latest
+  timestamp and highest recommended_interval in that hour
+- hour is the increment timestamp truncated to the hour ('YYYY-MM-DD HH:00:00',
+  same clock as resource_share_increments.timestamp)
+
+The server upserts the matching row in the same transaction as every
+increment it stores, so the rollup is always current. Queries over whole
+hours (days, 24h/7-day windows) read the rollup and only touch raw
+increments for the partial hour at the start of a window.
+
+--backfill rebuilds the rollup from resource_share_increments one day at
+a time (each day in its own transaction, so the server only waits for one
+day's rebuild), then checks that rollup and raw totals match. Without it,
+the backfill still runs when the rollup is missing history - it was just
+created, or starts later than the raw increments - which is also what the
+server does at startup (ensure_rollup()), so readers of the rollup never
+see existing history as zero.
+
+Usage: python3 migrate_add_hourly_rollup.py [--backfill]
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from db_pool import connect, hour_start
+
+DB_PATH = Path(__file__).parent / "data" / "resource_tracking.db"
+
+ROLLUP_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS hourly_resource_share (
+        claude_name TEXT NOT NULL,
+        hour TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        cost_delta REAL NOT NULL DEFAULT 0,
+        normalized_usage REAL NOT NULL DEFAULT 0,
+        weighted_cost REAL NOT NULL DEFAULT 0,
+        cache_read_increment INTEGER NOT NULL DEFAULT 0,
+        samples INTEGER NOT NULL DEFAULT 0,
+        last_timestamp TEXT,
+        max_recommended_interval INTEGER,
+        PRIMARY KEY (claude_name, hour, mode)
+    ) WITHOUT ROWID
+    """,
+    # Fleet-wide windows of one mode (allocation fairness, daily aggregation)
+    """
+    CREATE INDEX IF NOT EXISTS idx_hourly_mode_hour
+    ON hourly_resource_share (mode, hour, claude_name, weighted_cost, cache_read_increment)
+    """,
+]
+
+# Rebuild the rollup rows for [:start, :end) from raw increments
+BACKFILL_SQL = """
+    INSERT INTO hourly_resource_share
+        (claude_name, hour, mode, cost_delta, normalized_usage, weighted_cost,
+         cache_read_increment, samples, last_timestamp, max_recommended_interval)
+    SELECT claude_name, strftime('%Y-%m-%d %H:00:00', timestamp), mode,
+           COALESCE(SUM(cost_delta), 0), COALESCE(SUM(normalized_usage), 0),
+           COALESCE(SUM(weighted_cost), 0), COALESCE(SUM(cache_read_increment), 0),
+           COUNT(*), MAX(timestamp), MAX(recommended_interval)
+    FROM resource_share_increments
+    WHERE timestamp >= :start AND timestamp < :end
+    GROUP BY 1, 2, 3
+"""
+
+TOTALS_CHECK_SQL = """
+    SELECT (SELECT COUNT(*) FROM resource_share_increments),
+           (SELECT COALESCE(SUM(samples), 0) FROM hourly_resource_share),
+           (SELECT COALESCE(SUM(normalized_usage), 0) FROM resource_share_increments),
+           (SELECT COALESCE(SUM(normalized_usage), 0) FROM hourly_resource_share)
+"""
+
+def create_rollup(conn):
+    """Create the table and index if missing (used by the benchmarks' scratch databases too)"""
+    for sql in ROLLUP_SQL:
+        conn.execute(sql)
+
+def missing_history(conn) -> bool:
+    """
+    True if raw increments predate the rollup's first hour (including an
+    empty rollup over a non-empty increments table): those hours read as zero
+    """
+    first_increment = conn.execute("SELECT MIN(timestamp) FROM resource_share_increments").fetchone()[0]
+    if first_increment is None:
+        return False
+    first_hour = conn.execute("SELECT MIN(hour) FROM hourly_resource_share").fetchone()[0]
+    return first_hour is None or hour_start(first_increment) < first_hour
+
+def ensure_rollup(conn) -> int:
+    """
+    Create the rollup if missing and backfill it if it is missing history
+    (see missing_history()). Returns rollup rows written, 0 if up to date.
+    """
+    create_rollup(conn)
+    conn.commit()
+    if not missing_history(conn):
+        return 0
+    return backfill(conn)
+
+def backfill(conn, verbose: bool = False) -> int:
+    """Rebuild every hour that has increments, a day per transaction. Returns rows written."""
+    first, last = conn.execute(
+        "SELECT MIN(timestamp), MAX(timestamp) FROM resource_share_increments"
+    ).fetchone()
+    if first is None:
+        return 0
+
+    written = 0
+    day = datetime.fromisoformat(first[:10])
+    end = datetime.fromisoformat(last[:10]) + timedelta(days=1)
+    while day < end:
+        bounds = {'start': day.strftime("%Y-%m-%d"), 'end': (day + timedelta(days=1)).strftime("%Y-%m-%d")}
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM hourly_resource_share WHERE hour >= :start AND hour < :end", bounds)
+            rows = conn.execute(BACKFILL_SQL, bounds).rowcount
+        written += rows
+        if verbose and rows:
+            print(f"  {bounds['start']}: {rows} rows")
+        day += timedelta(days=1)
+    return written
+
+def check_totals(conn) -> bool:
+    """Rollup sample count and usage must equal the raw increments'"""
+    raw_count, rollup_count, raw_usage, rollup_usage = conn.execute(TOTALS_CHECK_SQL).fetchone()
+    ok = raw_count == rollup_count and abs(raw_usage - rollup_usage) <= 1e-6 * max(1.0, abs(raw_usage))
+    print(f"{'✓' if ok else '✗'} increments: {raw_count} raw / {rollup_count} in rollup; "
+          f"normalized_usage: {raw_usage:.4f} raw / {rollup_usage:.4f} in rollup")
+    return ok
+
+def migrate(run_backfill: bool = False):
+    """Apply migration."""
+    conn = connect(DB_PATH)
+
+    print("=== Adding Hourly Rollup ===")
+    create_rollup(conn)
+    conn.commit()
+    print("✓ hourly_resource_share ready")
+
+    if not run_backfill and missing_history(conn):
+        print("Rollup is missing existing history - backfilling")
+        run_backfill = True
+
+    if run_backfill:
+        print("\n=== Backfilling from resource_share_increments ===")
+        rows = backfill(conn, verbose=True)
+        conn.execute("ANALYZE")
+        conn.commit()
+        print(f"✓ Wrote {rows} hourly rows")
+        if not check_totals(conn):
+            conn.close()
+            print("\n✗ Rollup does not match raw increments")
+            sys.exit(1)
+    conn.close()
+
+    print("\n✓ Migration complete!")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Add the hourly_resource_share rollup table")
+    parser.add_argument("--backfill", action="store_true",
+                        help="rebuild the rollup from all existing increments")
+    migrate(parser.parse_args().backfill)
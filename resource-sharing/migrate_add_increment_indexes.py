@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Migration: Add covering indexes to resource_share_increments
+- idx_increments_claude_time: (claude_name, timestamp, mode) + usage columns,
+  for per-Claude time windows (dashboard fleet status)
+- idx_increments_mode_time: (mode, timestamp) + claude_name and usage columns,
+  for fleet-wide windows of one mode (allocation calculator, daily aggregation;
+  with ANALYZE stats and few Claudes SQLite may skip-scan the first index instead)
+- idx_increments_time: (timestamp), for unfiltered history pages and exports
+  (/resource/increments), which read in (timestamp, id) order
+
+The queries filter with `timestamp >= ? AND timestamp < ?` ranges (see
+db_pool.day_bounds) instead of `date(timestamp) = ?`, so SQLite can seek
+into these indexes instead of scanning the table. After creating them the
+script runs ANALYZE and asserts via EXPLAIN QUERY PLAN that none of the
+hot queries scans the increments table.
+
+Creating the indexes takes the write lock for as long as the build runs
+(seconds on a large table); increments posted meanwhile wait on busy_timeout.
+
+Usage: python3 migrate_add_increment_indexes.py [--check-only]
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from db_pool import connect, day_bounds, hour_ceiling, sql_timestamp
+
+DB_PATH = Path(__file__).parent / "data" / "resource_tracking.db"
+
+INDEXES = {
+    "idx_increments_claude_time": """
+        CREATE INDEX IF NOT EXISTS idx_increments_claude_time
+        ON resource_share_increments (claude_name, timestamp, mode, normalized_usage,
+                                      recommended_interval, cache_read_increment, weighted_cost)
+    """,
+    "idx_increments_mode_time": """
+        CREATE INDEX IF NOT EXISTS idx_increments_mode_time
+        ON resource_share_increments (mode, timestamp, claude_name, weighted_cost,
+                                      cache_read_increment)
+    """,
+    "idx_increments_time": """
+        CREATE INDEX IF NOT EXISTS idx_increments_time
+        ON resource_share_increments (timestamp)
+    """,
+}
+
+def create_indexes(conn):
+    """Create any missing indexes (used by the benchmarks' scratch databases too)"""
+    for sql in INDEXES.values():
+        conn.execute(sql)
+
+def hot_queries():
+    """(label, sql, params) for every query that must seek via an index"""
+    from aggregate_daily import DAILY_TOTALS_SQL
+    from allocation_calculator import RECENT_USAGE_SQL
+    from increment_history import page_query
+    from db_queries import FLEET_TODAY_SQL, FLEET_WEEK_SQL
+    from timeseries import series_query
+
+    now = datetime.now()
+    day_start, day_end = day_bounds(now.date())
+    week_start = sql_timestamp(now - timedelta(days=7))
+    since = sql_timestamp(now - timedelta(hours=24))
+    return [
+        ("dashboard fleet today", FLEET_TODAY_SQL, {'day_start': day_start, 'day_end': day_end}),
+        ("dashboard fleet week", FLEET_WEEK_SQL,
+         {'week_start': week_start, 'week_hour': hour_ceiling(week_start)}),
+        ("allocation recent usage", RECENT_USAGE_SQL, {'since': since, 'since_hour': hour_ceiling(since)}),
+        ("daily aggregation", DAILY_TOTALS_SQL, day_bounds(now.date() - timedelta(days=1))),
+        ("history by Claude", *page_query(claude_name="x", since=since, after=(since, 0))),
+        ("history by mode", *page_query(mode="autonomy", since=since, until=week_start)),
+        ("history by time", *page_query(since=week_start, after=(since, 0))),
+        ("timeseries 5m", *series_query("5m", since, day_end)),
+        ("timeseries 1h by Claude", *series_query("1h", week_start, day_end, claude_name="x")),
+        ("timeseries 1d", *series_query("1d", week_start, day_end)),
+    ]
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+def check_query_plans(conn) -> bool:
+    """
+    Every access to resource_share_increments must be an index SEARCH, and
+    so must every access to the hourly rollup (migrate_add_hourly_rollup.py)
+    """
+    ok = True
+    for label, sql, params in hot_queries():
+        plan = query_plan(conn, sql, params)
+        # Table accesses other than the (small) claude_identities lookup
+        # and the subquery results the hybrid queries aggregate
+        accesses = [step for step in plan
+                    if step.startswith(("SCAN", "SEARCH"))
+                    and "claude_identities" not in step and "(subquery" not in step]
+        good = bool(accesses) and all(
+            step.startswith("SEARCH") and any(
+                index in step for index in ("INDEX idx_increments_", "INDEX idx_hourly_", "PRIMARY KEY")
+            )
+            for step in accesses
+        )
+        ok = ok and good
+        print(f"{'✓' if good else '✗'} {label}: {'; '.join(plan)}")
+    return ok
+
+def migrate(check_only: bool = False):
+    """Apply migration."""
+    conn = connect(DB_PATH)
+
+    if not check_only:
+        print("=== Adding Increment Indexes ===")
+        existing = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'resource_share_increments'"
+        )}
+        for name, sql in INDEXES.items():
+            if name in existing:
+                print(f"⚠ {name} already exists")
+                continue
+            conn.execute(sql)
+            print(f"✓ Created {name}")
+
+        # Give the planner row-count statistics for the new indexes. Analyze
+        # every table: with stats for the increments table alone the fleet
+        # status join misjudges claude_identities and builds a temporary index
+        conn.execute("ANALYZE")
+        conn.commit()
+        print("✓ Analyzed database")
+
+    print("\n=== Query Plans ===")
+    ok = check_query_plans(conn)
+    conn.close()
+
+    if not ok:
+        print("\n✗ Some queries still scan resource_share_increments")
+        sys.exit(1)
+    print("\n✓ Migration complete!" if not check_only else "\n✓ All queries use the indexes")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Add covering indexes to resource_share_increments")
+    parser.add_argument("--check-only", action="store_true",
+                        help="only verify the query plans")
+    migrate(parser.parse_args().check_only)
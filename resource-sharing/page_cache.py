@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Rendered-page cache for the webhook server's read endpoints
+
+A page is re-rendered only when the server's data version (change_feed.version,
+bumped by increment ingestion and new quota rows) has moved on, and then at
+most once per `min_age` seconds so a busy fleet doesn't force a render per
+request. Pages older than `max_age` are re-rendered regardless, which keeps
+relative times ("in 12min") and changes made by other processes current.
+
+Each cached body carries an ETag (content hash) and Last-Modified, so
+browsers revalidating with If-None-Match / If-Modified-Since get a 304.
+static_page() wraps a file that never changes while the server runs (the
+dashboard's HTML/JS shell) in the same form.
+"""
+
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from fastapi import Request, Response
+
+class CachedPage(NamedTuple):
+    version: int
+    body: bytes
+    media_type: str
+    etag: str
+    last_modified: datetime
+    rendered_at: float  # time.monotonic()
+
+def etag_for(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+class PageCache:
+    """One cached rendering of one page"""
+
+    def __init__(self, min_age: float, max_age: float):
+        self.min_age = min_age
+        self.max_age = max_age
+        self.page: Optional[CachedPage] = None
+        self._lock = None
+        self._lock_loop = None
+        self.hits = 0
+        self.renders = 0
+
+    def lock(self) -> asyncio.Lock:
+        """Held while checking/rendering so concurrent misses render once"""
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def fresh(self, version: int, exact: bool = False) -> Optional[CachedPage]:
+        """
+        The cached page if it may still be served for this data version.
+        exact: only if rendered at this version (no min_age grace period)
+        """
+        page = self.page
+        if page is None:
+            return None
+        age = time.monotonic() - page.rendered_at
+        if (age < self.min_age and not exact) or (page.version == version and age < self.max_age):
+            return page
+        return None
+
+    def store(self, version: int, body, media_type: str) -> CachedPage:
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.page = CachedPage(
+            version=version,
+            body=body,
+            media_type=media_type,
+            etag=etag_for(body),
+            last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+            rendered_at=time.monotonic(),
+        )
+        self.renders += 1
+        return self.page
+
+    def invalidate(self):
+        self.page = None
+
+    def stats(self) -> dict:
+        page = self.page
+        return {
+            'hits': self.hits,
+            'renders': self.renders,
+            'version': page.version if page else None,
+            'age_seconds': round(time.monotonic() - page.rendered_at, 3) if page else None,
+        }
+
+def static_page(path: Path, media_type: str) -> CachedPage:
+    """A file served as-is, validated by content hash and mtime"""
+    path = Path(path)
+    body = path.read_bytes()
+    return CachedPage(
+        version=0,
+        body=body,
+        media_type=media_type,
+        etag=etag_for(body),
+        last_modified=datetime.fromtimestamp(int(path.stat().st_mtime), timezone.utc),
+        rendered_at=time.monotonic(),
+    )
+
+def not_modified(request: Request, page: CachedPage) -> bool:
+    """True if the client's validators match the cached page"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or page.etag in tags or f"W/{page.etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return page.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def page_response(request: Request, page: CachedPage, cache_control: str = "no-cache") -> Response:
+    """
+    200 with the cached body, or 304 if the client already has it. The
+    default cache_control makes browsers always revalidate, so unchanged
+    pages cost a 304.
+    """
+    headers = {
+        "ETag": page.etag,
+        "Last-Modified": format_datetime(page.last_modified, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if not_modified(request, page):
+        return Response(status_code=304, headers=headers)
+    return Response(content=page.body, media_type=page.media_type, headers=headers)
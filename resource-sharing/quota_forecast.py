@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Quota burn-rate forecaster: where each quota window will be at its reset
+
+calculate_window_multiplier() compares % used against % of time elapsed
+at one instant, with the window start inferred from the reset time. This
+fits the burn rate instead, from:
+- quota_info history: a time-weighted EWMA of the % per hour between
+  consecutive readings of the same window, with a half-life per window -
+  short for the 5hr session, which needs the current pace, and a day for
+  the weekly window, whose horizon spans whole days and whose readings
+  move a percent every couple of hours. A
+  reading whose reset time moved starts a new window, so no window start
+  is assumed; readings that dip within a window (they are whole percents
+  parsed from /usage) count as negative steps rather than being dropped,
+  which would bias the rate upwards.
+- recent increment cost: the last hour's cost converted to % with the
+  window's % per dollar over the history, which moves as soon as the fleet
+  speeds up or slows down, while whole-percent quota readings lag.
+The two are blended (FORECAST_COST_WEIGHT) and extrapolated to the reset.
+
+forecast_window() then asks how fast autonomy may burn for the window to
+land at FORECAST_TARGET_PERCENT at reset, given what collaboration burns
+(autonomy's share of the history's cost), and returns the multiplier that
+moves autonomy's current rate there - below 1.0 speeds the fleet up to use
+what would otherwise be left over, above 1.0 slows it down before the
+window runs out early. Once the target is out of reach (autonomy may burn
+no faster than the rate that would spend the margin above target,
+(100 - target) / hours left, e.g. when the window is already past target),
+the multiplier is autonomy's rate against that margin rate, at least 1.0:
+a trickle is left alone, and autonomy burning twice the margin rate or
+more gets the maximum. Unlike V1, which caps the 5hr session's multiplier at 1.0, the
+session may slow the fleet too (up to FORECAST_SESSION_MAX_MULTIPLIER), so
+a session projected to run out before its reset raises intervals instead
+of leaving the fleet idle until then; set it to 1.0 for V1's behaviour.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence
+
+FORECAST_TARGET_PERCENT = 95.0  # Aim here at reset; the rest absorbs forecast error
+FORECAST_HISTORY_HOURS = 24     # quota_info and cost history fitted
+FORECAST_COST_WEIGHT = 0.5      # Share of the blended rate from the last hour's cost
+FORECAST_MIN_MULTIPLIER = 0.5   # Per-decision bounds: intervals compound, and the
+FORECAST_MAX_MULTIPLIER = 2.0   # fitted rate lags the fleet's response
+FORECAST_SESSION_MAX_MULTIPLIER = FORECAST_MAX_MULTIPLIER  # 1.0: V1's cap, the session never slows the fleet
+RESET_TOLERANCE = timedelta(minutes=30)  # Reset times parsed from /usage drift a little
+
+class Window(NamedTuple):
+    label: str
+    key: str              # quota_info column
+    reset_key: str
+    length: timedelta     # Nominal - only for the no-history fallback
+    half_life: float      # EWMA half-life of the quota burn rate (hours)
+    max_multiplier: float # Upper bound of this window's multiplier
+
+WINDOWS = (
+    Window("5hr session", "session_5hour", "session_5hour_reset", timedelta(hours=5), 1.0,
+           FORECAST_SESSION_MAX_MULTIPLIER),
+    Window("weekly", "week_all", "week_reset", timedelta(days=7), 24.0, FORECAST_MAX_MULTIPLIER),
+)
+
+class WindowForecast(NamedTuple):
+    window: str
+    percent_used: float
+    percent_at_reset: float   # Projected at the current burn rate
+    burn_rate: float          # % per hour, all modes
+    hours_to_reset: float
+    autonomy_share: float     # Autonomy's share of the history's cost
+    multiplier: float
+    reason: str
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def window_readings(history: Iterable[Dict], key: str, reset_key: str):
+    """(time, percent, reset) for readings with all three, oldest first"""
+    for row in history:
+        taken, reset = parse_time(row.get('timestamp')), parse_time(row.get(reset_key))
+        if taken is not None and reset is not None and row.get(key) is not None:
+            yield taken, float(row[key]), reset
+
+def window_steps(history: Iterable[Dict], key: str, reset_key: str):
+    """(start, end, percent added - negative if a reading dipped) between consecutive readings of the same window"""
+    previous = None
+    for reading in window_readings(history, key, reset_key):
+        if previous is not None:
+            (t0, p0, r0), (t1, p1, r1) = previous, reading
+            if t1 > t0 and abs(r1 - r0) <= RESET_TOLERANCE:
+                yield t0, t1, p1 - p0
+        previous = reading
+
+def quota_burn_rate(steps: Sequence[tuple], now: datetime, half_life: float) -> Optional[float]:
+    """
+    % per hour from window_steps(): each step's rate weighted by its length
+    and by 0.5 ** (age / half_life), at least 0; None without a step
+    """
+    weighted = total = 0.0
+    for start, end, added in steps:
+        hours = (end - start).total_seconds() / 3600
+        age = (now - (start + (end - start) / 2)).total_seconds() / 3600
+        weight = hours * 0.5 ** (max(0.0, age) / half_life)
+        weighted += weight * added / hours
+        total += weight
+    return max(0.0, weighted / total) if total > 0 else None
+
+def percent_per_dollar(steps: Sequence[tuple], history_cost: float, history_hours: float) -> Optional[float]:
+    """The window's % per hour over window_steps() divided by the history's $ per hour"""
+    hours = added = 0.0
+    for start, end, step in steps:
+        hours += (end - start).total_seconds() / 3600
+        added += step
+    if hours <= 0 or added <= 0 or history_cost <= 0 or history_hours <= 0:
+        return None
+    return (added / hours) / (history_cost / history_hours)
+
+def forecast_window(quota: Dict, history: Sequence[Dict], history_cost: Dict[str, float],
+                    last_hour_cost: Dict[str, float], history_hours: float, now: datetime,
+                    window: Window, target: float = FORECAST_TARGET_PERCENT) -> Optional[WindowForecast]:
+    """
+    One window's forecast from the latest quota row, the quota history and
+    cost by mode; None when the reset time is missing or has passed
+    """
+    label, key, reset_key, length, half_life, max_multiplier = window
+    reset = parse_time(quota.get(reset_key))
+    if reset is None or reset <= now or quota.get(key) is None:
+        return None
+    percent = float(quota[key])
+    hours_left = (reset - now).total_seconds() / 3600
+
+    steps = list(window_steps(history, key, reset_key))
+    rate = quota_burn_rate(steps, now, half_life)
+    total_cost = sum(history_cost.values())
+    per_dollar = percent_per_dollar(steps, total_cost, history_hours)
+    if rate is not None and per_dollar is not None:
+        cost_rate = sum(last_hour_cost.values()) * per_dollar
+        rate = (1 - FORECAST_COST_WEIGHT) * rate + FORECAST_COST_WEIGHT * cost_rate
+        basis = "fitted"
+    elif rate is not None:
+        basis = "fitted"
+    else:
+        # No history yet: % used over the window's nominal time elapsed
+        elapsed = (length - (reset - now)).total_seconds() / 3600
+        rate = percent / elapsed if elapsed > 0 else 0.0
+        basis = "linear"
+
+    share = history_cost.get('autonomy', 0.0) / total_cost if total_cost > 0 else 1.0
+    autonomy_rate = rate * share
+    allowed = (target - percent) / hours_left - rate * (1 - share)  # Autonomy % per hour that lands on target
+    margin_rate = (100.0 - target) / hours_left  # ...that spends the margin above target by reset
+    if allowed > margin_rate:
+        multiplier = max(FORECAST_MIN_MULTIPLIER, min(max_multiplier, autonomy_rate / allowed))
+    elif margin_rate > 0:
+        # Target out of reach: never speed up, slow down with autonomy's rate against the margin
+        multiplier = max(1.0, min(max_multiplier, autonomy_rate / margin_rate))
+    else:
+        multiplier = max_multiplier
+
+    projected = percent + rate * hours_left
+    if multiplier > 1.0:
+        pace = "slowing down"
+    elif multiplier < 1.0:
+        pace = "speeding up"
+    else:
+        pace = "on target"
+    reason = (f"{label}: {percent:.0f}% used, {rate:.2f}%/h ({basis}) -> {projected:.0f}% at reset "
+              f"in {hours_left:.1f}h, target {target:.0f}% - {pace}")
+    return WindowForecast(label, percent, projected, rate, hours_left, share, multiplier, reason)
+
+def forecast_windows(quota: Dict, history: Sequence[Dict], history_cost: Dict[str, float],
+                     last_hour_cost: Dict[str, float], history_hours: float,
+                     now: datetime) -> Dict[str, WindowForecast]:
+    """forecast_window() for the 5hr session and weekly windows, by quota key"""
+    forecasts = {}
+    for window in WINDOWS:
+        forecast = forecast_window(quota, history, history_cost, last_hour_cost, history_hours, now, window)
+        if forecast is not None:
+            forecasts[window.key] = forecast
+    return forecasts
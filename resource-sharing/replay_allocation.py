@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Replay recorded history through an allocation strategy
+
+Streams resource_share_increments and quota_info in timestamp order and,
+at every autonomy increment (a timer asking for its next interval), asks
+the strategy for a recommendation on a simulated clock - the event's
+timestamp, never datetime.now(). The strategy's inputs are kept
+incrementally instead of being re-queried per step: the latest quota row
+and each Claude's autonomy weighted usage over the last `hours`, in a
+sliding window. Strategies with history_hours (e.g. 'forecast') also get
+the quota readings and cost by mode over that many hours, and over the
+last hour, kept the same way.
+
+What would have happened is projected to first order: a timer running at
+interval S instead of the recorded R fires R/S times as often, so each
+autonomy increment's cost is scaled by that factor (collaboration is
+unaffected). The fairness window, cost windows and quota readings the
+strategy sees are the projected ones (each reading rescaled as under burn
+below), so a strategy's feedback on its own burn is part of the replay.
+
+Reports:
+- intervals: recommended intervals per Claude and fleet-wide, and how
+  often they sat at MIN_INTERVAL / MAX_INTERVAL
+- burn: recorded vs projected cost, and each quota reading's session /
+  weekly percentage rescaled by projected / recorded cost since that
+  window started (readings that would have passed 100%, and the last
+  reading before each reset - how much of the window was used)
+- fairness spread: hourly max / min of 24h autonomy weighted usage across
+  Claudes with usage, recorded and projected
+
+quota_info is written in local time (check-quota.py) and increments in
+UTC; --utc-offset (hours, default this machine's) converts quota rows to
+UTC, the clock the whole replay (and the allocation path) runs on.
+
+Usage: python3 replay_allocation.py [--db data/resource_tracking.db] [--since 2026-01-01]
+                                    [--until 2026-02-01] [--strategy v1|constant|forecast|module:function]
+"""
+
+import argparse
+import heapq
+import importlib
+import time
+from array import array
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+import allocation_strategies
+import bench_common
+from allocation_calculator import (
+    DEFAULT_INTERVAL, MAX_INTERVAL, MIN_INTERVAL, AllocationSnapshot, CLAUDE_INFO_SQL, claude_info_from_row,
+    quota_in_utc,
+)
+from allocation_strategies import EMERGENCY_INTERVAL
+from db_pool import TIMESTAMP_FORMAT, connect, sql_timestamp
+
+DB_PATH = Path(__file__).parent / "data" / "resource_tracking.db"
+
+# strategy(snapshot, claude_name, current_interval, now) -> recommended interval (seconds).
+# `now` is naive UTC, like the snapshot's quota times (db_pool.utc_now() on the server).
+Strategy = Callable[[AllocationSnapshot, str, int, datetime], int]
+
+def registered_strategy(strategy: allocation_strategies.Strategy) -> Strategy:
+    """An allocation_strategies strategy, allocated afresh at every decision"""
+    def run(snapshot: AllocationSnapshot, claude_name: str, current_interval: int, now: datetime) -> int:
+        allocation = allocation_strategies.allocate(strategy, snapshot, now)
+        return allocation_strategies.recommend(allocation, claude_name, current_interval)['recommended_interval']
+    return run
+
+def load_strategy(spec: str) -> Strategy:
+    """An allocation_strategies name, or 'module:function' for a candidate under development"""
+    if spec in allocation_strategies.STRATEGIES:
+        return registered_strategy(allocation_strategies.STRATEGIES[spec])
+    module, _, function = spec.partition(":")
+    if not function:
+        raise SystemExit(f"Unknown strategy {spec!r}: use one of "
+                         f"{', '.join(allocation_strategies.STRATEGIES)} or module:function")
+    return getattr(importlib.import_module(module), function)
+
+class UsageWindow:
+    """Per-Claude sum of the last `hours` of autonomy weighted usage, updated incrementally"""
+
+    def __init__(self, claudes, hours: int):
+        self.span = timedelta(hours=hours)
+        self.usage = dict.fromkeys(claudes, 0.0)  # Shared with the snapshots handed to strategies
+        self._counts = dict.fromkeys(claudes, 0)
+        self._events = deque()  # (timestamp, claude_name, weighted)
+
+    def add(self, timestamp: datetime, claude_name: str, weighted: float):
+        self._events.append((timestamp, claude_name, weighted))
+        self.usage[claude_name] = self.usage.get(claude_name, 0.0) + weighted
+        self._counts[claude_name] = self._counts.get(claude_name, 0) + 1
+
+    def advance(self, now: datetime):
+        """Drop usage from before now - span (the SQL window is `timestamp >= since`)"""
+        since = now - self.span
+        events = self._events
+        while events and events[0][0] < since:
+            _, name, weighted = events.popleft()
+            self._counts[name] -= 1
+            # Exactly 0.0 once a Claude's window empties, as the SQL sum would give
+            self.usage[name] = self.usage[name] - weighted if self._counts[name] else 0.0
+
+    def spread(self) -> Optional[float]:
+        """max / min over Claudes with usage (None with fewer than two)"""
+        active = [usage for usage in self.usage.values() if usage > 0]
+        return max(active) / min(active) if len(active) > 1 else None
+
+class CostSeries:
+    """Cumulative recorded and projected cost over time, for 'cost since window start' lookups"""
+
+    def __init__(self):
+        self.timestamps = []
+        self.recorded = array("d")
+        self.projected = array("d")
+
+    def add(self, timestamp: str, recorded: float, projected: float):
+        if self.timestamps and self.timestamps[-1] == timestamp:
+            self.recorded[-1] += recorded
+            self.projected[-1] += projected
+            return
+        self.timestamps.append(timestamp)
+        self.recorded.append((self.recorded[-1] if self.recorded else 0.0) + recorded)
+        self.projected.append((self.projected[-1] if self.projected else 0.0) + projected)
+
+    def since(self, timestamp: str):
+        """(recorded, projected) cost from `timestamp` to the latest entry"""
+        if not self.timestamps:
+            return 0.0, 0.0
+        i = bisect_left(self.timestamps, timestamp)
+        before_recorded = self.recorded[i - 1] if i else 0.0
+        before_projected = self.projected[i - 1] if i else 0.0
+        return self.recorded[-1] - before_recorded, self.projected[-1] - before_projected
+
+def summarize(values) -> dict:
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 3),
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'min': ordered[0],
+        'max': ordered[-1],
+    }
+
+def interval_summary(values) -> dict:
+    summary = summarize(values)
+    if values:
+        summary['at_min'] = round(sum(v <= MIN_INTERVAL for v in values) / len(values), 3)
+        summary['at_max'] = round(sum(v >= MAX_INTERVAL for v in values) / len(values), 3)
+    return summary
+
+def increment_events(conn, start: str, until: str):
+    """(timestamp, 1, row) for increments in [start, until), in timestamp order"""
+    cursor = conn.execute("""
+        SELECT timestamp, claude_name, mode, COALESCE(cost_delta, 0), COALESCE(weighted_cost, 0),
+               recommended_interval
+        FROM resource_share_increments
+        WHERE timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp, id
+    """, (start, until))
+    for row in cursor:
+        yield row[0], 1, row
+
+def quota_events(conn, start: str, until: str, offset: timedelta):
+    """(timestamp, 0, quota) for quota_info rows, times converted to UTC (the increments' clock)"""
+    rows = conn.execute("""
+        SELECT session_5hour, week_all, week_sonnet, session_5hour_reset, week_reset, timestamp
+        FROM quota_info ORDER BY timestamp
+    """)
+    for row in rows:
+        quota = quota_in_utc(dict(zip(('session_5hour', 'week_all', 'week_sonnet',
+                                       'session_5hour_reset', 'week_reset', 'timestamp'), row)),
+                             lambda local: local - offset)
+        timestamp = sql_timestamp(datetime.fromisoformat(quota['timestamp']))
+        if timestamp < until:
+            # Quota rows before the window still set the starting quota
+            yield max(timestamp, start), 0, quota
+
+def window_start(reset_iso: Optional[str], window: timedelta) -> Optional[str]:
+    try:
+        return sql_timestamp(datetime.fromisoformat(reset_iso) - window)
+    except (TypeError, ValueError):
+        return None
+
+def replay(conn, strategy: Strategy, since: str, until: str, hours: int = 24,
+           offset: timedelta = timedelta(0), open_loop: bool = False, history_hours: int = 0) -> dict:
+    """
+    Run `strategy` over [since, until) (increments' clock). Usage from the
+    `hours` (or `history_hours`) before `since` warms up the windows.
+    open_loop: the strategy sees recorded usage and quota instead of the
+    projected ones.
+    """
+    claudes = {row[0]: claude_info_from_row(row) for row in conn.execute(CLAUDE_INFO_SQL)}
+    warmup = sql_timestamp(datetime.fromisoformat(since) - timedelta(hours=max(hours, history_hours)))
+    recorded_window = UsageWindow(claudes, hours)
+    projected_window = recorded_window if open_loop else UsageWindow(claudes, hours)
+    costs = CostSeries()
+    if history_hours:
+        # Cost by mode (UsageWindow keyed by mode) and quota readings the strategy sees
+        history_cost = UsageWindow(("autonomy", "collaboration"), history_hours)
+        last_hour_cost = UsageWindow(("autonomy", "collaboration"), 1)
+        quota_history = deque()  # (time, quota) as the strategy sees them
+
+    quota = None
+    recorded_interval = {}   # claude_name -> interval the timer actually ran at
+    simulated_interval = {}  # claude_name -> interval the strategy gave it
+    decisions = {}           # claude_name -> [recommended intervals]
+    burn = {'recorded_cost': 0.0, 'projected_cost': 0.0,
+            'recorded_autonomy_cost': 0.0, 'projected_autonomy_cost': 0.0}
+    session_pct, weekly_pct = [], []
+    at_reset = {'session_5hour': [], 'week_all': []}
+    window_last = {}  # quota key -> (reset, rescaled %) of the latest reading
+    spreads_recorded, spreads_projected = [], []
+    last_hour = None
+    events = 0
+
+    merged = heapq.merge(quota_events(conn, warmup, until, offset),
+                         increment_events(conn, warmup, until), key=lambda event: event[:2])
+    for timestamp, kind, payload in merged:
+        events += 1
+        if kind == 0:
+            quota = payload
+            if timestamp >= since:
+                seen = dict(quota)
+                for key, reset_key, window, out in (
+                        ('session_5hour', 'session_5hour_reset', timedelta(hours=5), session_pct),
+                        ('week_all', 'week_reset', timedelta(days=7), weekly_pct)):
+                    start = window_start(quota[reset_key], window)
+                    if start is None or quota[key] is None:
+                        continue
+                    recorded, projected = costs.since(max(start, since))
+                    if recorded > 0:
+                        out.append(quota[key] * projected / recorded)
+                        seen[key] = round(out[-1])
+                        last = window_last.get(key)
+                        if last is not None and last[0] != quota[reset_key]:
+                            at_reset[key].append(last[1])
+                        window_last[key] = (quota[reset_key], out[-1])
+                if not open_loop:
+                    quota = seen
+            if history_hours:
+                quota_history.append((datetime.fromisoformat(quota['timestamp']), quota))
+            continue
+
+        _, name, mode, cost, weighted, row_interval = payload
+        now = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+        scale = 1.0
+        if mode == "autonomy":
+            actual = recorded_interval.get(name) or row_interval or EMERGENCY_INTERVAL
+            if timestamp >= since:
+                scale = actual / simulated_interval.get(name, actual)
+            recorded_window.advance(now)
+            recorded_window.add(now, name, weighted)
+            if not open_loop:
+                projected_window.advance(now)
+                projected_window.add(now, name, weighted * scale)
+            if row_interval:
+                recorded_interval[name] = row_interval
+
+        if history_hours:
+            for window in (history_cost, last_hour_cost):
+                window.advance(now)
+                window.add(now, mode, cost if open_loop else cost * scale)
+
+        if timestamp < since:
+            continue
+        burn['recorded_cost'] += cost
+        burn['projected_cost'] += cost * scale
+        if mode == "autonomy":
+            burn['recorded_autonomy_cost'] += cost
+            burn['projected_autonomy_cost'] += cost * scale
+        costs.add(timestamp, cost, cost * scale)
+
+        if mode == "autonomy":
+            if history_hours:
+                horizon = now - timedelta(hours=history_hours)
+                while quota_history and quota_history[0][0] < horizon:
+                    quota_history.popleft()
+                history_cost.advance(now)
+                last_hour_cost.advance(now)
+                snapshot = AllocationSnapshot(quota, claudes, projected_window.usage,
+                                              tuple(q for _, q in quota_history),
+                                              history_cost.usage, last_hour_cost.usage)
+            else:
+                snapshot = AllocationSnapshot(quota, claudes, projected_window.usage)
+            current = simulated_interval.get(name) or recorded_interval.get(name) or DEFAULT_INTERVAL
+            interval = int(strategy(snapshot, name, current, now))
+            simulated_interval[name] = interval
+            decisions.setdefault(name, []).append(interval)
+
+        hour = timestamp[:13]
+        if hour != last_hour:
+            last_hour = hour
+            recorded_window.advance(now)
+            projected_window.advance(now)
+            spread = recorded_window.spread()
+            if spread is not None:
+                spreads_recorded.append(spread)
+            spread = projected_window.spread()
+            if spread is not None:
+                spreads_projected.append(spread)
+
+    burn = {key: round(value, 4) for key, value in burn.items()}
+    burn['ratio'] = round(burn['projected_cost'] / burn['recorded_cost'], 4) if burn['recorded_cost'] else None
+    return {
+        'events': events,
+        'intervals': {
+            'fleet': interval_summary([v for values in decisions.values() for v in values]),
+            'per_claude': {name: interval_summary(values) for name, values in sorted(decisions.items())},
+        },
+        'burn': {
+            **burn,
+            'session_5hour_pct': {**summarize([round(p, 1) for p in session_pct]),
+                                  'over_100': sum(p > 100 for p in session_pct),
+                                  'at_reset': summarize([round(p, 1) for p in at_reset['session_5hour']])},
+            'week_all_pct': {**summarize([round(p, 1) for p in weekly_pct]),
+                             'over_100': sum(p > 100 for p in weekly_pct),
+                             'at_reset': summarize([round(p, 1) for p in at_reset['week_all']])},
+        },
+        'fairness_spread': {
+            'recorded': summarize([round(s, 3) for s in spreads_recorded]),
+            'projected': summarize([round(s, 3) for s in spreads_projected]),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--since", help="start (UTC, default: first increment)")
+    parser.add_argument("--until", help="end (UTC, default: after the last increment)")
+    parser.add_argument("--strategy", default="v1", help=f"{', '.join(allocation_strategies.STRATEGIES)} or module:function")
+    parser.add_argument("--hours", type=int, default=24, help="fairness usage window")
+    parser.add_argument("--utc-offset", type=float,
+                        default=datetime.now().astimezone().utcoffset().total_seconds() / 3600,
+                        help="hours quota_info's local clock is ahead of UTC")
+    parser.add_argument("--history-hours", type=int,
+                        help="quota and cost history for the strategy (default: the registered strategy's)")
+    parser.add_argument("--open-loop", action="store_true",
+                        help="feed the strategy recorded rather than projected usage and quota")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    conn = connect(args.db, readonly=True)
+    first, last = conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM resource_share_increments").fetchone()
+    if first is None:
+        raise SystemExit("No increments to replay")
+    since = sql_timestamp(datetime.fromisoformat(args.since)) if args.since else first
+    until = (sql_timestamp(datetime.fromisoformat(args.until)) if args.until
+             else sql_timestamp(datetime.fromisoformat(last) + timedelta(seconds=1)))
+
+    history_hours = args.history_hours
+    if history_hours is None:
+        registered = allocation_strategies.STRATEGIES.get(args.strategy)
+        history_hours = registered.history_hours if registered else 0
+
+    started = time.perf_counter()
+    results = replay(conn, load_strategy(args.strategy), since, until, args.hours,
+                     timedelta(hours=args.utc_offset), args.open_loop, history_hours)
+    elapsed = time.perf_counter() - started
+    conn.close()
+
+    fleet = results['intervals']['fleet']
+    burn = results['burn']
+    spread = results['fairness_spread']
+    print(f"\n=== Replay of {args.strategy} over {since} .. {until} ===")
+    print(f"  {results['events']} events in {elapsed:.2f}s ({results['events'] / elapsed:,.0f}/s)")
+    print(f"  Intervals: {fleet.get('count', 0)} decisions, mean {fleet.get('mean', 0):.0f}s, "
+          f"p50 {fleet.get('p50', 0)}s, at MIN {fleet.get('at_min', 0):.0%}, at MAX {fleet.get('at_max', 0):.0%}")
+    for name, summary in results['intervals']['per_claude'].items():
+        print(f"    {name:20s} mean {summary['mean']:7.0f}s  p50 {summary['p50']:5d}s  "
+              f"min {summary['min']:5d}s  max {summary['max']:5d}s")
+    print(f"  Burn: projected ${burn['projected_cost']:.2f} vs recorded ${burn['recorded_cost']:.2f} "
+          f"(x{burn['ratio']}); weekly quota peak {burn['week_all_pct'].get('max', 0)}% "
+          f"({burn['week_all_pct']['over_100']} readings over 100%), 5hr peak "
+          f"{burn['session_5hour_pct'].get('max', 0)}% ({burn['session_5hour_pct']['over_100']} over 100%)")
+    session_reset, weekly_reset = burn['session_5hour_pct']['at_reset'], burn['week_all_pct']['at_reset']
+    print(f"  Used at reset: 5hr mean {session_reset.get('mean', 0)}% (p50 {session_reset.get('p50', 0)}%) over "
+          f"{session_reset['count']} windows, weekly mean {weekly_reset.get('mean', 0)}% over {weekly_reset['count']}")
+    print(f"  Fairness spread (max/min 24h usage): recorded p50 {spread['recorded'].get('p50', 0)} "
+          f"-> projected p50 {spread['projected'].get('p50', 0)}")
+
+    params = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k != "output"}
+    path = bench_common.save_results(f"replay-{args.strategy.replace(':', '-')}",
+                                     {"params": {**params, 'since': since, 'until': until},
+                                      "elapsed_s": round(elapsed, 3), **results}, args.output)
+    print(f"\nResults saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -4,61 +4,208 @@ Resource-Share Webhook Server
 Runs as clap-admin user to receive resource-share data from all Claudes
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
-from datetime import datetime, date, timedelta
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from datetime import datetime, date, timedelta, timezone
 import sqlite3
 from pathlib import Path
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import json
+import logging
+import os
+import secrets
 import uvicorn
+from change_feed import ChangeFeed
+from dashboard_stream import DashboardStream
+from db_queries import FLEET_TODAY_SQL, FLEET_WEEK_SQL
+from db_pool import ConnectionPool, current_timestamp, day_bounds, hour_ceiling, hour_start, sql_timestamp
+from identity_cache import IdentityCache
+import increment_history
+import migrate_add_hourly_rollup
+import timeseries
+from page_cache import PageCache, page_response, static_page
+from rolling_usage import RollingUsage, UsageSample, window_start
+from ingest_queue import WriteBehindQueue
+import wire_format
+from server_logging import start_logging, stop_logging, log_event, log_sampled
+
+try:
+    from brotli_asgi import BrotliMiddleware  # Optional: pip install brotli-asgi
+except ImportError:
+    BrotliMiddleware = None
 # EMERGENCY FIX 2026-01-15: Disabled allocation calculator - using constant interval
-# from allocation_calculator import calculate_recommended_interval
+# (now the default 'constant' strategy; RESOURCE_SHARE_ALLOCATION_STRATEGY picks another)
+from allocation_calculator import QUOTA_TIME_KEYS, load_snapshot
+from allocation_cache import AllocationCache
+import allocation_strategies
 
 # Configuration
 DB_PATH = Path("/home/clap-admin/cooperation-platform/resource-sharing/data/resource_tracking.db")
 LOG_PATH = Path("/home/clap-admin/cooperation-platform/resource-sharing/logs/server.log")
+MAX_BATCH_SIZE = 1000  # Increments accepted per batch request
+MAX_TIMER_INTERVAL = 7 * 24 * 3600  # Largest current_interval accepted (seconds)
+DB_WORKERS = 4  # Threads available for blocking SQLite work
+
+# Write-behind ingestion (off by default): acknowledge increments once queued
+# and group-commit every WRITE_BEHIND_MAX_ROWS rows or WRITE_BEHIND_MAX_DELAY_MS
+WRITE_BEHIND = os.environ.get("RESOURCE_SHARE_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_MAX_ROWS = int(os.environ.get("RESOURCE_SHARE_WRITE_BEHIND_ROWS", "200"))
+WRITE_BEHIND_MAX_DELAY_MS = int(os.environ.get("RESOURCE_SHARE_WRITE_BEHIND_MS", "200"))
+# Queued increments a shutdown couldn't commit, one JSON increment per line for replay
+WRITE_BEHIND_SPILL_PATH = DB_PATH.parent / "write_behind_spill.ndjson"
+# allocation_strategies strategy answering increments: 'constant' (the emergency
+# interval), 'v1' (the allocation calculator), 'forecast' (quota burn-rate forecast), ...
+# RESOURCE_SHARE_ALLOCATION_CALCULATOR=1 predates strategies and still selects v1
+ALLOCATION_STRATEGY = os.environ.get("RESOURCE_SHARE_ALLOCATION_STRATEGY") or (
+    "v1" if os.environ.get("RESOURCE_SHARE_ALLOCATION_CALCULATOR", "0") == "1" else "constant")
+# Shared secret for /admin/* (X-Admin-Token header); without one they only answer localhost
+ADMIN_TOKEN = os.environ.get("RESOURCE_SHARE_ADMIN_TOKEN") or None
+LOCAL_CLIENTS = {"127.0.0.1", "::1", "localhost"}
+ALLOCATION_MIN_AGE = 10  # Recompute the fleet allocation at most this often while data changes
+ALLOCATION_MAX_AGE = 60  # ...and at least this often, as quota window time fractions move
+ALLOCATION_USAGE_THRESHOLD = 0.1  # Recompute once new usage would move a fairness multiplier by 10%
+QUOTA_POLL_SECONDS = 15  # How often to look for new quota_info rows from check-quota.py
+DASHBOARD_MIN_AGE = 2    # Re-render the dashboard at most this often while increments stream in
+DASHBOARD_MAX_AGE = 30   # ...and at least this often, so "in 12min" style times stay current
+DASHBOARD_SHELL = Path(__file__).parent / "static" / "dashboard.html"  # Client-side /dashboard
+DASHBOARD_SHELL_MAX_AGE = 3600  # Browsers reuse the shell this long without asking
+COMPRESS_MIN_BYTES = 500  # Smaller responses (increment acks) aren't worth compressing
+HISTORY_PAGE_SIZE = 100       # Default rows per /resource/increments page
+HISTORY_MAX_PAGE_SIZE = 1000
+HISTORY_STREAM_CHUNK = 1000   # Rows per short read while streaming an NDJSON export
+NDJSON_TYPE = "application/x-ndjson"
+
+@asynccontextmanager
+async def lifespan(app):
+    """Load caches and start background workers; drain them on shutdown (systemctl restart)"""
+    log_listener = start_logging(LOG_PATH)
+    log_message("Resource-Share server starting...")
+    backfilled = await run_db(ensure_schema)
+    if backfilled:
+        log_message(f"Backfilled the hourly rollup from existing increments ({backfilled} rows)")
+    global identities_published
+    count = await run_db(load_identities)
+    identities_published = identity_cache.version
+    log_message(f"Loaded {count} Claude identities")
+    series = await run_db(rebuild_rolling_usage)
+    log_message(f"Rebuilt rolling usage counters ({series} Claude/mode series)")
+    if write_queue is not None:
+        await write_queue.start()
+        log_message(f"Write-behind queue enabled ({WRITE_BEHIND_MAX_ROWS} rows / {WRITE_BEHIND_MAX_DELAY_MS}ms)")
+    quota_watcher = asyncio.create_task(watch_quota(), name="quota-watcher")
+    dashboard_stream.start()
+    if ALLOCATION_READS_SNAPSHOT:
+        await allocation_cache.start()
+        if allocation_cache.fleet is not None:
+            log_message(f"Fleet allocation computed ({ALLOCATION_STRATEGY} strategy, "
+                        f"{len(allocation_cache.fleet.context.claudes)} Claudes)")
+    yield
+    await allocation_cache.stop()
+    await dashboard_stream.stop()
+    quota_watcher.cancel()
+    if write_queue is not None:
+        pending = write_queue.metrics()['pending']
+        await write_queue.stop()
+        log_message(f"Write-behind queue drained ({pending} rows pending at shutdown)")
+    log_message("Resource-Share server stopped")
+    stop_logging(log_listener)
+
+class UncompressedPaths:
+    """
+    ASGI wrapper applying a compression middleware to every path except
+    `paths`. Starlette's GZipMiddleware only passes text/event-stream
+    through since 0.45; older versions buffer SSE events until the
+    compressor flushes, which would stall /dashboard/stream.
+    """
+
+    def __init__(self, app, middleware, paths, **options):
+        self.app = app
+        self.compressed = middleware(app, **options)
+        self.paths = frozenset(paths)
 
-app = FastAPI(title="Resource-Share Tracker")
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.paths:
+            await self.app(scope, receive, send)
+        else:
+            await self.compressed(scope, receive, send)
+
+app = FastAPI(title="Resource-Share Tracker", lifespan=lifespan)
+# Brotli when brotli-asgi is installed (it falls back to gzip for clients
+# without br), otherwise gzip. Neither touches the SSE stream
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_BYTES,
+                       excluded_handlers=[r"^/dashboard/stream$"])  # Would buffer SSE events
+else:
+    app.add_middleware(UncompressedPaths, middleware=GZipMiddleware, paths=["/dashboard/stream"],
+                       minimum_size=COMPRESS_MIN_BYTES)
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="resource-db")
+# Long-lived connections: DB_WORKERS readers + one writer, WAL mode
+db_pool = ConnectionPool(DB_PATH, readers=DB_WORKERS)
+# claude_identities, loaded at startup and refreshed via PRAGMA data_version
+identity_cache = IdentityCache()
+# Change events (new quota rows, ...) for streaming clients
+change_feed = ChangeFeed()
+latest_quota = None  # Most recent quota_info row seen by watch_quota()
+identities_published = 0  # identity_cache.version last announced with an "identities" event
+# Today / 7-day usage per (Claude, mode), rebuilt at startup and kept current on ingest
+rolling_usage = RollingUsage()
+# Rendered /dashboard/html and /dashboard/data, reused until change_feed.version moves on
+dashboard_cache = PageCache(min_age=DASHBOARD_MIN_AGE, max_age=DASHBOARD_MAX_AGE)
+dashboard_data_cache = PageCache(min_age=DASHBOARD_MIN_AGE, max_age=DASHBOARD_MAX_AGE)
+dashboard_shell = static_page(DASHBOARD_SHELL, "text/html; charset=utf-8")
 
 # Request models
 class ResourceIncrement(BaseModel):
     claude_name: str
     mode: str  # "autonomy" or "collaboration"
     cost_delta: float = None  # Actual $ cost from ccusage (new metric)
-    cache_read_increment: int = None  # Deprecated: kept for backwards compat
+    cache_read_increment: int = Field(None, ge=0, le=wire_format.MAX_I64)  # Deprecated: kept for backwards compat
     context_percentage: float = None
-    current_interval: int = None  # Current timer interval in seconds
+    current_interval: int = Field(None, gt=0, le=MAX_TIMER_INTERVAL)  # Current timer interval in seconds
+
+class ResourceIncrementBatch(BaseModel):
+    increments: List[ResourceIncrement]
 
 class ResourceQuery(BaseModel):
     claude_name: str
     date: str = None  # Optional, defaults to today
 
-def get_db():
-    """Get database connection"""
-    return sqlite3.connect(DB_PATH)
+async def run_db(func, *args):
+    """
+    Run blocking database/file work on the dedicated DB thread pool.
+    Keeps the event loop free so a slow dashboard render doesn't stall
+    concurrent increment POSTs.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args))
 
-def log_message(message: str):
-    """Log to file"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_PATH, "a") as f:
-        f.write(f"{timestamp} - {message}\n")
+def log_message(message: str, level: int = logging.INFO, **fields):
+    """Log via the queue-backed pipeline (written by a background thread, see server_logging.py)"""
+    log_event(message, level, **fields)
 
 # Dashboard helper functions
 def get_latest_quota():
     """Get most recent quota information"""
-    conn = get_db()
-    cursor = conn.cursor()
+    with db_pool.reader() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT session_5hour, week_all, week_sonnet,
-               session_5hour_reset, week_reset, timestamp
-        FROM quota_info
-        ORDER BY timestamp DESC
-        LIMIT 1
-    """)
+        cursor.execute("""
+            SELECT session_5hour, week_all, week_sonnet,
+                   session_5hour_reset, week_reset, timestamp
+            FROM quota_info
+            ORDER BY timestamp DESC
+            LIMIT 1
+        """)
 
-    result = cursor.fetchone()
-    conn.close()
+        result = cursor.fetchone()
 
     if not result:
         return None
@@ -136,268 +283,774 @@ def calculate_time_elapsed_percentage(reset_iso, window_duration_seconds):
     except:
         return 0
 
-def get_all_claudes_status():
-    """Get status for all active Claudes"""
-    conn = get_db()
-    cursor = conn.cursor()
+def claude_status(claude, today_rows, weekly_rows):
+    """
+    Dashboard status for one Claude.
 
-    # Get all active Claudes with their preferences
-    cursor.execute("""
-        SELECT name, model, cost_multiplier, collaborative_pref
-        FROM claude_identities
-        WHERE active = 1
-        ORDER BY name
-    """)
+    today_rows: (mode, total_usage, last_activity, current_interval) for
+    today, ordered by mode; weekly_rows: (mode, total_usage) for the last
+    7 days.
+    """
+    name, model, collab_pref = claude['name'], claude['model'], claude['collaborative_pref']
+
+    usage_by_mode = {}
+    last_activity = None
+    next_prompt_interval = None
+
+    for mode, usage, activity, interval in today_rows:
+        usage_by_mode[mode] = usage or 0
+        if activity:
+            activity_dt = datetime.fromisoformat(activity)
+            if not last_activity or activity_dt > last_activity:
+                last_activity = activity_dt
+                if mode == "autonomy":
+                    next_prompt_interval = interval
+
+    # Calculate daily percentages
+    autonomous_usage = usage_by_mode.get('autonomy', 0)
+    collaborative_usage = usage_by_mode.get('collaboration', 0)
+    total_usage = autonomous_usage + collaborative_usage
+
+    if total_usage > 0:
+        collab_percentage = int((collaborative_usage / total_usage) * 100)
+    else:
+        collab_percentage = 0
 
-    claudes = cursor.fetchall()
-    results = []
+    # This week's usage (last 7 days)
+    weekly_usage_by_mode = {mode: usage or 0 for mode, usage in weekly_rows}
 
-    for claude in claudes:
-        name, model, cost_multiplier, collab_pref = claude
+    weekly_autonomous = weekly_usage_by_mode.get('autonomy', 0)
+    weekly_collaborative = weekly_usage_by_mode.get('collaboration', 0)
+    weekly_total = weekly_autonomous + weekly_collaborative
 
-        # Get today's usage by mode
-        today = date.today().isoformat()
-        cursor.execute("""
-            SELECT mode,
-                   SUM(normalized_usage) as total_usage,
-                   MAX(timestamp) as last_activity,
-                   MAX(recommended_interval) as current_interval
-            FROM resource_share_increments
-            WHERE claude_name = ? AND date(timestamp) = ?
-            GROUP BY mode
-        """, (name, today))
-
-        usage_by_mode = {}
-        last_activity = None
-        next_prompt_interval = None
-
-        for row in cursor.fetchall():
-            mode, usage, activity, interval = row
-            usage_by_mode[mode] = usage or 0
-            if activity:
-                activity_dt = datetime.fromisoformat(activity)
-                if not last_activity or activity_dt > last_activity:
-                    last_activity = activity_dt
-                    if mode == "autonomy":
-                        next_prompt_interval = interval
-
-        # Calculate daily percentages
-        autonomous_usage = usage_by_mode.get('autonomy', 0)
-        collaborative_usage = usage_by_mode.get('collaboration', 0)
-        total_usage = autonomous_usage + collaborative_usage
-
-        if total_usage > 0:
-            collab_percentage = int((collaborative_usage / total_usage) * 100)
-        else:
-            collab_percentage = 0
+    if weekly_total > 0:
+        weekly_collab_percentage = int((weekly_collaborative / weekly_total) * 100)
+    else:
+        weekly_collab_percentage = 0
+
+    # Calculate next prompt due
+    next_prompt_due = "No recent activity"
+    if last_activity and next_prompt_interval:
+        next_due_dt = last_activity + timedelta(seconds=next_prompt_interval)
+        next_prompt_due = format_time_until(next_due_dt)
+
+    # Determine daily status
+    if collab_percentage < collab_pref:
+        daily_status = "available"
+        daily_status_emoji = "🟢"
+    elif collab_percentage < collab_pref + 10:
+        daily_status = "moderate"
+        daily_status_emoji = "🟡"
+    else:
+        daily_status = "busy"
+        daily_status_emoji = "🔴"
+
+    # Determine weekly status (primary indicator)
+    if weekly_collab_percentage < collab_pref:
+        weekly_status = "available"
+        weekly_status_emoji = "🟢"
+        weekly_status_text = "Below weekly target"
+    elif weekly_collab_percentage < collab_pref + 10:
+        weekly_status = "moderate"
+        weekly_status_emoji = "🟡"
+        weekly_status_text = "At weekly target"
+    else:
+        weekly_status = "busy"
+        weekly_status_emoji = "🔴"
+        weekly_status_text = "Over weekly target"
 
-        # Get this week's usage (last 7 days)
-        week_start = (datetime.now() - timedelta(days=7)).isoformat()
-        cursor.execute("""
-            SELECT mode,
-                   SUM(normalized_usage) as total_usage
-            FROM resource_share_increments
-            WHERE claude_name = ? AND timestamp >= ?
-            GROUP BY mode
-        """, (name, week_start))
-
-        weekly_usage_by_mode = {}
-        for row in cursor.fetchall():
-            mode, usage = row
-            weekly_usage_by_mode[mode] = usage or 0
-
-        weekly_autonomous = weekly_usage_by_mode.get('autonomy', 0)
-        weekly_collaborative = weekly_usage_by_mode.get('collaboration', 0)
-        weekly_total = weekly_autonomous + weekly_collaborative
-
-        if weekly_total > 0:
-            weekly_collab_percentage = int((weekly_collaborative / weekly_total) * 100)
-        else:
-            weekly_collab_percentage = 0
-
-        # Calculate next prompt due
-        next_prompt_due = "No recent activity"
-        if last_activity and next_prompt_interval:
-            next_due_dt = last_activity + timedelta(seconds=next_prompt_interval)
-            next_prompt_due = format_time_until(next_due_dt)
-
-        # Determine daily status
-        if collab_percentage < collab_pref:
-            daily_status = "available"
-            daily_status_emoji = "🟢"
-        elif collab_percentage < collab_pref + 10:
-            daily_status = "moderate"
-            daily_status_emoji = "🟡"
-        else:
-            daily_status = "busy"
-            daily_status_emoji = "🔴"
-
-        # Determine weekly status (primary indicator)
-        if weekly_collab_percentage < collab_pref:
-            weekly_status = "available"
-            weekly_status_emoji = "🟢"
-            weekly_status_text = "Below weekly target"
-        elif weekly_collab_percentage < collab_pref + 10:
-            weekly_status = "moderate"
-            weekly_status_emoji = "🟡"
-            weekly_status_text = "At weekly target"
-        else:
-            weekly_status = "busy"
-            weekly_status_emoji = "🔴"
-            weekly_status_text = "Over weekly target"
-
-        results.append({
-            'name': name,
-            'model': model,
-            'autonomous_usage': autonomous_usage,
-            'collaborative_usage': collaborative_usage,
-            'total_usage': total_usage,
-            'collab_percentage': collab_percentage,
-            'weekly_autonomous': weekly_autonomous,
-            'weekly_collaborative': weekly_collaborative,
-            'weekly_total': weekly_total,
-            'weekly_collab_percentage': weekly_collab_percentage,
-            'collab_pref': collab_pref,
-            'daily_status': daily_status,
-            'daily_status_emoji': daily_status_emoji,
-            'weekly_status': weekly_status,
-            'weekly_status_emoji': weekly_status_emoji,
-            'weekly_status_text': weekly_status_text,
-            'next_prompt_due': next_prompt_due
-        })
-
-    conn.close()
-    return results
+    return {
+        'name': name,
+        'model': model,
+        'autonomous_usage': autonomous_usage,
+        'collaborative_usage': collaborative_usage,
+        'total_usage': total_usage,
+        'collab_percentage': collab_percentage,
+        'weekly_autonomous': weekly_autonomous,
+        'weekly_collaborative': weekly_collaborative,
+        'weekly_total': weekly_total,
+        'weekly_collab_percentage': weekly_collab_percentage,
+        'collab_pref': collab_pref,
+        'daily_status': daily_status,
+        'daily_status_emoji': daily_status_emoji,
+        'weekly_status': weekly_status,
+        'weekly_status_emoji': weekly_status_emoji,
+        'weekly_status_text': weekly_status_text,
+        'next_prompt_due': next_prompt_due
+    }
+
+def fleet_usage_rows(day_start, day_end, week_start):
+    """
+    Today's and the last 7 days' usage per Claude from SQLite: two grouped
+    queries for the whole fleet (mostly hourly rollup rows) instead of two
+    queries per Claude. Returns ({name: today_rows}, {name: weekly_rows}).
+    """
+    with db_pool.reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute(FLEET_TODAY_SQL, {'day_start': day_start, 'day_end': day_end})
+        today_rows = {}
+        for name, *row in cursor.fetchall():
+            today_rows.setdefault(name, []).append(tuple(row))
+
+        cursor.execute(FLEET_WEEK_SQL, {'week_start': week_start, 'week_hour': hour_ceiling(week_start)})
+        weekly_rows = {}
+        for name, *row in cursor.fetchall():
+            weekly_rows.setdefault(name, []).append(tuple(row))
+    return today_rows, weekly_rows
+
+def get_all_claudes_status():
+    """
+    Get status for all active Claudes.
+
+    Usage totals come from the in-memory rolling counters (no increments
+    query); before they are loaded, from fleet_usage_rows(). Both read the
+    7-day window from the counters' bucket boundary, so the figures don't
+    jump when the counters finish loading.
+    """
+    # All active Claudes with their preferences (from the identity cache)
+    if identity_cache.loaded_at is None:
+        load_identities()
+    claudes = identity_cache.active()
+
+    today = date.today()
+    week_start = window_start(datetime.now() - timedelta(days=7))
+    if rolling_usage.loaded:
+        today_rows, weekly_rows = rolling_usage.fleet_rows(today.isoformat(), week_start)
+    else:
+        today_rows, weekly_rows = fleet_usage_rows(*day_bounds(today), sql_timestamp(week_start))
+
+    return [
+        claude_status(claude, today_rows.get(claude['name'], []), weekly_rows.get(claude['name'], []))
+        for claude in claudes
+    ]
+
+def ensure_schema():
+    """
+    Create the hourly rollup if this database predates it, and backfill it
+    if it is missing history: every increment write upserts into it, and
+    fleet status, fairness usage, daily aggregation and the timeseries read
+    whole hours only from it. A no-op (two MIN() lookups) once it is
+    complete. Returns rollup rows backfilled.
+    """
+    with db_pool.writer() as conn:
+        return migrate_add_hourly_rollup.ensure_rollup(conn)
+
+def rebuild_rolling_usage():
+    """Reload the rolling counters from the increments table (startup)"""
+    with db_pool.reader() as conn:
+        return rolling_usage.rebuild(conn)
+
+def quota_windows(quota):
+    """Quota usage vs time elapsed for each usage window, as the dashboard shows them"""
+    if not quota:
+        return []
+
+    # Calculate time elapsed percentages
+    session_time_pct = calculate_time_elapsed_percentage(
+        quota['session_5hour_reset'], 5 * 3600  # 5 hours in seconds
+    )
+    week_time_pct = calculate_time_elapsed_percentage(
+        quota['week_reset'], 7 * 24 * 3600  # 7 days in seconds
+    )
+    session_reset = format_reset_time(quota['session_5hour_reset'])
+    week_reset = format_reset_time(quota['week_reset'])
+
+    return [
+        {'label': 'Session (5-hour)', 'quota_pct': quota['session_5hour'] or 0,
+         'time_pct': session_time_pct, 'resets': session_reset},
+        {'label': 'Week (all models)', 'quota_pct': quota['week_all'] or 0,
+         'time_pct': week_time_pct, 'resets': week_reset},
+        {'label': 'Week (Sonnet only)', 'quota_pct': quota['week_sonnet'] or 0,
+         'time_pct': week_time_pct, 'resets': week_reset},
+    ]
 
 def get_dashboard_data():
     """Aggregate all dashboard data"""
+    quota = get_latest_quota()
     return {
-        'quota': get_latest_quota(),
+        'quota': quota,
+        'quota_windows': quota_windows(quota),
         'claudes': get_all_claudes_status(),
         'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
 
-@app.post("/resource-share/increment")
-async def record_resource_increment(data: ResourceIncrement):
+def get_cost_multipliers(claude_names):
+    """Cost multipliers for a set of Claudes from the identity cache (default 3 if not found)"""
+    return {name: identity_cache.cost_multiplier(name) for name in sorted(set(claude_names))}
+
+def load_identities():
+    """(Re)load the identity cache - uses the writer connection so data_version checks line up"""
+    with db_pool.writer() as conn:
+        identity_cache.load(conn)
+    return len(identity_cache)
+
+def refresh_identities():
+    """Blocking body of check_identities() - runs on the DB thread pool"""
+    with db_pool.reader() as conn:
+        return identity_cache.refresh_if_changed(conn)
+
+async def check_identities():
     """
-    Receive cost_delta (or legacy cache_read_increment) from a Claude
-    Stores in resource_share_increments and updates daily_resource_share
+    Pick up claude_identities edits made by other processes on the read
+    paths (ingest checks on the writer connection). Announces each change
+    once, whichever path noticed it, with an "identities" event, so the
+    dashboard re-renders and the fleet allocation is recomputed.
     """
+    global identities_published
+    await run_db(refresh_identities)
+    if identity_cache.version != identities_published:
+        identities_published = identity_cache.version
+        change_feed.publish("identities", count=len(identity_cache))
+
+allocation_strategy = allocation_strategies.get_strategy(ALLOCATION_STRATEGY)
+# Strategies that read quota and usage are served from a background-refreshed allocation
+ALLOCATION_READS_SNAPSHOT = allocation_strategy.reads_snapshot
+# Answers when the strategy reads nothing, or before its first allocation succeeds
+constant_allocation = allocation_strategies.allocate(
+    allocation_strategy if not ALLOCATION_READS_SNAPSHOT else allocation_strategies.get_strategy("constant"))
+
+def load_fleet_allocation():
+    """Blocking: one snapshot (quota, identities, 24h usage, the strategy's history) in one read transaction, allocated"""
+    with db_pool.reader() as conn:
+        snapshot = load_snapshot(conn, hours=24, history_hours=allocation_strategy.history_hours)
+        return allocation_strategies.allocate(allocation_strategy, snapshot)
+
+async def compute_fleet_allocation():
     try:
-        conn = get_db()
-        cursor = conn.cursor()
+        return await run_db(load_fleet_allocation)
+    except Exception as e:
+        log_message(f"ERROR computing fleet allocation: {e}", logging.ERROR)
+        raise
 
-        # Get cost multiplier for this Claude
-        cursor.execute("""
-            SELECT cost_multiplier FROM claude_identities WHERE name = ?
-        """, (data.claude_name,))
-        result = cursor.fetchone()
-        cost_multiplier = result[0] if result else 3  # Default to 3 if not found
+# Fleet allocation behind the calculator's recommendations, recomputed in the
+# background on new quota rows, identity edits, usage shifts and a timer
+allocation_cache = AllocationCache(change_feed, compute_fleet_allocation, ALLOCATION_MIN_AGE,
+                                   ALLOCATION_MAX_AGE, ALLOCATION_USAGE_THRESHOLD)
 
-        # Handle both new (cost_delta) and legacy (cache_read_increment) formats
-        if data.cost_delta is not None:
-            # New format: cost_delta is actual $ cost
-            cost_delta = data.cost_delta
-            normalized_usage = cost_delta / cost_multiplier  # Normalize for fairness
-
-            # For backwards compat, estimate cache_read_increment
-            # (not precise, but keeps old columns populated)
-            cache_read_increment = int(normalized_usage * 1000)  # rough estimate
-            weighted_cost = int(normalized_usage * cost_multiplier * 1000)  # rough estimate
-        else:
-            # Legacy format: cache_read_increment (tokens)
-            cache_read_increment = data.cache_read_increment or 0
-            weighted_cost = cache_read_increment * cost_multiplier
-
-            # Estimate cost_delta for new columns
-            cost_delta = weighted_cost / 1000.0  # rough estimate
-            normalized_usage = cache_read_increment * 1.0
-
-        # EMERGENCY FIX 2026-01-15: Use constant 1-hour interval for all Claudes
-        # This disables the allocation calculator while we fix the algorithm
-        current_interval = data.current_interval or 1800  # Default 30 min
-
-        # Constant interval for emergency mode
-        recommended_interval = 1800  # 30 minutes - Orange working on orange-home setup autonomously
-
-        # Simple recommendation structure for response
-        recommendation = {
-            'recommended_interval': recommended_interval,
-            'multipliers': {'emergency_mode': 1.0},
-            'quota_status': 'emergency_constant_interval'
-        }
+def record_usage(samples):
+    """Committed increments: into the rolling counters, and towards the next allocation refresh"""
+    rolling_usage.record(samples)
+    if ALLOCATION_READS_SNAPSHOT:
+        allocation_cache.record(samples)
 
-        # Insert into increments table (with both old and new columns)
+def get_recommendation(data: ResourceIncrement):
+    """
+    Recommended timer interval for the Claude sending this increment from
+    the configured strategy. Strategies reading quota and usage answer with
+    a lookup in the precomputed fleet allocation; recommendation_age is how
+    old that is, in seconds (None for constant strategies).
+    """
+    current_interval = data.current_interval or 1800  # Default 30 min
+
+    recommendation, age = None, None
+    if ALLOCATION_READS_SNAPSHOT:
+        recommendation, age = allocation_cache.lookup(data.claude_name, current_interval)
+    if recommendation is None:
+        # No allocation yet (its first computation failed): the constant interval until one succeeds
+        recommendation = allocation_strategies.recommend(constant_allocation, data.claude_name, current_interval)
+
+    return {
+        'recommended_interval': recommendation['recommended_interval'],
+        'current_interval': current_interval,
+        'multipliers': recommendation['multipliers'],
+        'quota_status': recommendation['quota_status'],
+        'recommendation_age': round(age, 1) if age is not None else None
+    }
+
+# Add one increment to its hourly_resource_share row (migrate_add_hourly_rollup.py)
+UPSERT_HOURLY_SQL = """
+    INSERT INTO hourly_resource_share
+        (claude_name, hour, mode, cost_delta, normalized_usage, weighted_cost,
+         cache_read_increment, samples, last_timestamp, max_recommended_interval)
+    VALUES (:claude_name, :hour, :mode, :cost_delta, :normalized_usage, :weighted_cost,
+            :cache_read_increment, 1, :timestamp, :recommended_interval)
+    ON CONFLICT(claude_name, hour, mode) DO UPDATE SET
+        cost_delta = cost_delta + excluded.cost_delta,
+        normalized_usage = normalized_usage + excluded.normalized_usage,
+        weighted_cost = weighted_cost + excluded.weighted_cost,
+        cache_read_increment = cache_read_increment + excluded.cache_read_increment,
+        samples = samples + 1,
+        last_timestamp = MAX(last_timestamp, excluded.last_timestamp),
+        max_recommended_interval = MAX(COALESCE(max_recommended_interval, excluded.max_recommended_interval),
+                                       COALESCE(excluded.max_recommended_interval, max_recommended_interval))
+"""
+
+def store_increment(cursor, data: ResourceIncrement, cost_multiplier):
+    """
+    Insert one increment and update its hourly and daily totals (no commit).
+    Returns (response payload, UsageSample) for this increment; the sample
+    goes to rolling_usage once the transaction commits.
+    """
+    # Handle both new (cost_delta) and legacy (cache_read_increment) formats
+    if data.cost_delta is not None:
+        # New format: cost_delta is actual $ cost
+        cost_delta = data.cost_delta
+        normalized_usage = cost_delta / cost_multiplier  # Normalize for fairness
+
+        # For backwards compat, estimate cache_read_increment
+        # (not precise, but keeps old columns populated)
+        cache_read_increment = int(normalized_usage * 1000)  # rough estimate
+        weighted_cost = int(normalized_usage * cost_multiplier * 1000)  # rough estimate
+    else:
+        # Legacy format: cache_read_increment (tokens)
+        cache_read_increment = data.cache_read_increment or 0
+        weighted_cost = cache_read_increment * cost_multiplier
+
+        # Estimate cost_delta for new columns
+        cost_delta = weighted_cost / 1000.0  # rough estimate
+        normalized_usage = cache_read_increment * 1.0
+
+    recommendation = get_recommendation(data)
+    recommended_interval = recommendation['recommended_interval']
+
+    # Insert into increments table (with both old and new columns). The
+    # timestamp is set here rather than by the column default so the
+    # rolling counters see exactly what was stored
+    timestamp = current_timestamp()
+    cursor.execute("""
+        INSERT INTO resource_share_increments
+        (claude_name, timestamp, mode, cache_read_increment, context_percentage,
+         weighted_cost, recommended_interval, cost_delta, normalized_usage)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (data.claude_name, timestamp, data.mode, cache_read_increment, data.context_percentage,
+          weighted_cost, recommended_interval, cost_delta, normalized_usage))
+
+    cursor.execute(UPSERT_HOURLY_SQL, {
+        'claude_name': data.claude_name,
+        'hour': hour_start(timestamp),
+        'mode': data.mode,
+        'cost_delta': cost_delta,
+        'normalized_usage': normalized_usage,
+        'weighted_cost': weighted_cost,
+        'cache_read_increment': cache_read_increment,
+        'timestamp': timestamp,
+        'recommended_interval': recommended_interval,
+    })
+
+    # Update daily totals (using cache_read_increment for now, can migrate later)
+    today = date.today().isoformat()
+
+    if data.mode == "autonomy":
         cursor.execute("""
-            INSERT INTO resource_share_increments
-            (claude_name, mode, cache_read_increment, context_percentage,
-             weighted_cost, recommended_interval, cost_delta, normalized_usage)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (data.claude_name, data.mode, cache_read_increment, data.context_percentage,
-              weighted_cost, recommended_interval, cost_delta, normalized_usage))
+            INSERT INTO daily_resource_share (claude_name, date, autonomous_tokens)
+            VALUES (?, ?, ?)
+            ON CONFLICT(claude_name, date)
+            DO UPDATE SET
+                autonomous_tokens = autonomous_tokens + ?,
+                last_updated = CURRENT_TIMESTAMP
+        """, (data.claude_name, today, cache_read_increment, cache_read_increment))
+    else:  # collaboration
+        cursor.execute("""
+            INSERT INTO daily_resource_share (claude_name, date, collaborative_tokens)
+            VALUES (?, ?, ?)
+            ON CONFLICT(claude_name, date)
+            DO UPDATE SET
+                collaborative_tokens = collaborative_tokens + ?,
+                last_updated = CURRENT_TIMESTAMP
+        """, (data.claude_name, today, cache_read_increment, cache_read_increment))
+
+    return {
+        "status": "success",
+        "claude_name": data.claude_name,
+        "cost_recorded": cost_delta if data.cost_delta is not None else None,
+        "tokens_recorded": cache_read_increment,  # For backwards compat
+        "recommended_interval": recommended_interval,
+        "current_interval": recommendation['current_interval'],
+        "multipliers": recommendation['multipliers'],
+        "quota_status": recommendation['quota_status'],
+        "recommendation_age": recommendation['recommendation_age']
+    }, UsageSample(data.claude_name, data.mode, timestamp, normalized_usage,
+                   weighted_cost, recommended_interval)
+
+def store_increments(cursor, increments):
+    """
+    Insert many increments in one transaction (no commit), each under its
+    own savepoint so one bad row does not discard the rest.
+    Returns (per-item results, samples of the rows recorded, cost multipliers used).
+    """
+    cursor.execute("BEGIN")
 
-        # Update daily totals (using cache_read_increment for now, can migrate later)
-        today = date.today().isoformat()
+    # Pick up identity edits made by other processes, then one multiplier lookup for the group
+    identity_cache.refresh_if_changed(cursor.connection)
+    cost_multipliers = get_cost_multipliers([item.claude_name for item in increments])
 
-        if data.mode == "autonomy":
-            cursor.execute("""
-                INSERT INTO daily_resource_share (claude_name, date, autonomous_tokens)
-                VALUES (?, ?, ?)
-                ON CONFLICT(claude_name, date)
-                DO UPDATE SET
-                    autonomous_tokens = autonomous_tokens + ?,
-                    last_updated = CURRENT_TIMESTAMP
-            """, (data.claude_name, today, cache_read_increment, cache_read_increment))
-        else:  # collaboration
-            cursor.execute("""
-                INSERT INTO daily_resource_share (claude_name, date, collaborative_tokens)
-                VALUES (?, ?, ?)
-                ON CONFLICT(claude_name, date)
-                DO UPDATE SET
-                    collaborative_tokens = collaborative_tokens + ?,
-                    last_updated = CURRENT_TIMESTAMP
-            """, (data.claude_name, today, cache_read_increment, cache_read_increment))
+    results = []
+    samples = []
+    for index, item in enumerate(increments):
+        cursor.execute("SAVEPOINT batch_item")
+        try:
+            result, sample = store_increment(cursor, item, cost_multipliers[item.claude_name])
+            cursor.execute("RELEASE SAVEPOINT batch_item")
+            samples.append(sample)
+        except sqlite3.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT batch_item")
+            cursor.execute("RELEASE SAVEPOINT batch_item")
+            result = {
+                "status": "error",
+                "claude_name": item.claude_name,
+                "detail": str(e)
+            }
+        results.append({"index": index, **result})
+
+    return results, samples, cost_multipliers
+
+def write_increment(data: ResourceIncrement):
+    """Blocking body of record_resource_increment() - runs on the DB thread pool"""
+    try:
+        with db_pool.writer() as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        conn.close()
+            # Get cost multiplier for this Claude
+            identity_cache.refresh_if_changed(conn)
+            cost_multiplier = identity_cache.cost_multiplier(data.claude_name)
+
+            result, sample = store_increment(cursor, data, cost_multiplier)
+        record_usage([sample])
+        normalized_usage = sample.normalized_usage
 
         # Log with appropriate metric
         if data.cost_delta is not None:
-            log_message(f"Recorded ${cost_delta:.4f} cost (normalized: {normalized_usage:.2f}) for {data.claude_name} ({data.mode}), recommended interval: {recommended_interval}s")
+            log_sampled(
+                f"Recorded ${result['cost_recorded']:.4f} cost (normalized: {normalized_usage:.2f}) for {data.claude_name} ({data.mode}), recommended interval: {result['recommended_interval']}s",
+                claude_name=data.claude_name, mode=data.mode, cost_delta=result['cost_recorded'],
+                normalized_usage=normalized_usage, recommended_interval=result['recommended_interval']
+            )
         else:
-            log_message(f"Recorded {cache_read_increment} tokens for {data.claude_name} ({data.mode}), recommended interval: {recommended_interval}s")
+            log_sampled(
+                f"Recorded {result['tokens_recorded']} tokens for {data.claude_name} ({data.mode}), recommended interval: {result['recommended_interval']}s",
+                claude_name=data.claude_name, mode=data.mode, tokens=result['tokens_recorded'],
+                recommended_interval=result['recommended_interval']
+            )
+
+        return result
+        
+    except Exception as e:
+        log_message(f"ERROR recording resource-share: {e}", logging.ERROR)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def write_queued_increments(increments):
+    """Group commit for the write-behind queue - runs on the DB thread pool"""
+    with db_pool.writer() as conn:
+        results, samples, _ = store_increments(conn.cursor(), increments)
+    record_usage(samples)
+    recorded = len(samples)
+
+    for result in results:
+        if result["status"] == "error":
+            log_message(f"ERROR recording queued increment for {result['claude_name']}: {result['detail']}",
+                        logging.ERROR, claude_name=result['claude_name'])
+    log_sampled(f"Flushed {recorded}/{len(increments)} queued increments",
+                recorded=recorded, batch_size=len(increments))
+
+async def flush_increments(increments):
+    await run_db(write_queued_increments, increments)
+    change_feed.publish("increments", count=len(increments))
+
+def spill_increments(increments):
+    """Append acknowledged increments the queue couldn't commit to WRITE_BEHIND_SPILL_PATH"""
+    with open(WRITE_BEHIND_SPILL_PATH, "a") as f:
+        for item in increments:
+            f.write(json.dumps(item.model_dump(), separators=(",", ":")) + "\n")
+    log_message(f"Spilled {len(increments)} uncommitted increments to {WRITE_BEHIND_SPILL_PATH}", logging.ERROR)
+
+write_queue = WriteBehindQueue(
+    flush_increments,
+    max_rows=WRITE_BEHIND_MAX_ROWS,
+    max_delay_ms=WRITE_BEHIND_MAX_DELAY_MS,
+    on_error=lambda message: log_message(message, logging.ERROR),
+    spill=spill_increments
+) if WRITE_BEHIND else None
+
+def parse_increments(body, binary: bool) -> List[ResourceIncrement]:
+    """
+    Parse JSON (one ResourceIncrement or {"increments": [...]}) or a binary
+    wire-format frame (see wire_format.py). Raises ValueError/TypeError.
+    """
+    if binary:
+        return [ResourceIncrement(**item) for item in wire_format.decode_increments(body)]
+
+    payload = json.loads(body)
+    if isinstance(payload, dict) and "increments" in payload:
+        return ResourceIncrementBatch(**payload).increments
+    return [ResourceIncrement(**payload)]
+
+class DecodedRequest(Request):
+    """A request whose body was replaced (a wire-format frame re-encoded as JSON)"""
 
+    def __init__(self, request: Request, body: bytes):
+        headers = [(k, v) for k, v in request.scope["headers"] if k not in (b"content-type", b"content-length")]
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        super().__init__({**request.scope, "headers": headers}, request.receive)
+        self._decoded = body
+
+    async def body(self) -> bytes:
+        return self._decoded
+
+async def decode_binary_request(request: Request, batch: bool) -> Request:
+    """
+    The request with its wire-format frame as the JSON its endpoint's model
+    expects; a malformed frame raises RequestValidationError (a 422 shaped
+    like FastAPI's own)
+    """
+    try:
+        increments = wire_format.decode_increments(await request.body())
+        if not batch and len(increments) != 1:
+            raise wire_format.WireFormatError(f"Expected 1 increment, got {len(increments)}")
+    except ValueError as e:  # WireFormatError, or a claude_name that isn't UTF-8
+        raise RequestValidationError([{"type": "wire_format", "loc": ("body",), "msg": str(e), "input": None}])
+    payload = {"increments": increments} if batch else increments[0]
+    return DecodedRequest(request, json.dumps(payload).encode())
+
+class WireFormatRoute(APIRoute):
+    """
+    Ingest route that also takes the binary wire format: a body sent with
+    Content-Type: application/x-resource-share is decoded before FastAPI
+    validates it against the endpoint's ResourceIncrement or
+    ResourceIncrementBatch, so JSON clients keep the documented schema and
+    FastAPI's 422 detail list, and binary ones get the same validation
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        batch = self.body_field is not None and self.body_field.field_info.annotation is ResourceIncrementBatch
+
+        async def route_handler(request: Request) -> Response:
+            if wire_format.is_binary(request.headers.get("content-type")):
+                request = await decode_binary_request(request, batch)
+            return await handler(request)
+
+        return route_handler
+
+# Ingest endpoints (included into the app after their definitions)
+ingest_router = APIRouter(route_class=WireFormatRoute)
+# Documents the binary alternative next to the JSON schema FastAPI generates
+WIRE_FORMAT_BODY = {"requestBody": {"content": {wire_format.CONTENT_TYPE: {
+    "schema": {"type": "string", "format": "binary"}}}}}
+
+def ingest_response(request: Request, payload, results):
+    """Return `payload` as JSON, or `results` as a binary frame if the client accepts it"""
+    if wire_format.accepts_binary(request.headers.get("accept")):
+        return Response(content=wire_format.encode_results(results), media_type=wire_format.CONTENT_TYPE)
+    return payload
+
+async def ingest_increment(data: ResourceIncrement):
+    """
+    Record one increment: queued when write-behind is enabled (status
+    "queued", committed by the next group flush), otherwise written now.
+    A full queue, or one whose flushes are failing, falls back to a
+    synchronous write (so database errors reach the client as a 500).
+    """
+    if write_queue is not None and write_queue.enqueue(data):
+        recommendation = get_recommendation(data)
         return {
-            "status": "success",
+            "status": "queued",
             "claude_name": data.claude_name,
-            "cost_recorded": cost_delta if data.cost_delta is not None else None,
-            "tokens_recorded": cache_read_increment,  # For backwards compat
-            "recommended_interval": recommended_interval,
-            "current_interval": current_interval,
-            "multipliers": recommendation['multipliers'],
-            "quota_status": recommendation['quota_status']
+            "cost_recorded": data.cost_delta,
+            "tokens_recorded": data.cache_read_increment if data.cost_delta is None else None,
+            **recommendation
         }
-        
+    result = await run_db(write_increment, data)
+    change_feed.publish("increments", count=1)
+    return result
+
+async def ingest_batch(batch: ResourceIncrementBatch):
+    """Write a batch in one transaction (see write_increment_batch)"""
+    result = await run_db(write_increment_batch, batch)
+    if result["recorded"]:
+        change_feed.publish("increments", count=result["recorded"])
+    return result
+
+@ingest_router.post("/resource-share/increment", openapi_extra=WIRE_FORMAT_BODY)
+async def record_resource_increment(data: ResourceIncrement, request: Request):
+    """
+    Receive cost_delta (or legacy cache_read_increment) from a Claude
+    Stores in resource_share_increments and updates daily_resource_share
+
+    Body: ResourceIncrement as JSON, or one binary increment record with
+    Content-Type: application/x-resource-share
+    """
+    result = await ingest_increment(data)
+    return ingest_response(request, result, [result])
+
+async def watch_quota():
+    """Poll quota_info (written by check-quota.py) and publish a "quota" event for each new row"""
+    global latest_quota
+    while True:
+        try:
+            quota = await run_db(get_latest_quota)
+        except Exception as e:
+            log_message(f"ERROR polling quota_info: {e}", logging.ERROR)
+        else:
+            if quota and (latest_quota is None or quota['timestamp'] != latest_quota['timestamp']):
+                latest_quota = quota
+                change_feed.publish("quota", quota=quota)
+        await asyncio.sleep(QUOTA_POLL_SECONDS)
+
+@app.websocket("/resource-share/stream")
+async def increment_stream(websocket: WebSocket):
+    """
+    Long-lived ingestion channel for autonomous timers.
+
+    Client -> server: JSON text frames (one ResourceIncrement or
+    {"increments": [...]}) or binary wire-format frames.
+    Server -> client (JSON text):
+    - {"type": "recommendation", ...} whenever a Claude's recommended
+      interval or quota status differs from what this stream last sent -
+      after each of its increments, and whenever the background fleet
+      allocation is recomputed (other Claudes' usage, quota, identities)
+    - {"type": "quota", "quota": {...}} on connect and for each new quota_info row
+    - {"type": "error", ...} for rejected frames or increments
+    """
+    await websocket.accept()
+    events = change_feed.subscribe()
+    send_lock = asyncio.Lock()
+    latest = {}  # claude_name -> last increment received on this stream
+    pushed = {}  # claude_name -> (recommended_interval, quota_status) last sent
+
+    async def send(message):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def push_recommendation(data: ResourceIncrement):
+        recommendation = get_recommendation(data)
+        key = (recommendation['recommended_interval'], recommendation['quota_status'])
+        if pushed.get(data.claude_name) != key:
+            pushed[data.claude_name] = key
+            await send({"type": "recommendation", "claude_name": data.claude_name, **recommendation})
+
+    async def push_quota():
+        if latest_quota:
+            await send({"type": "quota", "quota": latest_quota})
+        while True:
+            event = await events.get()
+            if event["kind"] == "quota":
+                await send({"type": "quota", "quota": event["quota"]})
+
+    async def push_allocations():
+        # Each new fleet allocation may move any Claude's recommendation;
+        # `pushed` keeps unchanged ones quiet
+        loads = allocation_cache.loads
+        while True:
+            loads = await allocation_cache.wait_for_refresh(loads)
+            for data in list(latest.values()):
+                await push_recommendation(data)
+
+    async def run_pusher(push):
+        try:
+            await push()
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            log_message(f"ERROR pushing to increment stream: {e}", logging.ERROR)
+            try:
+                await websocket.close(code=1011)  # Client reconnects to a working stream
+            except Exception:
+                pass
+
+    pushers = [asyncio.create_task(run_pusher(push_quota))]
+    if ALLOCATION_READS_SNAPSHOT:
+        pushers.append(asyncio.create_task(run_pusher(push_allocations)))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            try:
+                if message.get("bytes") is not None:
+                    increments = parse_increments(message["bytes"], binary=True)
+                else:
+                    increments = parse_increments(message.get("text") or "", binary=False)
+            except (ValueError, TypeError) as e:
+                await send({"type": "error", "detail": str(e)})
+                continue
+
+            try:
+                if len(increments) == 1:
+                    results = [await ingest_increment(increments[0])]
+                else:
+                    batch = ResourceIncrementBatch(increments=increments)
+                    results = (await ingest_batch(batch))["results"]
+            except HTTPException as e:
+                await send({"type": "error", "detail": e.detail})
+                continue
+
+            for data, result in zip(increments, results):
+                if result["status"] == "error":
+                    await send({"type": "error", "claude_name": data.claude_name, "detail": result["detail"]})
+                    continue
+                latest[data.claude_name] = data
+                await push_recommendation(data)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for pusher in pushers:
+            pusher.cancel()
+        change_feed.unsubscribe(events)
+
+@app.get("/resource-share/queue")
+async def write_queue_metrics():
+    """Write-behind queue depth and flush latency"""
+    if write_queue is None:
+        return {"enabled": False}
+    return write_queue.metrics()
+
+def write_increment_batch(batch: ResourceIncrementBatch):
+    """Blocking body of record_resource_increment_batch() - runs on the DB thread pool"""
+    if len(batch.increments) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(batch.increments)} exceeds limit of {MAX_BATCH_SIZE} increments"
+        )
+
+    try:
+        with db_pool.writer() as conn:
+            results, samples, cost_multipliers = store_increments(conn.cursor(), batch.increments)
+        record_usage(samples)
+        recorded = len(samples)
+
+        claude_names = ", ".join(sorted(cost_multipliers))
+        log_sampled(f"Recorded batch of {recorded}/{len(batch.increments)} increments ({claude_names})",
+                    recorded=recorded, batch_size=len(batch.increments))
+
+        return {
+            "status": "success" if recorded == len(batch.increments) else "partial",
+            "recorded": recorded,
+            "failed": len(batch.increments) - recorded,
+            "results": results
+        }
+
     except Exception as e:
-        log_message(f"ERROR recording resource-share: {e}")
+        log_message(f"ERROR recording resource-share batch: {e}", logging.ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/resource/today/{claude_name}")
-async def get_today_resource_share(claude_name: str):
-    """Get today's resource-share for a specific Claude"""
+@ingest_router.post("/resource-share/increments/batch", openapi_extra=WIRE_FORMAT_BODY)
+async def record_resource_increment_batch(batch: ResourceIncrementBatch, request: Request):
+    """
+    Receive many increments (any mix of Claudes and modes) in one request.
+    All rows are written in a single transaction; each item gets its own
+    savepoint so one bad row does not discard the rest of the batch.
+
+    Body: {"increments": [...]} as JSON, or a binary frame of increment
+    records with Content-Type: application/x-resource-share
+    """
+    result = await ingest_batch(batch)
+    return ingest_response(request, result, result["results"])
+
+def query_today_resource_share(claude_name: str):
+    """Blocking body of get_today_resource_share() - runs on the DB thread pool"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        today = date.today().isoformat()
-        
-        cursor.execute("""
-            SELECT autonomous_tokens, collaborative_tokens, total_tokens
-            FROM daily_resource_share
-            WHERE claude_name = ? AND date = ?
-        """, (claude_name, today))
-        
-        result = cursor.fetchone()
-        conn.close()
+        with db_pool.reader() as conn:
+            cursor = conn.cursor()
+            today = date.today().isoformat()
+
+            cursor.execute("""
+                SELECT autonomous_tokens, collaborative_tokens, total_tokens
+                FROM daily_resource_share
+                WHERE claude_name = ? AND date = ?
+            """, (claude_name, today))
+
+            result = cursor.fetchone()
         
         if result:
             return {
@@ -417,26 +1070,29 @@ async def get_today_resource_share(claude_name: str):
             }
             
     except Exception as e:
-        log_message(f"ERROR querying resource-share: {e}")
+        log_message(f"ERROR querying resource-share: {e}", logging.ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/resource/summary")
-async def get_resource_summary():
-    """Get today's resource-share summary for all Claudes"""
+@app.get("/resource/today/{claude_name}")
+async def get_today_resource_share(claude_name: str):
+    """Get today's resource-share for a specific Claude"""
+    return await run_db(query_today_resource_share, claude_name)
+
+def query_resource_summary():
+    """Blocking body of get_resource_summary() - runs on the DB thread pool"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        today = date.today().isoformat()
-        
-        cursor.execute("""
-            SELECT claude_name, autonomous_tokens, collaborative_tokens, total_tokens
-            FROM daily_resource_share
-            WHERE date = ?
-            ORDER BY total_tokens DESC
-        """, (today,))
-        
-        results = cursor.fetchall()
-        conn.close()
+        with db_pool.reader() as conn:
+            cursor = conn.cursor()
+            today = date.today().isoformat()
+
+            cursor.execute("""
+                SELECT claude_name, autonomous_tokens, collaborative_tokens, total_tokens
+                FROM daily_resource_share
+                WHERE date = ?
+                ORDER BY total_tokens DESC
+            """, (today,))
+
+            results = cursor.fetchall()
         
         summary = []
         for row in results:
@@ -453,15 +1109,107 @@ async def get_resource_summary():
         }
         
     except Exception as e:
-        log_message(f"ERROR getting resource summary: {e}")
+        log_message(f"ERROR getting resource summary: {e}", logging.ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard():
-    """Human-facing status dashboard"""
+@app.get("/resource/summary")
+async def get_resource_summary():
+    """Get today's resource-share summary for all Claudes"""
+    return await run_db(query_resource_summary)
+
+def query_increments_page(limit: int, filters: dict):
+    """Blocking body of one /resource/increments page or export chunk - runs on the DB thread pool"""
+    with db_pool.reader() as conn:
+        return increment_history.fetch_page(conn, limit, **filters)
+
+def export_increments_chunk(limit: int, filters: dict):
+    """One NDJSON export chunk (rows, body, next keyset position) - runs on the DB thread pool"""
+    rows, after = query_increments_page(limit, filters)
+    body = "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows).encode()
+    return len(rows), body, after
+
+async def stream_increments(filters: dict, limit):
+    """
+    NDJSON export body. Each chunk is its own short read on the DB pool
+    (keyset position carried between them), so memory stays flat and an
+    export never pins a reader connection or an old WAL snapshot. Rows are
+    serialized off the event loop too, so ingest isn't held up meanwhile.
+    """
+    sent = 0
+    while limit is None or sent < limit:
+        chunk = HISTORY_STREAM_CHUNK if limit is None else min(HISTORY_STREAM_CHUNK, limit - sent)
+        count, body, filters['after'] = await run_db(export_increments_chunk, chunk, filters)
+        if body:
+            yield body
+        sent += count
+        if filters['after'] is None:
+            break
+
+@app.get("/resource/increments")
+async def get_increments(request: Request, claude_name: str = None, mode: str = None,
+                         since: str = None, until: str = None, cursor: str = None,
+                         limit: int = None, format: str = None):
+    """
+    Raw increment history in (timestamp, id) order, filtered by claude_name,
+    mode and [since, until) (UTC, like the timestamp column).
+
+    JSON pages of `limit` rows (default 100, max 1000); pass the response's
+    next_cursor as `cursor` for the next page. With `format=ndjson` or
+    `Accept: application/x-ndjson` streams every matching row (or the first
+    `limit`) as newline-delimited JSON instead.
+    """
+    stream = format == "ndjson" or NDJSON_TYPE in request.headers.get("accept", "")
+    try:
+        filters = increment_history.parse_filters(claude_name, mode, since, until)
+        filters['after'] = increment_history.decode_cursor(cursor) if cursor else None
+    except increment_history.HistoryQueryError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if limit is not None and (limit < 1 or (not stream and limit > HISTORY_MAX_PAGE_SIZE)):
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {HISTORY_MAX_PAGE_SIZE}")
+
+    if stream:
+        return StreamingResponse(stream_increments(filters, limit), media_type=NDJSON_TYPE)
+
+    rows, after = await run_db(query_increments_page, limit or HISTORY_PAGE_SIZE, filters)
+    return {
+        "increments": rows,
+        "count": len(rows),
+        "next_cursor": increment_history.encode_cursor(*after) if after else None,
+    }
+
+def query_timeseries(params: dict):
+    """Blocking body of get_timeseries() - runs on the DB thread pool"""
+    with db_pool.reader() as conn:
+        return timeseries.fetch_series(conn, **params)
+
+@app.get("/resource/timeseries")
+async def get_timeseries(claude_name: str = None, mode: str = None, since: str = None,
+                         until: str = None, resolution: str = None):
+    """
+    Usage per (claude_name, mode) summed into 5m, 1h or 1d buckets over
+    [since, until) (UTC; default the last 24 hours), for trend charts.
+    Without `resolution` the finest one giving at most 500 buckets is used.
+    Hourly and daily buckets come from the hourly rollup, so long ranges
+    don't scan raw increments.
+    """
+    try:
+        params = timeseries.parse_params(claude_name, mode, since, until, resolution)
+    except increment_history.HistoryQueryError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    series = await run_db(query_timeseries, params)
+    return {
+        "resolution": params['resolution'],
+        "since": params['since'],
+        "until": params['until'],
+        "source": timeseries.RESOLUTIONS[params['resolution']].source,
+        "series": series,
+    }
+
+def render_dashboard():
+    """Blocking body of dashboard() - runs on the DB thread pool"""
     try:
         data = get_dashboard_data()
-        quota = data['quota']
         claudes = data['claudes']
         generated_at = data['generated_at']
 
@@ -506,84 +1254,30 @@ async def dashboard():
 
         # Build quota section
         quota_html = ""
-        if quota:
-            session_pct = quota['session_5hour'] or 0
-            week_all_pct = quota['week_all'] or 0
-            week_sonnet_pct = quota['week_sonnet'] or 0
-            session_reset = format_reset_time(quota['session_5hour_reset'])
-            week_reset = format_reset_time(quota['week_reset'])
-
-            # Calculate time elapsed percentages
-            session_time_pct = calculate_time_elapsed_percentage(
-                quota['session_5hour_reset'], 5 * 3600  # 5 hours in seconds
-            )
-            week_time_pct = calculate_time_elapsed_percentage(
-                quota['week_reset'], 7 * 24 * 3600  # 7 days in seconds
-            )
-
-            quota_html = f"""
-            <div class="quota-item">
-                <h4>Session (5-hour)</h4>
-                <div class="dual-progress">
-                    <div class="progress-row">
-                        <span class="progress-label">Quota:</span>
-                        <div class="progress-bar">
-                            <div class="progress-fill quota" style="width: {session_pct}%"></div>
-                        </div>
-                        <span class="progress-value">{session_pct}%</span>
-                    </div>
-                    <div class="progress-row">
-                        <span class="progress-label">Time:</span>
-                        <div class="progress-bar">
-                            <div class="progress-fill time" style="width: {session_time_pct}%"></div>
-                        </div>
-                        <span class="progress-value">{session_time_pct}%</span>
-                    </div>
-                </div>
-                <p class="quota-reset">Resets {session_reset}</p>
-            </div>
-            <div class="quota-item">
-                <h4>Week (all models)</h4>
-                <div class="dual-progress">
-                    <div class="progress-row">
-                        <span class="progress-label">Quota:</span>
-                        <div class="progress-bar">
-                            <div class="progress-fill quota" style="width: {week_all_pct}%"></div>
-                        </div>
-                        <span class="progress-value">{week_all_pct}%</span>
-                    </div>
-                    <div class="progress-row">
-                        <span class="progress-label">Time:</span>
-                        <div class="progress-bar">
-                            <div class="progress-fill time" style="width: {week_time_pct}%"></div>
-                        </div>
-                        <span class="progress-value">{week_time_pct}%</span>
-                    </div>
-                </div>
-                <p class="quota-reset">Resets {week_reset}</p>
-            </div>
+        for window in data['quota_windows']:
+            quota_html += f"""
             <div class="quota-item">
-                <h4>Week (Sonnet only)</h4>
+                <h4>{window['label']}</h4>
                 <div class="dual-progress">
                     <div class="progress-row">
                         <span class="progress-label">Quota:</span>
                         <div class="progress-bar">
-                            <div class="progress-fill quota" style="width: {week_sonnet_pct}%"></div>
+                            <div class="progress-fill quota" style="width: {window['quota_pct']}%"></div>
                         </div>
-                        <span class="progress-value">{week_sonnet_pct}%</span>
+                        <span class="progress-value">{window['quota_pct']}%</span>
                     </div>
                     <div class="progress-row">
                         <span class="progress-label">Time:</span>
                         <div class="progress-bar">
-                            <div class="progress-fill time" style="width: {week_time_pct}%"></div>
+                            <div class="progress-fill time" style="width: {window['time_pct']}%"></div>
                         </div>
-                        <span class="progress-value">{week_time_pct}%</span>
+                        <span class="progress-value">{window['time_pct']}%</span>
                     </div>
                 </div>
-                <p class="quota-reset">Resets {week_reset}</p>
+                <p class="quota-reset">Resets {window['resets']}</p>
             </div>
             """
-        else:
+        if not quota_html:
             quota_html = "<p>No quota data available</p>"
 
         # Full HTML page
@@ -748,25 +1442,189 @@ async def dashboard():
         return html_content
 
     except Exception as e:
-        log_message(f"ERROR rendering dashboard: {e}")
+        log_message(f"ERROR rendering dashboard: {e}", logging.ERROR)
         return HTMLResponse(
             content=f"<html><body><h1>Dashboard Error</h1><p>{str(e)}</p></body></html>",
             status_code=500
         )
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
+def render_dashboard_data():
+    """Blocking body of dashboard_data() - runs on the DB thread pool"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM claude_identities")
-        count = cursor.fetchone()[0]
-        conn.close()
-        return {"status": "healthy", "claudes_registered": count}
+        return json.dumps(get_dashboard_data(), separators=(",", ":"))
+    except Exception as e:
+        log_message(f"ERROR building dashboard data: {e}", logging.ERROR)
+        return JSONResponse({"detail": str(e)}, status_code=500)
+
+async def current_dashboard_data() -> dict:
+    """
+    get_dashboard_data() for the current data version, computed at most
+    once per version and shared by /dashboard/data and /dashboard/stream
+    """
+    async with dashboard_data_cache.lock():
+        version = change_feed.version
+        page = dashboard_data_cache.fresh(version, exact=True)
+        if page is None:
+            try:
+                data = await run_db(get_dashboard_data)
+            except Exception as e:
+                log_message(f"ERROR building dashboard data: {e}", logging.ERROR)
+                raise
+            dashboard_data_cache.store(version, json.dumps(data, separators=(",", ":")), "application/json")
+            return data
+        dashboard_data_cache.hits += 1
+    return json.loads(page.body)
+
+# Pushes /dashboard/stream deltas, refreshing at most every DASHBOARD_MIN_AGE
+dashboard_stream = DashboardStream(
+    change_feed,
+    current_dashboard_data,
+    min_interval=DASHBOARD_MIN_AGE,
+    max_interval=DASHBOARD_MAX_AGE,
+)
+
+async def cached_page(request: Request, cache: PageCache, render, media_type: str):
+    """
+    Serve `cache`'s page, rendering it on the DB thread pool when stale
+    (new increments or quota data since it was rendered, see
+    DASHBOARD_MIN_AGE/MAX_AGE). Carries ETag/Last-Modified, so
+    refreshes of an unchanged page get a 304.
+    """
+    async with cache.lock():
+        version = change_feed.version
+        page = cache.fresh(version)
+        if page is None:
+            body = await run_db(render)
+            if isinstance(body, Response):
+                return body  # Error page - don't cache
+            page = cache.store(version, body, media_type)
+        else:
+            cache.hits += 1
+    return page_response(request, page)
+
+@app.get("/dashboard", response_class=HTMLResponse)
+async def dashboard(request: Request):
+    """
+    Human-facing status dashboard: a static HTML/JS shell (cached by the
+    browser for DASHBOARD_SHELL_MAX_AGE) that renders /dashboard/data
+    """
+    return page_response(request, dashboard_shell, f"max-age={DASHBOARD_SHELL_MAX_AGE}")
+
+@app.get("/dashboard/data")
+async def dashboard_data(request: Request):
+    """Everything the dashboard shows (quota, quota windows, per-Claude status) as JSON"""
+    await check_identities()
+    return await cached_page(request, dashboard_data_cache, render_dashboard_data, "application/json")
+
+@app.get("/dashboard/stream")
+async def dashboard_events():
+    """
+    Server-Sent Events for live dashboards: a snapshot of /dashboard/data,
+    then deltas whenever increments, quota data or identities change
+    (one shared computation for all clients, see dashboard_stream.py)
+    """
+    return StreamingResponse(
+        dashboard_stream.events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/dashboard/stream/stats")
+async def dashboard_stream_stats():
+    """Connected clients and how often the shared computation ran"""
+    return {**dashboard_stream.stats(), 'data_cache': dashboard_data_cache.stats()}
+
+@app.get("/dashboard/html", response_class=HTMLResponse)
+async def dashboard_html(request: Request):
+    """The dashboard rendered server-side, for clients without JavaScript"""
+    return await cached_page(request, dashboard_cache, render_dashboard, "text/html; charset=utf-8")
+
+def query_health():
+    """Blocking body of health_check() - runs on the DB thread pool"""
+    try:
+        with db_pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM claude_identities")
+            count = cursor.fetchone()[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    # Acknowledged increments stuck in (or spilled from) the write-behind queue
+    if write_queue is not None and (not write_queue.healthy or write_queue.stats['spilled']):
+        raise HTTPException(status_code=503, detail={
+            "status": "unhealthy", "claudes_registered": count, "write_queue": write_queue.metrics()})
+    return {"status": "healthy", "claudes_registered": count}
+
+def require_admin(request: Request):
+    """
+    Admin endpoints change server state: require RESOURCE_SHARE_ADMIN_TOKEN
+    when set, otherwise a connection from this machine
+    """
+    if ADMIN_TOKEN is not None:
+        if not secrets.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Admin token required")
+    elif request.client is None or request.client.host not in LOCAL_CLIENTS:
+        raise HTTPException(status_code=403, detail="Admin endpoints are localhost-only")
+
+@app.post("/admin/identities/reload", dependencies=[Depends(require_admin)])
+async def reload_identities():
+    """Reload the identity cache after editing claude_identities"""
+    global identities_published
+    count = await run_db(load_identities)
+    identities_published = identity_cache.version
+    change_feed.publish("identities", count=count)
+    log_message(f"Identity cache reloaded ({count} identities)")
+    return {"status": "reloaded", "identities": count, "loaded_at": identity_cache.loaded_at.isoformat()}
+
+def quota_with_utc_offset(quota):
+    """
+    A snapshot's quota (naive UTC) with its times marked +00:00, so they
+    can't be read as the local times /dashboard/data shows
+    """
+    if not quota:
+        return quota
+    marked = dict(quota)
+    for key in QUOTA_TIME_KEYS:
+        try:
+            marked[key] = datetime.fromisoformat(quota[key]).replace(tzinfo=timezone.utc).isoformat()
+        except (KeyError, TypeError, ValueError):
+            pass
+    return marked
+
+@app.get("/resource/allocation")
+async def get_allocation(current_interval: int = 1800):
+    """
+    Every Claude's recommendation at `current_interval`, from the
+    precomputed fleet allocation (what ingest would answer right now).
+    Quota times carry an explicit +00:00 (UTC).
+    Identity edits seen here are recomputed within ALLOCATION_MIN_AGE.
+    """
+    await check_identities()
+    fleet = allocation_cache.fleet if ALLOCATION_READS_SNAPSHOT else None
+    if fleet is None:
+        return {"enabled": ALLOCATION_READS_SNAPSHOT, "strategy": ALLOCATION_STRATEGY,
+                "recommended_interval": get_recommendation(
+                    ResourceIncrement(claude_name="", mode="autonomy"))['recommended_interval']}
+    recommendations = {}
+    for name in sorted(fleet.context.claudes):
+        recommendation = allocation_strategies.recommend(fleet, name, current_interval)
+        recommendation.pop('recent_usage', None)
+        recommendations[name] = recommendation
+    return {
+        "enabled": True,
+        "strategy": ALLOCATION_STRATEGY,
+        "quota": quota_with_utc_offset(fleet.context.quota),
+        "recent_usage": fleet.context.recent_usage,
+        "recommendations": recommendations,
+        "cache": allocation_cache.stats(),
+    }
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return await run_db(query_health)
+
+app.include_router(ingest_router)
+
 if __name__ == "__main__":
-    log_message("Resource-Share server starting...")
     uvicorn.run(app, host="0.0.0.0", port=8765)
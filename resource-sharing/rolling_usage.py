@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+In-memory rolling usage counters per (claude_name, mode)
+
+Keeps the totals the dashboard and fairness calculations need - today, the
+last 24 hours, the last 7 days - without re-summing raw increments:
+
+- a ring of 5-minute buckets per (claude_name, mode) holding *cumulative*
+  normalized_usage / weighted_cost, so any rolling window is two lookups
+  (cumulative at the end minus cumulative before the start) instead of a
+  scan. Window starts are rounded down to their bucket, so a "7 day"
+  window covers up to 5 minutes more than 7 days; callers that also
+  answer from SQL (before the first rebuild) round their start with
+  window_start() so both sources give the same figures. Each series holds
+  two RING_BUCKETS-long arrays of doubles (~37 KB).
+- exact per-day totals (keyed by the timestamp's 'YYYY-MM-DD', the same
+  day the SQL `timestamp >= day AND timestamp < next day` filters use),
+  plus the day's latest timestamp and highest recommended_interval
+
+rebuild() loads the last 8 days from SQLite at startup; the server then
+calls add() after each committed increment. Timestamps are strings in the
+timestamp column's format (db_pool.TIMESTAMP_FORMAT).
+"""
+
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from db_pool import sql_timestamp, utc_now
+
+BUCKET_SECONDS = 300
+WINDOW = timedelta(days=7)  # Longest rolling window served
+# Ring covers the longest window plus a day of slack (callers' "now" may be
+# local time while stored timestamps are UTC)
+RING_BUCKETS = int((WINDOW + timedelta(days=1)).total_seconds()) // BUCKET_SECONDS
+DAYS_KEPT = 9
+
+EPOCH = datetime(1970, 1, 1)
+
+class UsageSample(NamedTuple):
+    """One committed increment, as the counters need it"""
+    claude_name: str
+    mode: str
+    timestamp: str
+    normalized_usage: float
+    weighted_cost: float
+    recommended_interval: Optional[int]
+
+def bucket_of(timestamp) -> int:
+    """5-minute bucket number for a datetime or timestamp string"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp[:19])
+    return int((timestamp - EPOCH).total_seconds()) // BUCKET_SECONDS
+
+def window_start(since: datetime) -> datetime:
+    """Where a window starting at `since` actually starts: the start of its bucket"""
+    return EPOCH + timedelta(seconds=bucket_of(since) * BUCKET_SECONDS)
+
+class _Series:
+    """Running totals for one (claude_name, mode)"""
+
+    __slots__ = ("last_bucket", "usage_total", "weighted_total", "usage_cum", "weighted_cum", "days")
+
+    def __init__(self):
+        self.last_bucket = None
+        self.usage_total = 0.0
+        self.weighted_total = 0.0
+        # Cumulative totals through each bucket, indexed by bucket % RING_BUCKETS
+        self.usage_cum = array("d", bytes(8 * RING_BUCKETS))
+        self.weighted_cum = array("d", bytes(8 * RING_BUCKETS))
+        self.days = {}  # 'YYYY-MM-DD' -> [usage, weighted, last_timestamp, max_interval]
+
+    def add(self, bucket: int, timestamp: str, usage: float, weighted: float, interval):
+        if self.last_bucket is None:
+            self.last_bucket = bucket
+        elif bucket > self.last_bucket:
+            # Carry the running totals forward through the empty buckets
+            for b in range(max(self.last_bucket + 1, bucket - RING_BUCKETS + 1), bucket + 1):
+                slot = b % RING_BUCKETS
+                self.usage_cum[slot] = self.usage_total
+                self.weighted_cum[slot] = self.weighted_total
+            self.last_bucket = bucket
+
+        if bucket > self.last_bucket - RING_BUCKETS:
+            self.usage_total += usage
+            self.weighted_total += weighted
+            # Usually bucket == last_bucket, so this touches one slot
+            for b in range(bucket, self.last_bucket + 1):
+                slot = b % RING_BUCKETS
+                self.usage_cum[slot] += usage
+                self.weighted_cum[slot] += weighted
+
+        day_key = timestamp[:10]
+        day = self.days.get(day_key)
+        if day is None:
+            day = self.days[day_key] = [0.0, 0.0, None, None]
+            if len(self.days) > DAYS_KEPT:
+                del self.days[min(self.days)]
+        day[0] += usage
+        day[1] += weighted
+        if day[2] is None or timestamp > day[2]:
+            day[2] = timestamp
+        if interval is not None and (day[3] is None or interval > day[3]):
+            day[3] = interval
+
+    def _cumulative(self, bucket: int) -> Tuple[float, float]:
+        """Totals through the end of `bucket`"""
+        if bucket >= self.last_bucket:
+            return self.usage_total, self.weighted_total
+        oldest = self.last_bucket - RING_BUCKETS + 1
+        slot = max(bucket, oldest) % RING_BUCKETS
+        return self.usage_cum[slot], self.weighted_cum[slot]
+
+    def since(self, start_bucket: int) -> Optional[Tuple[float, float]]:
+        """(usage, weighted) from start_bucket on, or None if no rows since then"""
+        if self.last_bucket is None or self.last_bucket < start_bucket:
+            return None
+        usage_before, weighted_before = self._cumulative(start_bucket - 1)
+        return self.usage_total - usage_before, self.weighted_total - weighted_before
+
+class RollingUsage:
+    """Thread-safe rolling counters for every (claude_name, mode)"""
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[datetime] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def rebuild(self, conn, now: datetime = None) -> int:
+        """
+        Reload from resource_share_increments (pre-aggregated per 5-minute
+        bucket in SQL). Returns the number of (claude, mode) series.
+        """
+        now = now or utc_now()
+        cutoff = (now - timedelta(days=DAYS_KEPT - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        rows = conn.execute(f"""
+            SELECT claude_name, mode,
+                   CAST(strftime('%s', timestamp) AS INTEGER) / {BUCKET_SECONDS} as bucket,
+                   MAX(timestamp),
+                   COALESCE(SUM(normalized_usage), 0),
+                   COALESCE(SUM(weighted_cost), 0),
+                   MAX(recommended_interval)
+            FROM resource_share_increments
+            WHERE timestamp >= ?
+            GROUP BY claude_name, mode, bucket
+            ORDER BY claude_name, mode, bucket
+        """, (sql_timestamp(cutoff),)).fetchall()
+
+        series = {}
+        for claude_name, mode, bucket, timestamp, usage, weighted, interval in rows:
+            key = (claude_name, mode)
+            if key not in series:
+                series[key] = _Series()
+            series[key].add(bucket, timestamp, usage, weighted, interval)
+
+        with self._lock:
+            self._series = series
+            self.loaded_at = datetime.now()
+        return len(series)
+
+    def add(self, claude_name: str, mode: str, timestamp: str,
+            normalized_usage: float, weighted_cost: float, recommended_interval=None):
+        """Count one committed increment (ignored until the first rebuild)"""
+        if not self.loaded:
+            return
+        bucket = bucket_of(timestamp)
+        with self._lock:
+            series = self._series.get((claude_name, mode))
+            if series is None:
+                series = self._series[(claude_name, mode)] = _Series()
+            series.add(bucket, timestamp, normalized_usage or 0.0, weighted_cost or 0.0, recommended_interval)
+
+    def record(self, samples: Iterable[UsageSample]):
+        """add() for each committed sample"""
+        for sample in samples:
+            self.add(*sample)
+
+    def reset(self):
+        """Drop everything; add() is ignored until the next rebuild()"""
+        with self._lock:
+            self._series = {}
+            self.loaded_at = None
+
+    def window(self, since: datetime, mode: str = None) -> Dict[Tuple[str, str], Tuple[float, float]]:
+        """{(claude_name, mode): (usage, weighted)} for rows since window_start(since)"""
+        start = bucket_of(since)
+        totals = {}
+        with self._lock:
+            for key, series in self._series.items():
+                if mode is not None and key[1] != mode:
+                    continue
+                window = series.since(start)
+                if window is not None:
+                    totals[key] = window
+        return totals
+
+    def day(self, day: str) -> Dict[Tuple[str, str], Tuple[float, float, str, Optional[int]]]:
+        """{(claude_name, mode): (usage, weighted, last_timestamp, max_interval)} for one 'YYYY-MM-DD'"""
+        with self._lock:
+            return {key: tuple(series.days[day])
+                    for key, series in self._series.items() if day in series.days}
+
+    def fleet_rows(self, day: str, week_start: datetime) -> Tuple[Dict[str, List], Dict[str, List]]:
+        """
+        Per-Claude rows shaped like the dashboard's fleet queries:
+        today {name: [(mode, usage, last_activity, interval), ...]} and
+        week {name: [(mode, usage), ...]}, modes in alphabetical order
+        """
+        today_rows, weekly_rows = {}, {}
+        for (name, mode), (usage, _, last, interval) in sorted(self.day(day).items()):
+            today_rows.setdefault(name, []).append((mode, usage, last, interval))
+        for (name, mode), (usage, _) in sorted(self.window(week_start).items()):
+            weekly_rows.setdefault(name, []).append((mode, usage))
+        return today_rows, weekly_rows
+
+    def __len__(self):
+        return len(self._series)
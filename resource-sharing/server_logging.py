@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Queue-backed logging pipeline for the webhook server
+
+Request handlers only put records on an in-memory queue; a background
+QueueListener thread formats and writes them. The file handler rotates by
+size (or by time if RESOURCE_SHARE_LOG_ROTATE_WHEN is set, e.g. "midnight")
+and gzips rotated files.
+
+Configuration (environment):
+- RESOURCE_SHARE_LOG_LEVEL       DEBUG/INFO/WARNING/ERROR (default INFO)
+- RESOURCE_SHARE_LOG_FORMAT      json (default) or text (the old "timestamp - message")
+- RESOURCE_SHARE_LOG_MAX_BYTES   rotate at this size (default 10 MiB)
+- RESOURCE_SHARE_LOG_BACKUPS     rotated files to keep (default 7)
+- RESOURCE_SHARE_LOG_ROTATE_WHEN time-based rotation instead of size (unset by default)
+- RESOURCE_SHARE_LOG_COMPRESS    gzip rotated files (default 1)
+- RESOURCE_SHARE_LOG_SAMPLE      fraction of per-increment lines to keep (default 1.0, 0 = off)
+"""
+
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+LOGGER_NAME = "resource_share"
+
+LOG_LEVEL = os.environ.get("RESOURCE_SHARE_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("RESOURCE_SHARE_LOG_FORMAT", "json")
+LOG_MAX_BYTES = int(os.environ.get("RESOURCE_SHARE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.environ.get("RESOURCE_SHARE_LOG_BACKUPS", "7"))
+LOG_ROTATE_WHEN = os.environ.get("RESOURCE_SHARE_LOG_ROTATE_WHEN")
+LOG_COMPRESS = os.environ.get("RESOURCE_SHARE_LOG_COMPRESS", "1") == "1"
+INCREMENT_SAMPLE_RATE = float(os.environ.get("RESOURCE_SHARE_LOG_SAMPLE", "1.0"))
+
+logger = logging.getLogger(LOGGER_NAME)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, message plus any structured fields"""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+def gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+def gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+def build_file_handler(log_path: Path) -> logging.Handler:
+    """Rotating (optionally compressing) file handler with the configured format"""
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if LOG_ROTATE_WHEN:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUPS
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS
+        )
+
+    if LOG_COMPRESS:
+        handler.namer = gzip_namer
+        handler.rotator = gzip_rotator
+
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s", "%Y-%m-%d %H:%M:%S"))
+    return handler
+
+def start_logging(log_path: Path) -> logging.handlers.QueueListener:
+    """
+    Route the server logger through a queue to a background writer thread.
+    Returns the listener; call stop_logging() on shutdown to flush it.
+    """
+    log_queue = queue.SimpleQueue()
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+    listener = logging.handlers.QueueListener(
+        log_queue, build_file_handler(log_path), respect_handler_level=True
+    )
+    listener.start()
+    return listener
+
+def stop_logging(listener: logging.handlers.QueueListener):
+    """Flush queued records and close the log file"""
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+def log_event(message: str, level: int = logging.INFO, **fields):
+    """Queue one log line; keyword arguments become structured JSON fields"""
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"fields": fields})
+
+def log_sampled(message: str, level: int = logging.INFO, **fields):
+    """Like log_event, but only keeps INCREMENT_SAMPLE_RATE of high-frequency lines"""
+    if INCREMENT_SAMPLE_RATE <= 0:
+        return
+    if INCREMENT_SAMPLE_RATE < 1 and random.random() >= INCREMENT_SAMPLE_RATE:
+        return
+    if INCREMENT_SAMPLE_RATE < 1:
+        fields["sample_rate"] = INCREMENT_SAMPLE_RATE
+    log_event(message, level, **fields)
@@ -0,0 +1,146 @@
+"""
+Shared fixtures for the resource-share tests
+
+The modules live side by side in resource-sharing/ (run as scripts), so
+put that directory on sys.path. Each test gets a throwaway database with
+the production schema (plus the migrations' indexes and hourly rollup)
+and a few days of synthetic history, and the server pointed at it.
+"""
+
+import random
+import sqlite3
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db_pool import ConnectionPool, sql_timestamp, utc_now, utc_to_local  # noqa: E402
+from migrate_add_hourly_rollup import backfill, create_rollup  # noqa: E402
+from migrate_add_increment_indexes import create_indexes  # noqa: E402
+
+# Production schema (tables were created by hand on the server; migrations
+# added the cost columns, indexes and hourly rollup)
+SCHEMA = """
+CREATE TABLE claude_identities (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    model TEXT,
+    active INTEGER DEFAULT 1,
+    collaborative_pref INTEGER DEFAULT 30,
+    cost_multiplier INTEGER DEFAULT 3
+);
+
+CREATE TABLE resource_share_increments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    claude_name TEXT NOT NULL,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+    mode TEXT NOT NULL,
+    cache_read_increment INTEGER,
+    context_percentage REAL,
+    weighted_cost INTEGER,
+    recommended_interval INTEGER,
+    cost_delta REAL,
+    normalized_usage REAL
+);
+
+CREATE TABLE daily_resource_share (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    claude_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    autonomous_tokens INTEGER DEFAULT 0,
+    collaborative_tokens INTEGER DEFAULT 0,
+    total_tokens INTEGER GENERATED ALWAYS AS (autonomous_tokens + collaborative_tokens),
+    last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(claude_name, date)
+);
+
+CREATE TABLE quota_info (
+    timestamp TEXT PRIMARY KEY,
+    session_5hour INTEGER,
+    week_all INTEGER,
+    week_sonnet INTEGER,
+    session_5hour_reset TEXT,
+    week_reset TEXT
+);
+"""
+
+MODELS = [("opus", 5), ("sonnet", 3), ("haiku", 1)]
+CLAUDES = [f"Claude-{i:03d}" for i in range(5)]
+
+def build_database(db_path: Path, days: int = 8, samples_per_hour: int = 2, seed: int = 42) -> Path:
+    """
+    CLAUDES with `days` of increments (UTC, like CURRENT_TIMESTAMP) ending
+    now, the hourly rollup built from them, and one quota_info row (local
+    time, like check-quota.py): session 35% resetting in 2h, week 50% in 3 days
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    create_indexes(conn)
+    create_rollup(conn)
+    conn.executemany("""
+        INSERT INTO claude_identities (name, model, cost_multiplier, collaborative_pref)
+        VALUES (?, ?, ?, ?)
+    """, [(name, *rng.choice(MODELS), rng.choice([20, 30, 40])) for name in CLAUDES])
+
+    now = utc_now().replace(microsecond=0)
+    step = timedelta(hours=1) / samples_per_hour
+    rows = []
+    for name in CLAUDES:
+        ts = now - timedelta(days=days) + step * rng.random()
+        while ts < now:
+            mode = "collaboration" if rng.random() < 0.3 else "autonomy"
+            cost_delta = round(rng.uniform(0.0, 0.5), 4)
+            normalized = cost_delta / 3
+            rows.append((name, sql_timestamp(ts), mode, int(normalized * 1000), rng.uniform(0, 100),
+                         int(normalized * 3000), rng.choice([900, 1800, 3600]), cost_delta, normalized))
+            ts += step
+    conn.executemany("""
+        INSERT INTO resource_share_increments
+        (claude_name, timestamp, mode, cache_read_increment, context_percentage,
+         weighted_cost, recommended_interval, cost_delta, normalized_usage)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    backfill(conn)
+
+    conn.execute("""
+        INSERT INTO quota_info
+        (timestamp, session_5hour, week_all, week_sonnet, session_5hour_reset, week_reset)
+        VALUES (?, 35, 50, 20, ?, ?)
+    """, (utc_to_local(now).isoformat(), utc_to_local(now + timedelta(hours=2)).isoformat(),
+          utc_to_local(now + timedelta(days=3)).isoformat()))
+    conn.commit()
+    conn.close()
+    return db_path
+
+@pytest.fixture
+def scratch_db(tmp_path):
+    """A small database: 5 Claudes, 8 days of history, a quota row"""
+    return build_database(tmp_path / "resource_tracking.db")
+
+@pytest.fixture
+def server(scratch_db, monkeypatch):
+    """resource_share_server pointed at scratch_db, caches and counters reset"""
+    import resource_share_server as server
+    monkeypatch.setattr(server, "DB_PATH", scratch_db)
+    monkeypatch.setattr(server, "LOG_PATH", scratch_db.with_suffix(".log"))
+    monkeypatch.setattr(server, "WRITE_BEHIND_SPILL_PATH", scratch_db.with_name("spill.ndjson"))
+    server.db_pool.close()
+    monkeypatch.setattr(server, "db_pool", ConnectionPool(scratch_db, readers=server.DB_WORKERS))
+    for cache in (server.identity_cache, server.dashboard_cache, server.dashboard_data_cache,
+                  server.allocation_cache):
+        cache.invalidate()
+    server.rolling_usage.reset()
+    yield server
+    server.db_pool.close()
+
+@pytest.fixture
+def client(server):
+    """TestClient on localhost with the app's startup and shutdown run around the test"""
+    from fastapi.testclient import TestClient
+    with TestClient(server.app, client=("127.0.0.1", 50000)) as test_client:
+        yield test_client
@@ -0,0 +1,18 @@
+"""/admin/* endpoints refuse remote clients and wrong tokens"""
+
+from fastapi.testclient import TestClient
+
+def reload_status(server, client_host, headers=None):
+    client = TestClient(server.app, client=(client_host, 50000))
+    return client.post("/admin/identities/reload", headers=headers).status_code
+
+def test_reload_is_localhost_only_without_a_token(server, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", None)
+    assert reload_status(server, "127.0.0.1") == 200
+    assert reload_status(server, "192.168.1.20") == 403
+
+def test_reload_requires_the_token_when_set(server, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "s3cret")
+    assert reload_status(server, "127.0.0.1") == 403
+    assert reload_status(server, "192.168.1.20", {"x-admin-token": "wrong"}) == 403
+    assert reload_status(server, "192.168.1.20", {"x-admin-token": "s3cret"}) == 200
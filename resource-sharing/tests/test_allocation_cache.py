@@ -0,0 +1,130 @@
+"""Allocation cache: what triggers a refresh, and the age ingest reports"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import allocation_cache
+from change_feed import ChangeFeed
+from rolling_usage import UsageSample
+
+def fleet(recent_usage):
+    context = SimpleNamespace(recent_usage=recent_usage, lowest_usage=min(recent_usage.values()),
+                              claudes=list(recent_usage))
+    return SimpleNamespace(context=context, strategy=SimpleNamespace(name="test"))
+
+def sample(claude_name, weighted_cost, mode="autonomy"):
+    return UsageSample(claude_name, mode, "2030-01-01 00:00:00", weighted_cost, weighted_cost, 1800)
+
+async def started_cache(max_age=60.0, min_age=0.0, fail=False):
+    """A cache over a fresh feed, its refresh task subscribed and waiting"""
+    feed = ChangeFeed()
+
+    async def load():
+        if fail:
+            raise RuntimeError("database is locked")
+        return fleet({"Claude-000": 100.0, "Claude-001": 10.0})
+
+    cache = allocation_cache.AllocationCache(feed, load, min_age=min_age, max_age=max_age, usage_threshold=0.1)
+    await cache.start()
+    await asyncio.sleep(0)  # Let the task subscribe
+    return cache, feed
+
+async def refreshed(cache, loads, timeout=2.0):
+    """The new load count, or None if no refresh came within `timeout`"""
+    try:
+        return await asyncio.wait_for(cache.wait_for_refresh(loads), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+@pytest.mark.parametrize("kind", allocation_cache.REFRESH_EVENTS)
+def test_quota_and_identity_events_refresh(kind):
+    async def run():
+        cache, feed = await started_cache()
+        assert cache.loads == 1 and cache.triggers['start'] == 1
+        feed.publish(kind)
+        assert await refreshed(cache, 1) == 2
+        assert cache.triggers[kind] == 1 and cache.version == feed.version
+        feed.publish("increments", count=1)  # No usage recorded: nothing to do
+        assert await refreshed(cache, 2, timeout=0.1) is None
+        await cache.stop()
+
+    asyncio.run(run())
+
+def test_usage_past_the_threshold_refreshes():
+    async def run():
+        cache, feed = await started_cache()
+        # Threshold: 0.1 x the lowest 24h usage (10.0) = 1.0
+        cache.record([sample("Claude-000", 0.6), sample("Claude-001", 5.0, mode="collaboration")])
+        feed.publish("increments", count=2)
+        assert await refreshed(cache, 1, timeout=0.1) is None
+
+        cache.record([sample("Claude-000", 0.6)])  # 1.2 since the snapshot
+        feed.publish("increments", count=1)
+        assert await refreshed(cache, 1) == 2 and cache.triggers['usage'] == 1
+
+        cache.record([sample("Claude-002", 0.01)])  # No usage in the snapshot: any crosses
+        feed.publish("increments", count=1)
+        assert await refreshed(cache, 2) == 3 and cache.triggers['usage'] == 2
+        await cache.stop()
+
+    asyncio.run(run())
+
+def test_timer_refreshes_after_max_age():
+    async def run():
+        cache, _ = await started_cache(max_age=0.05)
+        assert await refreshed(cache, 1) == 2
+        assert cache.triggers['timer'] == 1
+        await cache.stop()
+
+    asyncio.run(run())
+
+def test_refreshes_wait_out_min_age():
+    async def run():
+        cache, feed = await started_cache(min_age=0.2)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        feed.publish("quota")
+        assert await refreshed(cache, 1) == 2
+        assert loop.time() - started >= 0.15
+        await cache.stop()
+
+    asyncio.run(run())
+
+def test_lookup_reports_the_allocation_age(monkeypatch):
+    monkeypatch.setattr(allocation_cache, "recommend",
+                        lambda fleet, claude_name, interval: {"recommended_interval": interval})
+
+    async def run():
+        cache, feed = await started_cache()
+        result, age = cache.lookup("Claude-000", 900)
+        assert result == {"recommended_interval": 900} and 0 <= age < 1
+        await asyncio.sleep(0.1)
+        assert cache.lookup("Claude-000", 900)[1] >= 0.1
+        feed.publish("quota")
+        await refreshed(cache, 1)
+        assert cache.lookup("Claude-000", 900)[1] < 0.1  # Reset by the refresh
+        await cache.stop()
+
+    asyncio.run(run())
+
+def test_failed_first_load_leaves_nothing_to_look_up():
+    async def run():
+        cache, _ = await started_cache(fail=True)
+        assert cache.errors == 1 and cache.loads == 0
+        assert cache.lookup("Claude-000", 900) == (None, None)
+        await cache.stop()
+
+    asyncio.run(run())
+
+def test_ingest_reports_recommendation_age(server, monkeypatch):
+    monkeypatch.setattr(server, "allocation_strategy", server.allocation_strategies.get_strategy("v1"))
+    monkeypatch.setattr(server, "ALLOCATION_READS_SNAPSHOT", True)
+    with TestClient(server.app) as client:
+        assert server.allocation_cache.loads >= 1
+        response = client.post("/resource-share/increment",
+                               json={"claude_name": "Claude-000", "mode": "autonomy", "cost_delta": 0.1})
+    assert response.status_code == 200
+    assert 0 <= response.json()["recommendation_age"] < server.ALLOCATION_MAX_AGE
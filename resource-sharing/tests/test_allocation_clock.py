@@ -0,0 +1,48 @@
+"""The allocation path runs on UTC whatever the machine's local timezone"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import allocation_calculator
+import allocation_strategies
+from db_pool import connect, utc_now
+
+@pytest.fixture(params=["Asia/Kolkata", "America/Los_Angeles"])
+def local_timezone(request, monkeypatch):
+    """Run with quota_info written in a local time far from UTC"""
+    monkeypatch.setenv("TZ", request.param)
+    time.tzset()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+
+def test_snapshot_quota_times_are_utc(local_timezone, scratch_db):
+    # scratch_db's quota row is written 2h before its session reset, in local time
+    conn = connect(scratch_db)
+    try:
+        snapshot = allocation_calculator.load_snapshot(conn, history_hours=24)
+    finally:
+        conn.close()
+    taken = datetime.fromisoformat(snapshot.quota['timestamp'])
+    assert abs(utc_now() - taken) < timedelta(minutes=5)
+    assert len(snapshot.quota_history) == 1
+
+    forecast = allocation_strategies.allocate(allocation_strategies.STRATEGIES['forecast'], snapshot)
+    assert "reset in 2.0h" in forecast.fleet_values['forecast'][1]
+    _, reason = allocation_calculator.allocate_fleet(snapshot).session
+    assert "60% elapsed" in reason
+
+def test_allocation_and_dashboard_quota_times_agree(local_timezone, server, monkeypatch):
+    monkeypatch.setattr(server, "allocation_strategy", allocation_strategies.get_strategy("v1"))
+    monkeypatch.setattr(server, "ALLOCATION_READS_SNAPSHOT", True)
+    with TestClient(server.app) as client:
+        allocation = client.get("/resource/allocation").json()["quota"]
+        dashboard = client.get("/dashboard/data").json()["quota"]
+    for key in allocation_calculator.QUOTA_TIME_KEYS:
+        utc = datetime.fromisoformat(allocation[key])
+        assert utc.utcoffset() == timedelta(0)
+        # The dashboard's are naive local time, as check-quota.py stores them
+        assert utc == datetime.fromisoformat(dashboard[key]).astimezone()
@@ -0,0 +1,22 @@
+"""The NumPy allocation engine gives exactly the scalar calculator's results"""
+
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import bench_allocation_vectorized  # noqa: E402
+
+CASES = 300
+SEED = 42
+
+def test_vectorized_matches_scalar_on_random_fleets():
+    rng = random.Random(SEED)
+    failures = [failure for case in range(CASES)
+                if (failure := bench_allocation_vectorized.check_case(SEED + case, rng.randint(1, 20)))]
+    assert not failures, failures[:5]
+
+@pytest.mark.parametrize("claudes", [1, 1000])
+def test_vectorized_matches_scalar_at_fleet_extremes(claudes):
+    assert bench_allocation_vectorized.check_case(SEED, claudes) is None
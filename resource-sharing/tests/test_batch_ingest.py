@@ -0,0 +1,43 @@
+"""Batch ingest: each item under its own savepoint, and the batch size limit"""
+
+import sqlite3
+
+def count_rows(db_path, table, claude_name):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE claude_name = ?", (claude_name,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def test_bad_item_rolls_back_only_its_own_savepoint(client, scratch_db):
+    # Fails on the item's last write, after its increment and hourly rows went in
+    conn = sqlite3.connect(scratch_db)
+    conn.execute("""
+        CREATE TRIGGER reject_broken BEFORE INSERT ON daily_resource_share
+        WHEN NEW.claude_name = 'Broken'
+        BEGIN SELECT RAISE(ABORT, 'rejected'); END
+    """)
+    conn.commit()
+    conn.close()
+    before = {name: count_rows(scratch_db, "resource_share_increments", name) for name in ("Claude-000", "Claude-001")}
+
+    increments = [{"claude_name": name, "mode": "autonomy", "cost_delta": 0.1}
+                  for name in ("Claude-000", "Broken", "Claude-001")]
+    response = client.post("/resource-share/increments/batch", json={"increments": increments})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["status"], body["recorded"], body["failed"]) == ("partial", 2, 1)
+    assert [result["status"] for result in body["results"]] == ["success", "error", "success"]
+    assert "rejected" in body["results"][1]["detail"]
+
+    for table in ("resource_share_increments", "hourly_resource_share", "daily_resource_share"):
+        assert count_rows(scratch_db, table, "Broken") == 0
+    for name, count in before.items():
+        assert count_rows(scratch_db, "resource_share_increments", name) == count + 1
+
+def test_oversized_batch_is_rejected_before_writing(client, server, scratch_db):
+    increments = [{"claude_name": "Claude-000", "mode": "autonomy", "cost_delta": 0.01}] * (server.MAX_BATCH_SIZE + 1)
+    before = count_rows(scratch_db, "resource_share_increments", "Claude-000")
+    response = client.post("/resource-share/increments/batch", json={"increments": increments})
+    assert response.status_code == 413
+    assert count_rows(scratch_db, "resource_share_increments", "Claude-000") == before
@@ -0,0 +1,54 @@
+"""/dashboard/stream reaches gzip-accepting clients uncompressed, event by event"""
+
+import asyncio
+
+async def first_chunks(app, path, headers, count):
+    """
+    GET a streaming response over raw ASGI until `count` body chunks have
+    arrived, then disconnect (TestClient waits for the end of the body,
+    which an event stream never sends). Returns (status, chunks).
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8765),
+        "headers": [(b"host", b"localhost")] + [(k.encode(), v.encode()) for k, v in headers.items()],
+    }
+    done = asyncio.Event()
+    sent = False
+    response = {"status": None, "chunks": []}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if done.is_set():
+            raise OSError("client disconnected")
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["chunks"].append(message.get("body", b""))
+            if len(response["chunks"]) == count or not message.get("more_body"):
+                done.set()
+
+    try:
+        await app(scope, receive, send)
+    except OSError:
+        pass
+    return response["status"], response["chunks"]
+
+def test_stream_is_not_compressed(server):
+    async def first_events():
+        async with server.app.router.lifespan_context(server.app):
+            return await asyncio.wait_for(
+                first_chunks(server.app, "/dashboard/stream", {"accept-encoding": "gzip"}, 2), 10)
+
+    status, chunks = asyncio.run(first_events())
+    assert status == 200
+    assert chunks[0].startswith(b"retry: ")
+    assert chunks[1].startswith(b"event: snapshot\n")
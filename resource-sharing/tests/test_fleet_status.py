@@ -0,0 +1,43 @@
+"""Fleet status: the grouped and rolling-counter paths match the per-Claude reference"""
+
+from datetime import timedelta
+
+import bench_dashboard
+from db_pool import sql_timestamp
+
+def test_grouped_status_matches_per_claude_queries(server):
+    with bench_dashboard.frozen_clock():
+        reference = bench_dashboard.per_claude_status()
+        grouped = server.get_all_claudes_status()  # Counters not loaded yet: SQL path
+    assert len(reference) == 5 and all(claude['weekly_total'] > 0 for claude in reference)
+    assert bench_dashboard.same_status(reference, grouped)
+
+def test_rolling_status_matches_per_claude_queries(server):
+    with bench_dashboard.frozen_clock():
+        reference = bench_dashboard.per_claude_status()
+        server.rebuild_rolling_usage()
+        rolling = server.get_all_claudes_status()
+    assert bench_dashboard.same_status(reference, rolling)
+
+def test_week_figures_do_not_jump_when_counters_load(server, monkeypatch):
+    # Off a 5-minute boundary, where the counters round the window start down,
+    # and off the hour, so the SQL path reads the inserted sample from the raw
+    # increments rather than the rollup it bypasses
+    now = (server.datetime.now() - timedelta(hours=1)).replace(minute=32, second=37, microsecond=0)
+
+    class FrozenDatetime(server.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(server, "datetime", FrozenDatetime)
+    # A sample between the bucket start and the exact 7-day start
+    with server.db_pool.writer() as conn:
+        conn.execute("""
+            INSERT INTO resource_share_increments (claude_name, timestamp, mode, normalized_usage)
+            VALUES ('Claude-000', ?, 'autonomy', 1000.0)
+        """, (sql_timestamp(now - timedelta(days=7, minutes=1)),))
+    before = server.get_all_claudes_status()  # SQL path
+    server.rebuild_rolling_usage()
+    after = server.get_all_claudes_status()
+    assert bench_dashboard.same_status(before, after)
@@ -0,0 +1,47 @@
+"""Identity edits by other processes reach the read paths, not only ingest"""
+
+import sqlite3
+import time
+
+from fastapi.testclient import TestClient
+
+def edit_identities(db_path, sql, params=()):
+    """A commit from another process (sqlite_web, a script)"""
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+def dashboard_names(client):
+    return {claude["name"] for claude in client.get("/dashboard/data").json()["claudes"]}
+
+def test_dashboard_sees_identity_edits(client, server, scratch_db, monkeypatch):
+    monkeypatch.setattr(server.dashboard_data_cache, "min_age", 0)
+    assert "Claude-004" in dashboard_names(client)
+    edit_identities(scratch_db, "UPDATE claude_identities SET active = 0 WHERE name = 'Claude-004'")
+    assert "Claude-004" not in dashboard_names(client)
+    edit_identities(scratch_db, "INSERT INTO claude_identities (name, model) VALUES ('Claude-new', 'haiku')")
+    assert "Claude-new" in dashboard_names(client)
+
+def test_own_increments_do_not_announce_identity_changes(client, server):
+    client.get("/dashboard/data")
+    version = server.identity_cache.version
+    events = server.change_feed.version
+    increment = {"claude_name": "Claude-000", "mode": "autonomy", "cost_delta": 0.1}
+    client.post("/resource-share/increments/batch", json={"increments": [increment]})
+    client.get("/dashboard/data")  # The reader's data_version moved, the identities did not
+    assert server.identity_cache.version == version
+    assert server.change_feed.version == events + 1  # Just the increments event
+
+def test_allocation_sees_identity_edits(server, scratch_db, monkeypatch):
+    monkeypatch.setattr(server, "allocation_strategy", server.allocation_strategies.get_strategy("v1"))
+    monkeypatch.setattr(server, "ALLOCATION_READS_SNAPSHOT", True)
+    monkeypatch.setattr(server.allocation_cache, "min_age", 0)
+    with TestClient(server.app) as client:
+        assert "Claude-new" not in client.get("/resource/allocation").json()["recommendations"]
+        edit_identities(scratch_db, "INSERT INTO claude_identities (name, model) VALUES ('Claude-new', 'haiku')")
+        deadline = time.monotonic() + 5
+        while "Claude-new" not in client.get("/resource/allocation").json()["recommendations"]:
+            assert time.monotonic() < deadline, "allocation never picked up the new identity"
+            time.sleep(0.02)
+        assert server.allocation_cache.triggers['identities'] == 1
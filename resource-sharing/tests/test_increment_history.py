@@ -0,0 +1,83 @@
+"""/resource/increments: keyset pages across equal timestamps, NDJSON export, bad cursors"""
+
+import base64
+import json
+import sqlite3
+
+import pytest
+
+import increment_history
+
+SINCE = "2029-12-31 23:00:00"
+
+@pytest.fixture
+def tied_rows(scratch_db):
+    """23 rows for two Claudes sharing three timestamps, ids interleaved; returns (id, claude_name) in order"""
+    conn = sqlite3.connect(scratch_db)
+    for index in range(23):
+        conn.execute("""
+            INSERT INTO resource_share_increments (claude_name, timestamp, mode, cost_delta)
+            VALUES (?, ?, 'autonomy', 0.1)
+        """, (f"Tied-{index % 2}", f"2030-01-01 00:00:0{index % 3}"))
+    conn.commit()
+    rows = conn.execute("""
+        SELECT id, claude_name FROM resource_share_increments WHERE timestamp >= ? ORDER BY timestamp, id
+    """, (SINCE,)).fetchall()
+    conn.close()
+    return rows
+
+def all_pages(client, limit, cursor=None, **params):
+    ids, pages = [], 0
+    while True:
+        body = client.get("/resource/increments", params={**params, "limit": limit, "cursor": cursor}).json()
+        ids += [row["id"] for row in body["increments"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+@pytest.mark.parametrize("limit", [1, 4, 7, 23, 100])
+def test_pages_across_equal_timestamps_have_no_gaps_or_duplicates(client, tied_rows, limit):
+    ids, pages = all_pages(client, limit, since=SINCE)
+    assert ids == [row_id for row_id, _ in tied_rows]
+    assert pages == max(1, -(-len(tied_rows) // limit))
+
+def test_pages_with_a_claude_filter(client, tied_rows):
+    ids, _ = all_pages(client, 3, since=SINCE, claude_name="Tied-1")
+    assert ids == [row_id for row_id, name in tied_rows if name == "Tied-1"]
+
+def test_rows_inserted_behind_the_cursor_do_not_shift_later_pages(client, scratch_db, tied_rows):
+    first = client.get("/resource/increments", params={"since": SINCE, "limit": 5}).json()
+    conn = sqlite3.connect(scratch_db)
+    conn.execute("""
+        INSERT INTO resource_share_increments (claude_name, timestamp, mode) VALUES ('Tied-0', ?, 'autonomy')
+    """, ("2029-12-31 23:59:59",))  # Before every tied row, with a higher id
+    conn.commit()
+    conn.close()
+    rest, _ = all_pages(client, 5, cursor=first["next_cursor"], since=SINCE)
+    assert [row["id"] for row in first["increments"]] + rest == [row_id for row_id, _ in tied_rows]
+
+def test_ndjson_export_matches_the_pages(client, server, tied_rows, monkeypatch):
+    monkeypatch.setattr(server, "HISTORY_STREAM_CHUNK", 4)  # Several chunks
+    response = client.get("/resource/increments", params={"since": SINCE, "format": "ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [row_id for row_id, _ in tied_rows]
+
+    response = client.get("/resource/increments", params={"since": SINCE, "limit": 6},
+                          headers={"accept": "application/x-ndjson"})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [row_id for row_id, _ in tied_rows[:6]]
+
+def b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+@pytest.mark.parametrize("cursor", ["!!!", "not-a-cursor", b64(b"2030-01-01 00:00:00"),
+                                    b64(b"2030-01-01 00:00:00|abc"), b64(b"\xff\xfe|1")])
+def test_malformed_cursor_is_a_422(client, cursor):
+    response = client.get("/resource/increments", params={"cursor": cursor})
+    assert response.status_code == 422
+    assert "cursor" in response.json()["detail"]
+
+def test_cursor_round_trip():
+    cursor = increment_history.encode_cursor("2030-01-01 00:00:00", 42)
+    assert increment_history.decode_cursor(cursor) == ("2030-01-01 00:00:00", 42)
@@ -0,0 +1,48 @@
+"""Ingest endpoints: JSON keeps its schema and 422 shape, binary goes through the same model"""
+
+import wire_format
+
+INCREMENT = {"claude_name": "Claude-000", "mode": "autonomy", "cost_delta": 0.25, "current_interval": 1800}
+
+def test_openapi_documents_both_body_types(client):
+    paths = client.get("/openapi.json").json()["paths"]
+    for path, model in [("/resource-share/increment", "ResourceIncrement"),
+                        ("/resource-share/increments/batch", "ResourceIncrementBatch")]:
+        content = paths[path]["post"]["requestBody"]["content"]
+        assert content["application/json"]["schema"]["$ref"] == f"#/components/schemas/{model}"
+        assert wire_format.CONTENT_TYPE in content
+
+def test_json_validation_errors_keep_fastapis_detail_list(client):
+    response = client.post("/resource-share/increment", json={**INCREMENT, "current_interval": -5})
+    assert response.status_code == 422
+    assert [error["loc"] for error in response.json()["detail"]] == [["body", "current_interval"]]
+
+    response = client.post("/resource-share/increments/batch", json={"increments": [{"mode": "autonomy"}]})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "increments", 0, "claude_name"]
+
+def test_binary_increment_and_batch(client):
+    headers = {"content-type": wire_format.CONTENT_TYPE, "accept": wire_format.CONTENT_TYPE}
+    response = client.post("/resource-share/increment", headers=headers,
+                           content=wire_format.encode_increments([INCREMENT]))
+    assert response.status_code == 200
+    [result] = wire_format.decode_results(response.content)
+    assert result["status"] in ("success", "queued") and result["cost_recorded"] == 0.25
+
+    response = client.post("/resource-share/increments/batch", headers={"content-type": wire_format.CONTENT_TYPE},
+                           content=wire_format.encode_increments([INCREMENT] * 3))
+    assert response.status_code == 200
+    assert response.json()["recorded"] == 3
+
+def test_binary_frames_are_validated_like_json(client):
+    headers = {"content-type": wire_format.CONTENT_TYPE}
+    frame = wire_format.encode_increments([{**INCREMENT, "current_interval": 10**9}])
+    response = client.post("/resource-share/increment", headers=headers, content=frame)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "current_interval"]
+
+    # A batch frame sent to the single-increment endpoint
+    frame = wire_format.encode_increments([INCREMENT] * 2)
+    response = client.post("/resource-share/increment", headers=headers, content=frame)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body"]
@@ -0,0 +1,115 @@
+"""Write-behind queue: retry with backoff, refusing while unhealthy, drain then spill on stop"""
+
+import asyncio
+import time
+
+import pytest
+
+import ingest_queue
+
+class FlakyWriter:
+    """A flush that fails `failures` times (or until recover()), recording what it committed"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.attempts = []
+        self.written = []
+
+    def recover(self):
+        self.failures = 0
+
+    async def __call__(self, batch):
+        self.attempts.append(time.monotonic())
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.written.extend(batch)
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(ingest_queue, "FLUSH_RETRY_DELAY", 0.02)
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+def test_failed_flush_is_retried_with_backoff_and_written_once():
+    writer = FlakyWriter(failures=3)
+
+    async def run():
+        queue = ingest_queue.WriteBehindQueue(writer, max_delay_ms=10)
+        await queue.start()
+        assert all(queue.enqueue(i) for i in range(5))
+        await wait_until(lambda: writer.written)
+        assert queue.healthy
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(run())
+    assert writer.written == list(range(5))
+    assert queue.stats['flush_failures'] == 3 and queue.stats['spilled'] == 0
+    gaps = [later - earlier for earlier, later in zip(writer.attempts, writer.attempts[1:])]
+    assert gaps[0] >= 0.02 and gaps[1] >= 0.04 and gaps[2] >= 0.08  # Doubling
+
+def test_enqueue_refused_while_flushes_fail():
+    writer = FlakyWriter(failures=10**6)
+
+    async def run():
+        queue = ingest_queue.WriteBehindQueue(writer, max_delay_ms=10)
+        await queue.start()
+        assert queue.enqueue("first")
+        await wait_until(lambda: writer.attempts)
+        assert not queue.healthy
+        assert not queue.enqueue("refused")  # The caller writes this one synchronously
+        writer.recover()
+        await wait_until(lambda: queue.healthy)
+        assert queue.enqueue("second")
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(run())
+    assert writer.written == ["first", "second"]
+    assert queue.stats['enqueued'] == 2 and queue.stats['spilled'] == 0
+
+def test_stop_drains_the_queue():
+    writer = FlakyWriter()
+
+    async def run():
+        queue = ingest_queue.WriteBehindQueue(writer, max_rows=3, max_delay_ms=1000)
+        await queue.start()
+        for i in range(10):
+            queue.enqueue(i)
+        await queue.stop()  # Well before max_delay_ms would flush the first group
+        return queue
+
+    queue = asyncio.run(run())
+    assert writer.written == list(range(10))
+    assert queue.stats['spilled'] == 0
+
+def test_stop_spills_what_it_cannot_commit_in_time():
+    writer = FlakyWriter()
+    spilled = []
+    errors = []
+
+    async def run():
+        queue = ingest_queue.WriteBehindQueue(writer, max_rows=3, max_delay_ms=10, stop_timeout=0.2,
+                                              spill=spilled.extend, on_error=errors.append)
+        await queue.start()
+        for i in range(3):
+            queue.enqueue(i)
+        await wait_until(lambda: len(writer.written) == 3)
+        writer.failures = 10**6  # The database goes away for good
+        for i in range(3, 10):
+            queue.enqueue(i)
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(run())
+    assert writer.written == [0, 1, 2]
+    # The batch stuck retrying plus everything still queued; nothing lost, nothing twice
+    assert sorted(spilled) == list(range(3, 10))
+    assert queue.stats['spilled'] == 7
+    assert queue.metrics()['pending'] == 0
+    assert any("spilling" in message for message in errors)
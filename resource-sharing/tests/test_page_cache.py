@@ -0,0 +1,38 @@
+"""Cached pages: revalidation gets a 304 until new data changes the ETag"""
+
+import page_cache
+
+def test_repeat_get_with_matching_etag_is_a_304(client):
+    first = client.get("/dashboard/data")
+    assert first.status_code == 200 and first.json()["claudes"]
+    etag = first.headers["etag"]
+
+    again = client.get("/dashboard/data", headers={"if-none-match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+    assert client.get("/dashboard/data", headers={"if-none-match": f'W/{etag}, "other"'}).status_code == 304
+    assert client.get("/dashboard/data", headers={"if-none-match": '"other"'}).status_code == 200
+
+    shell = client.get("/dashboard")
+    assert client.get("/dashboard", headers={"if-none-match": shell.headers["etag"]}).status_code == 304
+
+def test_change_feed_bump_changes_the_etag(client, server, monkeypatch):
+    monkeypatch.setattr(server.dashboard_data_cache, "min_age", 0)
+    etag = client.get("/dashboard/data").headers["etag"]
+    version = server.change_feed.version
+
+    increment = {"claude_name": "Claude-000", "mode": "autonomy", "cost_delta": 5.0}
+    assert client.post("/resource-share/increments/batch", json={"increments": [increment]}).status_code == 200
+    assert server.change_feed.version > version
+
+    response = client.get("/dashboard/data", headers={"if-none-match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_page_within_min_age_is_served_for_newer_versions():
+    cache = page_cache.PageCache(min_age=60, max_age=300)
+    page = cache.store(1, "{}", "application/json")
+    assert cache.fresh(2) is page               # Still inside min_age
+    assert cache.fresh(2, exact=True) is None   # /dashboard/stream wants this version
+    cache.min_age = 0
+    assert cache.fresh(1) is page and cache.fresh(2) is None
@@ -0,0 +1,23 @@
+"""Hot increment and rollup queries seek via the indexes instead of scanning"""
+
+from db_pool import connect
+from migrate_add_increment_indexes import INDEXES, check_query_plans, query_plan
+
+def test_hot_queries_use_indexes(scratch_db):
+    conn = connect(scratch_db)
+    try:
+        assert check_query_plans(conn)
+    finally:
+        conn.close()
+
+def test_plan_check_catches_a_scan(scratch_db):
+    conn = connect(scratch_db)
+    try:
+        for name in INDEXES:
+            conn.execute(f"DROP INDEX {name}")
+        plan = query_plan(conn, "SELECT SUM(normalized_usage) FROM resource_share_increments "
+                                "WHERE mode = ? AND timestamp >= ?", ("autonomy", "2026-01-01"))
+        assert any(step.startswith("SCAN") for step in plan)
+        assert not check_query_plans(conn)
+    finally:
+        conn.close()
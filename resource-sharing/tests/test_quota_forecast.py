@@ -0,0 +1,45 @@
+"""Forecast multipliers: the session bound and the over-target floor"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import quota_forecast
+
+NOW = datetime(2026, 3, 2, 12, 0)
+SESSION, WEEKLY = quota_forecast.WINDOWS
+
+def forecast(window, percent, hours_left, autonomy_cost, rate=2.0):
+    """
+    One window burning a steady `rate` % per hour over the last 4 hours,
+    now at `percent`; autonomy's cost over 24h against collaboration's $1
+    """
+    reset = (NOW + timedelta(hours=hours_left)).isoformat()
+    history = [{'timestamp': (NOW - timedelta(hours=h)).isoformat(), window.key: percent - rate * h,
+                window.reset_key: reset} for h in (4, 3, 2, 1, 0)]
+    quota = history[-1]
+    cost = {'autonomy': autonomy_cost, 'collaboration': 1.0}
+    last_hour = {mode: value / 24 for mode, value in cost.items()}
+    return quota_forecast.forecast_window(quota, history, cost, last_hour, 24, NOW, window)
+
+def test_session_running_out_early_slows_the_fleet():
+    result = forecast(SESSION, 80, 2, autonomy_cost=3.0, rate=10.0)
+    assert result.percent_at_reset > quota_forecast.FORECAST_TARGET_PERCENT
+    assert result.multiplier > 1.0
+    assert SESSION.max_multiplier == quota_forecast.FORECAST_SESSION_MAX_MULTIPLIER
+
+def test_session_capped_at_one_never_slows_the_fleet():
+    # FORECAST_SESSION_MAX_MULTIPLIER = 1.0 gives V1's session cap
+    capped = SESSION._replace(max_multiplier=1.0)
+    assert forecast(capped, 80, 2, autonomy_cost=3.0, rate=10.0).multiplier == 1.0
+    assert forecast(capped, 20, 4, autonomy_cost=3.0).multiplier < 1.0  # Still speeds it up
+
+@pytest.mark.parametrize("window, hours_left", [(SESSION, 2), (WEEKLY, 24)])
+def test_over_target_multiplier_scales_with_autonomy_rate(window, hours_left):
+    # Past target: autonomy's rate against the margin rate (100 - 95) / hours_left
+    margin_rate = (100 - quota_forecast.FORECAST_TARGET_PERCENT) / hours_left
+    autonomy_rates = [margin_rate * factor for factor in (0.5, 1.0, 1.25, 1.5, 1.75, 2.0, 4.0)]
+    # autonomy_cost=3.0 against collaboration's $1: autonomy burns 3/4 of the rate
+    multipliers = [forecast(window, 96, hours_left, autonomy_cost=3.0, rate=autonomy_rate / 0.75).multiplier
+                   for autonomy_rate in autonomy_rates]
+    assert multipliers == pytest.approx([1.0, 1.0, 1.25, 1.5, 1.75, 2.0, 2.0])
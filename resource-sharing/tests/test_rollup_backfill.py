@@ -0,0 +1,37 @@
+"""Startup backfills an hourly rollup that is missing existing history"""
+
+import pytest
+
+from db_pool import connect
+from migrate_add_hourly_rollup import TOTALS_CHECK_SQL
+
+def rollup_totals(db_path):
+    conn = connect(db_path)
+    try:
+        raw_count, rollup_count, raw_usage, rollup_usage = conn.execute(TOTALS_CHECK_SQL).fetchone()
+    finally:
+        conn.close()
+    return raw_count, rollup_count, raw_usage, rollup_usage
+
+@pytest.mark.parametrize("damage", [
+    "DROP TABLE hourly_resource_share",  # Database from before the rollup
+    "DELETE FROM hourly_resource_share",  # Table created at startup, never backfilled
+    # Backfill skipped while the server upserted the last day
+    "DELETE FROM hourly_resource_share WHERE hour < (SELECT date(MAX(hour), '-1 day') FROM hourly_resource_share)",
+])
+def test_startup_backfills_missing_history(server, scratch_db, damage):
+    conn = connect(scratch_db)
+    conn.execute(damage)
+    conn.commit()
+    conn.close()
+
+    from fastapi.testclient import TestClient
+    with TestClient(server.app):
+        pass
+
+    raw_count, rollup_count, raw_usage, rollup_usage = rollup_totals(scratch_db)
+    assert rollup_count == raw_count
+    assert rollup_usage == pytest.approx(raw_usage)
+
+def test_complete_rollup_is_left_alone(server):
+    assert server.ensure_schema() == 0
@@ -0,0 +1,64 @@
+"""/resource/timeseries: 5m, 1h and 1d bucket sums equal the raw increments over the same range"""
+
+import sqlite3
+from collections import defaultdict
+from datetime import timedelta
+
+import pytest
+
+from db_pool import sql_timestamp, utc_now
+
+def raw_sums(db_path, since, until, bucket_chars):
+    """cost_delta, normalized_usage and samples per (claude_name, mode, bucket prefix) from raw increments"""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("""
+        SELECT claude_name, mode, substr(timestamp, 1, ?), SUM(cost_delta), SUM(normalized_usage), COUNT(*)
+        FROM resource_share_increments
+        WHERE timestamp >= ? AND timestamp < ?
+        GROUP BY 1, 2, 3
+    """, (bucket_chars, since, until)).fetchall()
+    conn.close()
+    return {row[:3]: row[3:] for row in rows}
+
+def series_sums(body, bucket_chars):
+    sums = defaultdict(lambda: [0.0, 0.0, 0])
+    for series in body["series"]:
+        for point in series["points"]:
+            key = (series["claude_name"], series["mode"], point["bucket"][:bucket_chars])
+            sums[key][0] += point["cost_delta"]
+            sums[key][1] += point["normalized_usage"]
+            sums[key][2] += point["samples"]
+    return {key: tuple(value) for key, value in sums.items()}
+
+def assert_same_sums(actual, expected):
+    assert actual.keys() == expected.keys() and expected
+    for key, (cost, usage, samples) in expected.items():
+        assert actual[key] == pytest.approx((cost, usage, samples), abs=1e-4), key
+
+# Mid-hour (and mid-5-minute) start, so each resolution widens it differently
+SINCE = (utc_now() - timedelta(days=5)).replace(minute=37, second=12, microsecond=0)
+UNTIL = (utc_now() - timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+
+@pytest.mark.parametrize("resolution, aligned_since, bucket_chars", [
+    ("5m", SINCE.replace(minute=35, second=0), 13),   # The 5m buckets' totals per hour
+    ("1h", SINCE.replace(minute=0, second=0), 13),
+    ("1d", SINCE.replace(hour=0, minute=0, second=0), 10),
+])
+def test_bucket_sums_equal_raw_sums(client, scratch_db, resolution, aligned_since, bucket_chars):
+    response = client.get("/resource/timeseries", params={
+        "since": sql_timestamp(SINCE), "until": sql_timestamp(UNTIL), "resolution": resolution})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["since"] == sql_timestamp(aligned_since)
+    assert_same_sums(series_sums(body, bucket_chars),
+                     raw_sums(scratch_db, body["since"], body["until"], bucket_chars))
+
+def test_resolutions_agree_over_whole_days(client, scratch_db):
+    since = sql_timestamp(SINCE.replace(hour=0, minute=0, second=0))
+    until = sql_timestamp(UNTIL.replace(hour=0))
+    expected = raw_sums(scratch_db, since, until, 10)
+    for resolution in ("5m", "1h", "1d"):
+        body = client.get("/resource/timeseries",
+                          params={"since": since, "until": until, "resolution": resolution}).json()
+        assert (body["since"], body["until"]) == (since, until)
+        assert_same_sums(series_sums(body, 10), expected)
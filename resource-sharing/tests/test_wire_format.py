@@ -0,0 +1,57 @@
+"""Binary wire format: frames round-trip, malformed ones are a 422 rather than a 500"""
+
+import pytest
+
+import wire_format
+
+INCREMENTS = [
+    {"claude_name": "Claude-000", "mode": "autonomy", "cost_delta": 0.125,
+     "context_percentage": 42.5, "current_interval": 1800},
+    {"claude_name": "Claudé-001", "mode": "collaboration", "cache_read_increment": 2**40},
+    {"claude_name": "Claude-002", "mode": "autonomy"},  # No optional fields
+]
+
+def test_increment_frames_round_trip():
+    assert wire_format.decode_increments(wire_format.encode_increments(INCREMENTS)) == INCREMENTS
+    assert wire_format.decode_increments(wire_format.encode_increments([])) == []
+
+def test_result_frames_round_trip():
+    results = [
+        {"status": "success", "quota_status": "good", "recommended_interval": 1800,
+         "current_interval": 900, "tokens_recorded": None, "cost_recorded": 0.125},
+        {"status": "queued", "quota_status": "critical", "recommended_interval": 3600,
+         "current_interval": 0, "tokens_recorded": 1234, "cost_recorded": None},
+    ]
+    assert wire_format.decode_results(wire_format.encode_results(results)) == results
+
+def test_result_fields_are_clamped_and_unknown_codes_become_other():
+    [result] = wire_format.decode_results(wire_format.encode_results([
+        {"status": "weird", "quota_status": "weird", "recommended_interval": 2**40,
+         "current_interval": -5, "tokens_recorded": 2**70}]))
+    assert result == {"status": "other", "quota_status": "other", "recommended_interval": wire_format.MAX_U32,
+                      "current_interval": 0, "tokens_recorded": wire_format.MAX_I64, "cost_recorded": None}
+
+FRAME = wire_format.encode_increments(INCREMENTS[:1])
+NAME_OFFSET = wire_format.HEADER.size + wire_format.INCREMENT.size
+MALFORMED = {
+    "short header": FRAME[:3],
+    "bad magic": b"XX" + FRAME[2:],
+    "bad version": FRAME[:2] + bytes([wire_format.VERSION + 1]) + FRAME[3:],
+    "truncated record": FRAME[:wire_format.HEADER.size + 4],
+    "truncated name": FRAME[:-2],
+    "trailing bytes": FRAME + b"\x00",
+    "unknown mode": FRAME[:wire_format.HEADER.size + 1] + b"\x07" + FRAME[wire_format.HEADER.size + 2:],
+    "name not UTF-8": FRAME[:NAME_OFFSET] + b"\xff" + FRAME[NAME_OFFSET + 1:],
+}
+
+@pytest.mark.parametrize("frame", MALFORMED.values(), ids=MALFORMED.keys())
+def test_malformed_frames_raise_a_value_error(frame):
+    with pytest.raises(ValueError):
+        wire_format.decode_increments(frame)
+
+@pytest.mark.parametrize("path", ["/resource-share/increment", "/resource-share/increments/batch"])
+@pytest.mark.parametrize("frame", MALFORMED.values(), ids=MALFORMED.keys())
+def test_malformed_frames_get_a_422(client, path, frame):
+    response = client.post(path, content=frame, headers={"content-type": wire_format.CONTENT_TYPE})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body"]
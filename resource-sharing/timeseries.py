@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Bucketed usage series for /resource/timeseries (trend charts)
+
+Sums of cost_delta and normalized_usage per (claude_name, mode) at 5-minute,
+hourly or daily resolution, each read from the coarsest table that has it:
+- 5m: raw resource_share_increments, grouped in SQL
+- 1h: hourly_resource_share rows as they are
+- 1d: hourly_resource_share grouped by day (24 rows per day instead of
+  every increment), so a 90-day chart reads a few thousand rollup rows
+
+Buckets are in the timestamp column's clock (UTC) and the range is widened
+to whole buckets: `since` rounds down, `until` rounds up. Only buckets with
+increments are returned. Without a resolution the finest one that fits the
+range in AUTO_POINTS buckets is used.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Tuple
+
+from db_pool import current_timestamp, sql_timestamp
+from increment_history import MODES, HistoryQueryError, parse_time
+
+class Resolution(NamedTuple):
+    seconds: int
+    source: str   # Table the buckets are summed from
+    bucket: str   # SQL expression for a row's bucket start
+
+RESOLUTIONS = {
+    "5m": Resolution(300, "resource_share_increments",
+                     "datetime(CAST(strftime('%s', timestamp) AS INTEGER) / 300 * 300, 'unixepoch')"),
+    "1h": Resolution(3600, "hourly_resource_share", "hour"),
+    "1d": Resolution(86400, "hourly_resource_share", "substr(hour, 1, 10) || ' 00:00:00'"),
+}
+
+DEFAULT_RANGE = timedelta(hours=24)  # When `since` is omitted
+AUTO_POINTS = 500    # Buckets per series when choosing the resolution
+MAX_POINTS = 5000    # Buckets per series allowed for an explicit resolution
+
+EPOCH = datetime(1970, 1, 1)
+
+def align(timestamp: str, seconds: int, up: bool = False) -> str:
+    """Round a timestamp down (or up) to a multiple of `seconds` since the epoch"""
+    offset = int((datetime.fromisoformat(timestamp) - EPOCH).total_seconds())
+    aligned = offset - offset % seconds
+    if up and aligned < offset:
+        aligned += seconds
+    return sql_timestamp(EPOCH + timedelta(seconds=aligned))
+
+def buckets_between(since: str, until: str, seconds: int) -> int:
+    span = (datetime.fromisoformat(until) - datetime.fromisoformat(since)).total_seconds()
+    return int(span) // seconds
+
+def parse_params(claude_name: str = None, mode: str = None, since: str = None,
+                 until: str = None, resolution: str = None) -> dict:
+    """
+    Validated fetch_series() arguments from request parameters, with the
+    range aligned to the resolution's buckets
+    """
+    if mode is not None and mode not in MODES:
+        raise HistoryQueryError(f"Invalid mode {mode!r}; expected one of {', '.join(MODES)}")
+    until = parse_time(until) or current_timestamp()
+    since = parse_time(since) or sql_timestamp(datetime.fromisoformat(until) - DEFAULT_RANGE)
+    if since >= until:
+        raise HistoryQueryError("since must be before until")
+
+    if resolution is None:
+        # Finest resolution that fits; the coarsest one serves any range
+        resolution = next((name for name, res in RESOLUTIONS.items()
+                           if buckets_between(since, until, res.seconds) <= AUTO_POINTS), "1d")
+    elif resolution not in RESOLUTIONS:
+        raise HistoryQueryError(f"Invalid resolution {resolution!r}; expected one of {', '.join(RESOLUTIONS)}")
+
+    seconds = RESOLUTIONS[resolution].seconds
+    since, until = align(since, seconds), align(until, seconds, up=True)
+    if buckets_between(since, until, seconds) > MAX_POINTS:
+        raise HistoryQueryError(
+            f"Range spans more than {MAX_POINTS} {resolution} buckets; use a coarser resolution")
+    return {'resolution': resolution, 'since': since, 'until': until, 'claude_name': claude_name, 'mode': mode}
+
+def series_query(resolution: str, since: str, until: str,
+                 claude_name: str = None, mode: str = None) -> Tuple[str, dict]:
+    """(sql, params) for the bucket sums, ordered by claude_name, mode, bucket"""
+    res = RESOLUTIONS[resolution]
+    if res.source == "resource_share_increments":
+        time_column, samples = "timestamp", "COUNT(*)"
+    else:
+        time_column, samples = "hour", "SUM(samples)"
+
+    params = {'since': since, 'until': until}
+    conditions = [f"{time_column} >= :since", f"{time_column} < :until"]
+    if claude_name is not None:
+        conditions.append("claude_name = :claude_name")
+        params['claude_name'] = claude_name
+    if mode is not None:
+        conditions.append("mode = :mode")
+        params['mode'] = mode
+    else:
+        # Lets fleet-wide ranges seek the (mode, time) indexes
+        conditions.append(f"mode IN ({', '.join(repr(m) for m in MODES)})")
+
+    sql = f"""
+        SELECT claude_name, mode, {res.bucket} as bucket,
+               COALESCE(SUM(cost_delta), 0), COALESCE(SUM(normalized_usage), 0), {samples}
+        FROM {res.source}
+        WHERE {' AND '.join(conditions)}
+        GROUP BY claude_name, mode, bucket
+        ORDER BY claude_name, mode, bucket
+    """
+    return sql, params
+
+def fetch_series(conn, resolution: str, since: str, until: str,
+                 claude_name: str = None, mode: str = None) -> List[dict]:
+    """[{claude_name, mode, points: [{bucket, cost_delta, normalized_usage, samples}, ...]}, ...]"""
+    series = []
+    current = None
+    for name, row_mode, bucket, cost, usage, samples in conn.execute(
+            *series_query(resolution, since, until, claude_name, mode)):
+        if current is None or (current['claude_name'], current['mode']) != (name, row_mode):
+            current = {'claude_name': name, 'mode': row_mode, 'points': []}
+            series.append(current)
+        current['points'].append({
+            'bucket': bucket,
+            'cost_delta': round(cost, 6),
+            'normalized_usage': round(usage, 6),
+            'samples': samples,
+        })
+    return series
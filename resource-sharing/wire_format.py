@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Compact binary wire format for increment submission
+
+Selected with `Content-Type: application/x-resource-share` (requests) and
+`Accept: application/x-resource-share` (responses). Little-endian, fixed
+layout, no repeated keys:
+
+Frame header (5 bytes):  magic b"RS" | version u8 | count u16
+
+Increment record (27 bytes + name):
+    flags u8          bit0 cost_delta, bit1 cache_read_increment,
+                      bit2 context_percentage, bit3 current_interval present
+    mode u8           0 = autonomy, 1 = collaboration
+    name_len u8
+    cost_delta f64
+    cache_read_increment i64
+    context_percentage f32
+    current_interval u32
+    claude_name       name_len bytes of UTF-8
+
+Result record (26 bytes):
+    status u8         see STATUSES
+    quota_status u8   see QUOTA_STATUSES (255 = other)
+    recommended_interval u32
+    current_interval u32
+    tokens_recorded i64   (-1 if not known)
+    cost_recorded f64     (NaN if not known)
+
+Absent optional fields are sent as zero with their flag bit cleared.
+Result fields outside their type's range are clamped when encoding.
+"""
+
+import math
+import struct
+
+CONTENT_TYPE = "application/x-resource-share"
+VERSION = 1
+MAGIC = b"RS"
+
+HEADER = struct.Struct("<2sBH")
+INCREMENT = struct.Struct("<BBBdqfI")
+RESULT = struct.Struct("<BBIIqd")
+
+MODES = ["autonomy", "collaboration"]
+STATUSES = ["success", "queued", "partial", "error"]
+QUOTA_STATUSES = [
+    "emergency_constant_interval", "unknown", "good", "medium", "high", "critical"
+]
+OTHER = 255
+MAX_U32 = 2**32 - 1
+MIN_I64, MAX_I64 = -2**63, 2**63 - 1
+
+FLAG_COST_DELTA = 0x01
+FLAG_CACHE_READ = 0x02
+FLAG_CONTEXT = 0x04
+FLAG_INTERVAL = 0x08
+
+class WireFormatError(ValueError):
+    """Malformed binary frame"""
+
+def is_binary(content_type: str) -> bool:
+    return bool(content_type) and content_type.split(";")[0].strip().lower() == CONTENT_TYPE
+
+def accepts_binary(accept: str) -> bool:
+    return bool(accept) and CONTENT_TYPE in accept.lower()
+
+def _read_header(buffer: bytes):
+    if len(buffer) < HEADER.size:
+        raise WireFormatError("Frame shorter than header")
+    magic, version, count = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise WireFormatError("Bad magic")
+    if version != VERSION:
+        raise WireFormatError(f"Unsupported version {version}")
+    return count, HEADER.size
+
+def encode_increments(increments) -> bytes:
+    """Encode increment dicts (ResourceIncrement fields) into one frame"""
+    parts = [HEADER.pack(MAGIC, VERSION, len(increments))]
+    for item in increments:
+        name = item["claude_name"].encode("utf-8")
+        if len(name) > 255:
+            raise WireFormatError("claude_name longer than 255 bytes")
+        flags = 0
+        cost_delta = item.get("cost_delta")
+        cache_read = item.get("cache_read_increment")
+        context = item.get("context_percentage")
+        interval = item.get("current_interval")
+        if cost_delta is not None:
+            flags |= FLAG_COST_DELTA
+        if cache_read is not None:
+            flags |= FLAG_CACHE_READ
+        if context is not None:
+            flags |= FLAG_CONTEXT
+        if interval is not None:
+            flags |= FLAG_INTERVAL
+        parts.append(INCREMENT.pack(
+            flags, MODES.index(item["mode"]), len(name),
+            cost_delta or 0.0, cache_read or 0, context or 0.0, interval or 0
+        ))
+        parts.append(name)
+    return b"".join(parts)
+
+def decode_increments(buffer: bytes) -> list:
+    """Decode a frame into increment dicts (only present fields are included)"""
+    count, offset = _read_header(buffer)
+    increments = []
+    for _ in range(count):
+        if len(buffer) < offset + INCREMENT.size:
+            raise WireFormatError("Truncated increment record")
+        flags, mode, name_len, cost_delta, cache_read, context, interval = \
+            INCREMENT.unpack_from(buffer, offset)
+        offset += INCREMENT.size
+        if mode >= len(MODES):
+            raise WireFormatError(f"Unknown mode {mode}")
+        if len(buffer) < offset + name_len:
+            raise WireFormatError("Truncated claude_name")
+        item = {
+            "claude_name": buffer[offset:offset + name_len].decode("utf-8"),
+            "mode": MODES[mode],
+        }
+        offset += name_len
+        if flags & FLAG_COST_DELTA:
+            item["cost_delta"] = cost_delta
+        if flags & FLAG_CACHE_READ:
+            item["cache_read_increment"] = cache_read
+        if flags & FLAG_CONTEXT:
+            item["context_percentage"] = context
+        if flags & FLAG_INTERVAL:
+            item["current_interval"] = interval
+        increments.append(item)
+    if offset != len(buffer):
+        raise WireFormatError("Trailing bytes after last record")
+    return increments
+
+def _code(table, value) -> int:
+    try:
+        return table.index(value)
+    except ValueError:
+        return OTHER
+
+def _clamp(value, low: int, high: int) -> int:
+    return max(low, min(high, int(value)))
+
+def encode_results(results) -> bytes:
+    """
+    Encode response dicts (one per increment) into one frame. Values that
+    don't fit their field are clamped: the increment is already stored by
+    now, so failing here would make the client retry a recorded row.
+    """
+    parts = [HEADER.pack(MAGIC, VERSION, len(results))]
+    for result in results:
+        tokens = result.get("tokens_recorded")
+        cost = result.get("cost_recorded")
+        parts.append(RESULT.pack(
+            _code(STATUSES, result.get("status")),
+            _code(QUOTA_STATUSES, result.get("quota_status")),
+            _clamp(result.get("recommended_interval") or 0, 0, MAX_U32),
+            _clamp(result.get("current_interval") or 0, 0, MAX_U32),
+            -1 if tokens is None else _clamp(tokens, MIN_I64, MAX_I64),
+            math.nan if cost is None else cost
+        ))
+    return b"".join(parts)
+
+def decode_results(buffer: bytes) -> list:
+    """Decode a response frame (client side)"""
+    count, offset = _read_header(buffer)
+    results = []
+    for _ in range(count):
+        if len(buffer) < offset + RESULT.size:
+            raise WireFormatError("Truncated result record")
+        status, quota_status, recommended, current, tokens, cost = RESULT.unpack_from(buffer, offset)
+        offset += RESULT.size
+        results.append({
+            "status": STATUSES[status] if status < len(STATUSES) else "other",
+            "quota_status": QUOTA_STATUSES[quota_status] if quota_status < len(QUOTA_STATUSES) else "other",
+            "recommended_interval": recommended,
+            "current_interval": current,
+            "tokens_recorded": None if tokens == -1 else tokens,
+            "cost_recorded": None if math.isnan(cost) else cost,
+        })
+    return results